@@ -5,6 +5,10 @@ import argparse
 import sys
 from typing import Tuple, Optional
 from core.registry import ModelRegistry
+from core.cache import set_cache_enabled
+from core.hedge import set_hedge_enabled
+from core.metrics import set_show_summary
+from ui.output import OUTPUT_MODES, is_headless, set_output_mode
 
 
 # 自定义帮助信息模板
@@ -26,6 +30,7 @@ class ArgumentParser:
     
     def __init__(self):
         self.parser = self._create_parser()
+        self.args: Optional[argparse.Namespace] = None  # 解析结果（包含全部选项）
     
     def _create_parser(self) -> argparse.ArgumentParser:
         """创建命令行解析器"""
@@ -83,6 +88,96 @@ class ArgumentParser:
             help='\033[3m使用异步模式\033[0m'
         )
         
+        # 添加-o或--output参数
+        parser.add_argument(
+            '-o', '--output',
+            choices=OUTPUT_MODES,
+            default=None,
+            help='\033[3m输出模式: auto(默认，非终端时使用纯文本)、rich、text、jsonl\033[0m'
+        )
+        
+        # 添加--stats参数
+        parser.add_argument(
+            '--stats',
+            action='store_true',
+            default=None,
+            help='\033[3m显示请求耗时统计\033[0m'
+        )
+        
+        # 添加--no-cache参数
+        parser.add_argument(
+            '--no-cache',
+            action='store_false',
+            dest='cache',
+            default=None,
+            help='\033[3m不使用响应缓存\033[0m'
+        )
+        
+        # 添加--session参数
+        parser.add_argument(
+            '-s', '--session',
+            metavar='NAME',
+            default=None,
+            help='\033[3m使用命名会话，保存并恢复对话历史\033[0m'
+        )
+        
+        # 添加-i或--interactive参数
+        parser.add_argument(
+            '-i', '--interactive',
+            action='store_true',
+            default=False,
+            help='\033[3m连续对话模式，在一个进程内连续提问\033[0m'
+        )
+        
+        # 添加--hedge参数
+        parser.add_argument(
+            '--hedge',
+            action='store_true',
+            default=None,
+            help='\033[3m对冲请求：首字超时后启动别名组中的其他提供方，采用最先输出的结果\033[0m'
+        )
+        
+        # 添加-M或--models参数
+        parser.add_argument(
+            '-M', '--models',
+            metavar='KEYS',
+            default=None,
+            help='\033[3m同时向多个模型提问，模型代号以逗号分隔，例如 l,i,e,d\033[0m'
+        )
+        
+        # 添加--batch参数
+        parser.add_argument(
+            '--batch',
+            metavar='FILE',
+            default=None,
+            help='\033[3m批量模式，并发运行JSONL文件中的问题\033[0m'
+        )
+        
+        parser.add_argument(
+            '--batch-output',
+            metavar='FILE',
+            default=None,
+            help='\033[3m批量结果文件，默认为 <输入文件名>.out.jsonl\033[0m'
+        )
+        
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            metavar='N',
+            default=None,
+            help='\033[3m批量模式的最大并发请求数，重建思维导图时为进程数\033[0m'
+        )
+        
+        # 添加--rebuild-mindmaps参数
+        parser.add_argument(
+            '--rebuild-mindmaps',
+            metavar='DIR',
+            nargs='?',
+            const='',
+            default=None,
+            help='\033[3m重建目录（默认 resource/md_cache）中内容或模板变化过的思维导图\033[0m'
+        )
+        
         # 添加自定义help选项
         parser.add_argument(
             '-h', '--help',
@@ -107,12 +202,35 @@ class ArgumentParser:
             args = self.parser.parse_args()
         except SystemExit:
             return None, False, False
+        self.args = args
+        
+        # 设置输出模式，无头模式下状态信息输出到标准错误
+        set_output_mode(args.output)
+        console.use_stderr(is_headless())
+        set_show_summary(args.stats)
+        set_cache_enabled(args.cache)
+        set_hedge_enabled(args.hedge)
         
         # 处理help选项
         if args.help:
             self.parser._print_message("")
             return None, False, False
         
+        # 重建思维导图不需要模型
+        if args.rebuild_mindmaps is not None:
+            return None, False, False
+        
+        # 多模型并发：位置参数中的模型代号也加入列表
+        if args.models:
+            from core.fanout import parse_model_keys
+            try:
+                args.models = parse_model_keys(",".join(filter(None, [args.model_name, args.models])))
+            except ValueError as e:
+                console.print(f"错误：{e}", style="bold red")
+                return None, False, False
+            console.print(f"已选择模型：[bold green]{', '.join(args.models)}[/]（并发请求）")
+            return args.models[0], args.mindmap, args.use_async
+        
         # 检查是否提供了模型名称
         if not args.model_name:
             self.parser._print_message("")
@@ -135,4 +253,13 @@ class ArgumentParser:
         if args.use_async:
             console.print("已启用异步模式", style="bold cyan")
         
+        if args.interactive:
+            console.print("已启用连续对话模式", style="bold cyan")
+        
+        if args.batch:
+            console.print(f"批量模式：[bold]{args.batch}[/]", style="bold cyan")
+        
+        if args.session:
+            console.print(f"会话：[bold]{args.session}[/]", style="cyan")
+        
         return args.model_name, args.mindmap, args.use_async 
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""
+批量模块 - 并发运行 JSONL 文件中的问题
+
+输入文件每行一个 JSON 对象：{"id": ..., "prompt": ..., 以及可选的 temperature 等采样参数}，
+也可以直接是问题字符串。结果在每个问题完成时追加写入输出文件，
+重新运行时跳过输出文件中已成功的问题，从中断处继续。
+"""
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from config import ADVANCED_SETTINGS
+from ui.console import Console
+
+# 输入中可以逐条覆盖的请求参数
+REQUEST_PARAMS = ("temperature", "max_tokens", "top_p", "presence_penalty", "frequency_penalty")
+
+
+def default_output_path(input_path: Path) -> Path:
+    """默认输出文件：与输入文件同目录的 <文件名>.out.jsonl"""
+    return input_path.with_name(f"{input_path.stem}.out.jsonl")
+
+
+def load_prompts(path: Path) -> List[Dict[str, Any]]:
+    """
+    读取输入文件
+
+    Args:
+        path: 输入文件路径
+
+    Returns:
+        问题列表，每项包含 id、prompt 和可选的请求参数（未指定 id 时使用行号）
+
+    Raises:
+        ValueError: 某行不是合法的 JSON 或缺少问题内容
+    """
+    prompts = []
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"{path} 第 {line_number} 行不是合法的JSON: {e}") from None
+            if isinstance(item, str):
+                item = {"prompt": item}
+            if not isinstance(item, dict) or not item.get("prompt"):
+                raise ValueError(f"{path} 第 {line_number} 行缺少 prompt")
+            item.setdefault("id", line_number)
+            prompts.append(item)
+    return prompts
+
+
+def load_completed(path: Path) -> Set[str]:
+    """
+    读取输出文件中已成功的问题ID（忽略崩溃时写了一半的最后一行）
+
+    Args:
+        path: 输出文件路径
+
+    Returns:
+        已完成的问题ID集合（统一转换为字符串比较）
+    """
+    completed = set()
+    if not path.exists():
+        return completed
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(row, dict) and not row.get("error"):
+                completed.add(str(row.get("id")))
+    return completed
+
+
+def _open_output(path: Path):
+    """以追加方式打开输出文件，上次中断在行中间时先补上换行"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(path, "a+b")
+    if f.tell():
+        f.seek(-1, 2)
+        if f.read(1) != b"\n":
+            f.write(b"\n")
+    return f
+
+
+async def run_batch(instance, input_path: Path, output_path: Optional[Path] = None,
+                    concurrency: Optional[int] = None) -> Tuple[int, int]:
+    """
+    并发运行输入文件中尚未完成的问题
+
+    Args:
+        instance: 已初始化的模型实例（需要支持 complete_async）
+        input_path: 输入文件路径
+        output_path: 输出文件路径，为None时使用 default_output_path
+        concurrency: 最大并发请求数，为None时使用 batch_concurrency 配置
+
+    Returns:
+        (成功数, 失败数)
+    """
+    console = Console()
+    if not instance.supports_complete_async:
+        raise ValueError(f"模型 {instance.model_key} 不支持批量模式")
+
+    input_path = Path(input_path)
+    output_path = Path(output_path) if output_path else default_output_path(input_path)
+    concurrency = max(1, concurrency or ADVANCED_SETTINGS.get("batch_concurrency", 8))
+
+    prompts = load_prompts(input_path)
+    completed = load_completed(output_path)
+    pending = [item for item in prompts if str(item["id"]) not in completed]
+    if completed:
+        console.print(f"已完成 {len(prompts) - len(pending)} 个问题，继续剩余的 {len(pending)} 个", style="dim")
+    if not pending:
+        return 0, 0
+
+    queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+    for item in pending:
+        queue.put_nowait(item)
+    counts = {"ok": 0, "error": 0}
+
+    with _open_output(output_path) as output, console.create_progress() as progress:
+        task = progress.add_task(f"批量请求（并发 {concurrency}）", total=len(pending))
+
+        async def worker() -> None:
+            while True:
+                try:
+                    item = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                row = {"id": item["id"], "model": instance.model_id}
+                params = {key: item[key] for key in REQUEST_PARAMS if key in item}
+                started = time.perf_counter()
+                try:
+                    result = await instance.complete_async(item["prompt"], **params)
+                    row.update(content=result.content, reasoning=result.reasoning or None)
+                    counts["ok"] += 1
+                except Exception as e:
+                    row["error"] = f"{type(e).__name__}: {e}"
+                    counts["error"] += 1
+                row["elapsed"] = round(time.perf_counter() - started, 3)
+                # 每完成一个立即写入，崩溃后最多丢失正在进行的请求
+                output.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+                output.flush()
+                progress.advance(task)
+
+        await asyncio.gather(*(worker() for _ in range(min(concurrency, len(pending)))))
+
+    return counts["ok"], counts["error"]
@@ -0,0 +1,351 @@
+"""
+响应缓存模块 - 按请求内容寻址的本地响应缓存
+
+缓存存放在 SQLite（WAL模式）中，多个CLI进程可以同时读写；
+超过容量上限时按最近访问时间（LRU）淘汰，超过有效期的条目视为未命中。
+缓存读写失败（如数据库被长时间锁定）时按未命中处理，不影响正常请求。
+
+每个条目同时保存问题的MinHash签名和LSH桶键，用于查找措辞略有不同的近似重复问题；
+近似查找只在相同作用域（模型、对话上下文和采样参数都相同）内进行。
+"""
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, List, Mapping, NamedTuple, Optional, Tuple
+
+from config import ADVANCED_SETTINGS
+from core import minhash
+from core.utils import project_path
+
+
+# 参与缓存键计算的采样参数
+SAMPLING_PARAMS = ("temperature", "top_p", "max_tokens", "presence_penalty", "frequency_penalty")
+
+# 是否启用缓存（None表示使用配置）
+_cache_enabled: Optional[bool] = None
+_cache: Optional["ResponseCache"] = None
+_cache_lock = threading.Lock()
+
+
+class CachedResponse(NamedTuple):
+    """缓存的响应"""
+    key: str
+    model_id: str
+    prompt: str
+    content: str
+    reasoning: str
+    created: float
+
+
+class CacheKey(NamedTuple):
+    """请求的缓存键"""
+    key: str  # 精确匹配键（包含本轮问题）
+    scope: str  # 近似匹配作用域（不含本轮问题）
+
+
+def normalize_text(text: str) -> str:
+    """规范化文本：统一换行符，去掉首尾空白和行尾空白"""
+    return "\n".join(line.rstrip() for line in text.strip().splitlines())
+
+
+def make_cache_key(model_id: str, messages: List[Mapping[str, Any]], params: Optional[Mapping[str, Any]] = None) -> str:
+    """
+    计算缓存键
+
+    Args:
+        model_id: 模型ID
+        messages: 请求消息列表
+        params: 采样参数等影响输出的参数
+
+    Returns:
+        缓存键（SHA-256十六进制）
+    """
+    payload = {
+        "model": model_id,
+        "messages": [[m["role"], normalize_text(m.get("content") or "")] for m in messages],
+        "params": dict(sorted((params or {}).items())),
+    }
+    data = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def make_cache_keys(model_id: str, messages: List[Mapping[str, Any]], params: Optional[Mapping[str, Any]] = None) -> CacheKey:
+    """
+    计算请求的精确匹配键和近似匹配作用域
+
+    Args:
+        model_id: 模型ID
+        messages: 请求消息列表，最后一条为本轮问题
+        params: 采样参数等影响输出的参数
+
+    Returns:
+        缓存键
+    """
+    return CacheKey(make_cache_key(model_id, messages, params), make_cache_key(model_id, messages[:-1], params))
+
+
+class ResponseCache:
+    """SQLite响应缓存"""
+
+    def __init__(self,
+                 path: Path,
+                 max_entries: int = 5000,
+                 max_bytes: int = 200 * 1024 * 1024,
+                 ttl: Optional[float] = None):
+        """
+        Args:
+            path: 数据库文件路径
+            max_entries: 最大条目数
+            max_bytes: 缓存内容的最大总字节数
+            ttl: 有效期（秒），为None时永不过期
+        """
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        # INSERT OR REPLACE 替换旧条目时也触发删除触发器，保持统计和索引一致
+        self._conn.execute("PRAGMA recursive_triggers=ON")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " model_id TEXT NOT NULL,"
+            " prompt TEXT NOT NULL,"
+            " content TEXT NOT NULL,"
+            " reasoning TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " accessed REAL NOT NULL,"
+            " scope TEXT,"
+            " signature BLOB)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(responses)")}
+        for column, column_type in (("scope", "TEXT"), ("signature", "BLOB")):
+            if column not in columns:
+                try:
+                    self._conn.execute(f"ALTER TABLE responses ADD COLUMN {column} {column_type}")
+                except sqlite3.OperationalError:
+                    pass  # 其他进程已完成升级
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses(accessed)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses(created)")
+        # 条目数和总字节数由触发器维护，写入时无需扫描全表
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS stats ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " entries INTEGER NOT NULL,"
+            " bytes INTEGER NOT NULL)"
+        )
+        self._conn.execute(
+            "INSERT OR IGNORE INTO stats (id, entries, bytes)"
+            " SELECT 0, COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        )
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS responses_insert AFTER INSERT ON responses"
+            " BEGIN UPDATE stats SET entries = entries + 1, bytes = bytes + new.size WHERE id = 0; END"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS lsh_buckets ("
+            " bucket INTEGER NOT NULL,"
+            " key TEXT NOT NULL,"
+            " PRIMARY KEY (bucket, key)) WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS lsh_buckets_key ON lsh_buckets(key)")
+        self._conn.execute(
+            "CREATE TRIGGER IF NOT EXISTS responses_evict AFTER DELETE ON responses"
+            " BEGIN"
+            " DELETE FROM lsh_buckets WHERE key = old.key;"
+            " UPDATE stats SET entries = entries - 1, bytes = bytes - old.size WHERE id = 0;"
+            " END"
+        )
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def get(self, key: str) -> Optional[CachedResponse]:
+        """
+        查询缓存
+
+        Args:
+            key: 缓存键
+
+        Returns:
+            缓存的响应，未命中或已过期时返回None
+        """
+        now = time.time()
+        try:
+            return self._get(key, now)
+        except sqlite3.Error:
+            return None
+
+    def _get(self, key: str, now: float) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT key, model_id, prompt, content, reasoning, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            entry = CachedResponse(*row)
+            if self._expired(entry.created, now):
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return entry
+
+    def find_similar(self, scope: str, prompt: str, threshold: float) -> Optional[Tuple[CachedResponse, float]]:
+        """
+        在同一作用域内查找近似重复的问题
+
+        Args:
+            scope: 近似匹配作用域
+            prompt: 用户问题
+            threshold: 相似度阈值（字符片段的Jaccard相似度）
+
+        Returns:
+            (最相似的缓存响应, 相似度)，没有达到阈值的条目时返回None
+        """
+        prompt_shingles = minhash.shingles(prompt)
+        sig = minhash.signature(prompt_shingles)
+        buckets = minhash.band_buckets(sig)
+        if not buckets:
+            return None
+        now = time.time()
+        try:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT key, model_id, prompt, content, reasoning, created, signature FROM responses"
+                    f" WHERE key IN (SELECT key FROM lsh_buckets WHERE bucket IN ({','.join('?' * len(buckets))}))"
+                    " AND scope = ?",
+                    (*buckets, scope)
+                ).fetchall()
+        except sqlite3.Error:
+            return None
+
+        # 先按签名估计相似度排序，再对前几个候选计算精确相似度
+        candidates = sorted(
+            ((minhash.similarity(sig, minhash.unpack_signature(row[6])), row) for row in rows
+             if not self._expired(row[5], now)),
+            key=lambda item: item[0], reverse=True
+        )
+        best = None
+        for estimate, row in candidates[:8]:
+            score = minhash.jaccard(prompt_shingles, minhash.shingles(row[2]))
+            if score >= threshold and (best is None or score > best[1]):
+                best = (CachedResponse(*row[:6]), score)
+        if best is not None:
+            try:
+                with self._lock:
+                    self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, best[0].key))
+            except sqlite3.Error:
+                pass
+        return best
+
+    def put(self,
+            key: str,
+            model_id: str,
+            prompt: str,
+            content: str,
+            reasoning: str = "",
+            scope: Optional[str] = None) -> None:
+        """
+        写入缓存，必要时淘汰过期和最久未访问的条目
+
+        Args:
+            key: 缓存键
+            model_id: 模型ID
+            prompt: 用户问题
+            content: 结论内容
+            reasoning: 思考内容
+            scope: 近似匹配作用域，为None时不加入近似查找索引
+        """
+        now = time.time()
+        size = len(content.encode("utf-8")) + len(reasoning.encode("utf-8"))
+        sig = minhash.signature(minhash.shingles(prompt)) if scope is not None else []
+        with self._lock:
+            try:
+                self._conn.execute("BEGIN IMMEDIATE")
+            except sqlite3.Error:
+                return
+            try:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO responses"
+                    " (key, model_id, prompt, content, reasoning, size, created, accessed, scope, signature)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, model_id, prompt, content, reasoning, size, now, now, scope, minhash.pack_signature(sig))
+                )
+                self._conn.executemany(
+                    "INSERT OR IGNORE INTO lsh_buckets (bucket, key) VALUES (?, ?)",
+                    [(bucket, key) for bucket in minhash.band_buckets(sig)]
+                )
+                self._evict(now)
+                self._conn.execute("COMMIT")
+            except sqlite3.Error:
+                self._conn.execute("ROLLBACK")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, now: float) -> None:
+        """淘汰过期条目，并按LRU淘汰超出容量的条目"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        count, total = self._conn.execute("SELECT entries, bytes FROM stats WHERE id = 0").fetchone()
+        if count <= self.max_entries and total <= self.max_bytes:
+            return
+        evicted = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed"):
+            if count <= self.max_entries and total <= self.max_bytes:
+                break
+            evicted.append((key,))
+            count -= 1
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT entries FROM stats WHERE id = 0").fetchone()[0]
+
+    def close(self) -> None:
+        """关闭数据库连接"""
+        with self._lock:
+            self._conn.close()
+
+
+def set_cache_enabled(enabled: Optional[bool]) -> None:
+    """设置是否启用响应缓存（None表示使用配置）"""
+    global _cache_enabled
+    _cache_enabled = enabled
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """
+    获取按配置创建的响应缓存
+
+    Returns:
+        响应缓存，未启用时返回None
+    """
+    global _cache, _cache_enabled
+    enabled = _cache_enabled if _cache_enabled is not None else ADVANCED_SETTINGS.get("cache_enabled", False)
+    if not enabled:
+        return None
+    with _cache_lock:
+        if _cache is None:
+            cache_dir = project_path(ADVANCED_SETTINGS.get("cache_dir", "cache"))
+            try:
+                _cache = ResponseCache(
+                    cache_dir / "responses.sqlite3",
+                    max_entries=ADVANCED_SETTINGS.get("cache_max_entries", 5000),
+                    max_bytes=ADVANCED_SETTINGS.get("cache_max_bytes", 200 * 1024 * 1024),
+                    ttl=ADVANCED_SETTINGS.get("cache_ttl"),
+                )
+            except (OSError, sqlite3.Error):
+                # 缓存目录不可写等情况下本次运行不使用缓存
+                _cache_enabled = False
+                return None
+        return _cache
@@ -0,0 +1,217 @@
+"""
+HTTP客户端池 - 在模型实例之间共享OpenAI客户端和连接池
+"""
+import asyncio
+import atexit
+import importlib.util
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+from config import ADVANCED_SETTINGS, HTTP_CLIENT_CONFIG
+
+
+class ClientPool:
+    """
+    客户端池
+
+    - OpenAI/AsyncOpenAI 客户端按 (base_url, api_key) 复用，只在首次使用时创建
+    - 底层 httpx 连接池按协议+主机共享，同一主机上的不同模型、不同密钥复用
+      已建立的keep-alive连接，后续请求无需重新TLS握手
+    - 异步客户端绑定事件循环，按循环分别缓存；asyncio.run 结束时关闭该循环的连接池，
+      未结束剩余任务就关闭的循环在下次获取客户端时丢弃
+    """
+
+    _lock = threading.Lock()
+    _http_clients: Dict[Tuple[Any, ...], Any] = {}
+    _clients: Dict[Tuple[Any, ...], Any] = {}
+    # 按事件循环分别缓存异步客户端（连接池本身引用循环，条目由守护任务或关闭检查移除）
+    _loops: Dict[asyncio.AbstractEventLoop, "_LoopClients"] = {}
+    # 没有运行中的事件循环时创建的异步客户端
+    _unbound: "_LoopClients"
+
+    @staticmethod
+    def _origin(base_url: Optional[str]) -> str:
+        """获取连接池的共享键（协议+主机）"""
+        if not base_url:
+            return "https://api.openai.com"
+        parts = urlsplit(base_url)
+        return f"{parts.scheme}://{parts.netloc}"
+
+    @staticmethod
+    def _http_options() -> Dict[str, Any]:
+        """根据配置生成 httpx 客户端参数"""
+        import httpx
+
+        # HTTP/2 需要安装 h2，未安装时回退到 HTTP/1.1
+        http2 = HTTP_CLIENT_CONFIG.get("http2", False) and importlib.util.find_spec("h2") is not None
+        return {
+            "limits": httpx.Limits(
+                max_connections=HTTP_CLIENT_CONFIG.get("max_connections"),
+                max_keepalive_connections=HTTP_CLIENT_CONFIG.get("max_keepalive_connections"),
+                keepalive_expiry=HTTP_CLIENT_CONFIG.get("keepalive_expiry"),
+            ),
+            "http2": http2,
+        }
+
+    @staticmethod
+    def _client_options() -> Dict[str, Any]:
+        """OpenAI客户端参数：超时按配置设置，重试由 core.resilience 统一处理"""
+        import httpx
+
+        return {
+            "timeout": httpx.Timeout(ADVANCED_SETTINGS.get("timeout", 60),
+                                     connect=ADVANCED_SETTINGS.get("connect_timeout", 10)),
+            "max_retries": 0,
+        }
+
+    @classmethod
+    def get_client(cls, base_url: Optional[str], api_key: Optional[str]):
+        """
+        获取同步客户端
+
+        Args:
+            base_url: API基础URL，为空时使用OpenAI默认地址
+            api_key: API密钥
+
+        Returns:
+            OpenAI客户端
+        """
+        key = ("sync", base_url, api_key)
+        with cls._lock:
+            client = cls._clients.get(key)
+            if client is None:
+                from openai import OpenAI, DefaultHttpxClient
+
+                http_key = ("sync", cls._origin(base_url))
+                http_client = cls._http_clients.get(http_key)
+                if http_client is None:
+                    http_client = cls._http_clients[http_key] = DefaultHttpxClient(**cls._http_options())
+                client = cls._clients[key] = OpenAI(
+                    base_url=base_url or None,
+                    api_key=api_key,
+                    http_client=http_client,
+                    **cls._client_options()
+                )
+            return client
+
+    @classmethod
+    def get_async_client(cls, base_url: Optional[str], api_key: Optional[str]):
+        """
+        获取当前事件循环的异步客户端
+
+        Args:
+            base_url: API基础URL，为空时使用OpenAI默认地址
+            api_key: API密钥
+
+        Returns:
+            AsyncOpenAI客户端
+        """
+        with cls._lock:
+            state = cls._loop_state()
+            client = state.clients.get((base_url, api_key))
+            if client is None:
+                from openai import AsyncOpenAI
+
+                client = state.clients[(base_url, api_key)] = AsyncOpenAI(
+                    base_url=base_url or None,
+                    api_key=api_key,
+                    http_client=cls._async_http_client(state, base_url),
+                    **cls._client_options()
+                )
+            return client
+
+    @classmethod
+    def _loop_state(cls) -> "_LoopClients":
+        """获取当前事件循环的异步客户端缓存（调用方持有锁）"""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return cls._unbound
+
+        # 丢弃未结束剩余任务就关闭的事件循环的客户端，释放其连接
+        for closed in [other for other in cls._loops if other.is_closed()]:
+            state = cls._loops.pop(closed)
+            # 守护任务所在的循环已关闭，无法再取消
+            state.closer._log_destroy_pending = False
+
+        state = cls._loops.get(loop)
+        if state is None:
+            state = cls._loops[loop] = _LoopClients()
+            state.closer = loop.create_task(cls._close_on_shutdown(loop, state), name="ClientPool.close")
+        return state
+
+    @classmethod
+    async def _close_on_shutdown(cls, loop: Any, state: "_LoopClients") -> None:
+        """
+        守护任务：事件循环结束时（asyncio.run 取消剩余任务）关闭该循环的连接池
+
+        Args:
+            loop: 事件循环
+            state: 该循环的异步客户端缓存
+        """
+        try:
+            await loop.create_future()
+        except asyncio.CancelledError:
+            with cls._lock:
+                if cls._loops.get(loop) is state:
+                    del cls._loops[loop]
+            for http_client in state.http_clients.values():
+                await http_client.aclose()
+            state.clients.clear()
+            state.http_clients.clear()
+            raise
+
+    @classmethod
+    def _async_http_client(cls, state: "_LoopClients", base_url: Optional[str]):
+        """获取事件循环中按主机共享的异步连接池（调用方持有锁）"""
+        from openai import DefaultAsyncHttpxClient
+
+        origin = cls._origin(base_url)
+        http_client = state.http_clients.get(origin)
+        if http_client is None:
+            http_client = state.http_clients[origin] = DefaultAsyncHttpxClient(**cls._http_options())
+        return http_client
+
+    @classmethod
+    async def warm_up_async(cls, base_url: Optional[str]) -> None:
+        """
+        预先建立当前事件循环到服务地址的连接（完成TLS握手后放回连接池），失败时忽略
+
+        Args:
+            base_url: API基础URL
+        """
+        with cls._lock:
+            http_client = cls._async_http_client(cls._loop_state(), base_url)
+        try:
+            await http_client.head(cls._origin(base_url), timeout=ADVANCED_SETTINGS.get("connect_timeout", 10))
+        except Exception:
+            pass
+
+    @classmethod
+    def close(cls) -> None:
+        """
+        关闭所有同步连接池
+
+        异步连接池由各事件循环的守护任务在循环结束时关闭；这里只丢弃对它们的引用。
+        """
+        with cls._lock:
+            for http_client in cls._http_clients.values():
+                http_client.close()
+            cls._http_clients.clear()
+            cls._clients.clear()
+            cls._loops.clear()
+            cls._unbound = _LoopClients()
+
+
+class _LoopClients:
+    """一个事件循环的异步客户端（按 (base_url, api_key)）和连接池（按协议+主机）"""
+
+    def __init__(self):
+        self.clients: Dict[Tuple[Optional[str], Optional[str]], Any] = {}
+        self.http_clients: Dict[str, Any] = {}
+        self.closer: Optional[asyncio.Task] = None
+
+
+ClientPool._unbound = _LoopClients()
+atexit.register(ClientPool.close)
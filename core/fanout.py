@@ -0,0 +1,151 @@
+"""
+多模型并发模块 - 把同一个问题同时发给多个模型
+
+各模型的请求在同一个事件循环中并发进行，总耗时等于最慢的模型；
+终端中每个模型流式输出到各自的区域，结束后显示耗时和长度的对比表。
+"""
+import asyncio
+import json
+import sys
+from typing import List, NamedTuple, Optional, Sequence
+
+from core.metrics import RequestMetrics
+from core.registry import ModelRegistry
+from ui.console import Console
+from ui.output import get_output_mode, is_headless
+
+
+class FanoutResult(NamedTuple):
+    """单个模型的结果"""
+    model_key: str
+    display_name: str
+    content: str
+    reasoning: str
+    metrics: RequestMetrics
+    error: Optional[str] = None
+
+
+def parse_model_keys(value: str) -> List[str]:
+    """
+    解析逗号分隔的模型代号列表（去重并保持顺序）
+
+    Args:
+        value: 如 "l,i,e,d"
+
+    Returns:
+        模型代号列表
+
+    Raises:
+        ValueError: 包含未知的模型代号
+    """
+    keys = list(dict.fromkeys(key.strip() for key in value.split(",") if key.strip()))
+    unknown = [key for key in keys if ModelRegistry.get_model_class(key) is None]
+    if unknown:
+        raise ValueError(f"未知模型代号: {', '.join(unknown)}")
+    if not keys:
+        raise ValueError("请至少指定一个模型代号")
+    return keys
+
+
+async def _ask(model_key: str, content: str, region=None, **kwargs) -> FanoutResult:
+    """请求单个模型，出错时记录在结果中而不影响其他模型"""
+    registry = ModelRegistry()
+    display_name = registry.get_model_config(model_key)["display_name"]
+    metrics = RequestMetrics(model_key)
+    try:
+        instance = registry.create_instance(model_key)
+        instance.initialize()
+        metrics.model_id = instance.model_id
+        result = await instance.complete_async(content, sinks=[region] if region is not None else (),
+                                               metrics=metrics, **kwargs)
+    except Exception as e:
+        metrics.finish(e)
+        if region is not None:
+            region.finish(f"失败: {type(e).__name__}", error=True)
+        return FanoutResult(model_key, display_name, "", "", metrics, metrics.error)
+
+    if region is not None:
+        region.finish(f"完成 {metrics.to_dict()['total']:.1f}s")
+    return FanoutResult(model_key, display_name, result.content, result.reasoning, metrics)
+
+
+async def run_fanout(model_keys: Sequence[str], content: str, **kwargs) -> List[FanoutResult]:
+    """
+    把同一个问题并发发给多个模型
+
+    终端中各模型流式输出到各自的区域；无头模式下不流式输出，全部完成后按顺序输出结果。
+
+    Args:
+        model_keys: 模型代号列表
+        content: 问题
+        **kwargs: 其他请求参数
+
+    Returns:
+        各模型的结果（与 model_keys 顺序一致）
+    """
+    if is_headless():
+        return list(await asyncio.gather(*(_ask(key, content, **kwargs) for key in model_keys)))
+
+    from ui.console import LiveStreamSink, ModelRegion
+
+    registry = ModelRegistry()
+    regions = [ModelRegion(registry.get_model_config(key)["display_name"]) for key in model_keys]
+    display = Console().create_fanout_display(regions)
+    frame_interval = LiveStreamSink.frame_interval()
+
+    async def refresh() -> None:
+        while True:
+            await asyncio.sleep(frame_interval)
+            display.refresh()
+
+    display.start()
+    refresher = asyncio.create_task(refresh())
+    try:
+        return list(await asyncio.gather(*(_ask(key, content, region, **kwargs)
+                                           for key, region in zip(model_keys, regions))))
+    finally:
+        refresher.cancel()
+        display.stop()
+
+
+def print_results(results: Sequence[FanoutResult]) -> None:
+    """
+    输出结果：终端中显示对比表，无头模式下按输出模式输出各模型的回答
+
+    Args:
+        results: 各模型的结果
+    """
+    mode = get_output_mode()
+    if mode == "jsonl":
+        for result in results:
+            row = {"type": "result", "model": result.model_key, "content": result.content,
+                   "reasoning": result.reasoning or None, "error": result.error}
+            sys.stdout.write(json.dumps(row, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+        return
+    if mode != "rich":
+        for result in results:
+            sys.stdout.write(f"=== {result.display_name} ({result.model_key}) ===\n")
+            sys.stdout.write((result.content or f"[错误] {result.error}").rstrip("\n") + "\n\n")
+        sys.stdout.flush()
+        return
+
+    def seconds(value: Optional[float]) -> str:
+        return "-" if value is None else f"{value:.2f}s"
+
+    rows = []
+    for result in results:
+        record = result.metrics.to_dict()
+        first = [value for value in (record["ttft_reasoning"], record["ttft_content"]) if value is not None]
+        status = "失败" if result.error else ("缓存" if record["cached"] else "完成")
+        rows.append([
+            result.display_name,
+            seconds(min(first) if first else None),
+            seconds(record["total"]),
+            f"{record['reasoning_chars']}/{record['content_chars']}",
+            "-" if record["chars_per_sec"] is None else f"{record['chars_per_sec']:.0f}",
+            status,
+        ])
+    console = Console()
+    console.print("")
+    console.print_table("模型对比", ["模型", "首字延迟", "总耗时", "思考/结论字数", "字/s", "状态"], rows)
@@ -0,0 +1,304 @@
+"""
+对冲请求模块 - 在等价的多个提供方之间竞速
+
+先请求首选提供方，超过 hedge_delay 秒仍没有首字（或请求失败）时启动组内下一个提供方；
+最先产出内容的流胜出，其余请求立即取消并关闭连接，不再消耗token。
+等价的提供方在 config.MODEL_ALIAS_GROUPS 中声明。
+"""
+import asyncio
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from config import ADVANCED_SETTINGS, MODEL_ALIAS_GROUPS
+from core.metrics import RequestMetrics, report_metrics
+from core.model import BaseModel
+from core.openai_model import OpenAICompatibleModel
+from core.registry import ModelRegistry
+from core.resilience import call_with_retries_async, close_stream_async, request_error
+from core.stream import StreamAccumulator, StreamPipeline, StreamSink, openai_events
+from ui.console import Console
+
+if TYPE_CHECKING:
+    from core.keys import KeyLease
+
+# 是否启用对冲（None表示不启用）
+_hedge_enabled: Optional[bool] = None
+
+
+def set_hedge_enabled(enabled: Optional[bool]) -> None:
+    """设置是否对别名组中的模型使用对冲请求"""
+    global _hedge_enabled
+    _hedge_enabled = enabled
+
+
+def hedge_enabled() -> bool:
+    """是否启用对冲请求"""
+    return bool(_hedge_enabled)
+
+
+def find_alias_group(model_key: str) -> Optional[List[str]]:
+    """
+    查找模型所在的别名组
+
+    Args:
+        model_key: 模型代号
+
+    Returns:
+        以该模型开头、其余提供方按配置顺序排列的模型代号列表，不在任何组中时为None
+    """
+    for keys in MODEL_ALIAS_GROUPS.values():
+        if model_key in keys:
+            return [model_key, *(key for key in keys if key != model_key)]
+    return None
+
+
+class _PrefetchedStream:
+    """已读出首个有内容数据块的流：先产出缓冲的数据块，再继续读取原始流"""
+
+    def __init__(self, stream: Any, iterator: AsyncIterator[Any], buffered: List[Any],
+                 lease: Optional["KeyLease"] = None):
+        self._stream = stream
+        self._iterator = iterator
+        self._buffered = buffered
+        self.lease = lease  # 胜出请求的密钥租约，输出结束后按实际输出结算限流额度
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        for chunk in self._buffered:
+            yield chunk
+        async for chunk in self._iterator:
+            yield chunk
+
+    async def close(self) -> None:
+        await close_stream_async(self._stream)
+
+
+class HedgedModel(BaseModel):
+    """
+    对冲请求模型
+
+    组合同一别名组中的多个 OpenAI 兼容模型实例，成员共享本实例的对话历史；
+    回答和请求统计记录实际胜出的提供方。
+    """
+
+    def __init__(self, model_keys: Sequence[str], delay: Optional[float] = None):
+        """
+        Args:
+            model_keys: 按优先顺序排列的模型代号
+            delay: 启动下一个提供方前等待首字的时间（秒），为None时使用 hedge_delay 配置
+        """
+        super().__init__()
+        registry = ModelRegistry()
+        self.members: List[OpenAICompatibleModel] = [registry.create_instance(key) for key in model_keys]
+        for member in self.members:
+            if not isinstance(member, OpenAICompatibleModel):
+                raise ValueError(f"模型 {member.model_key} 不是OpenAI兼容模型，无法对冲请求")
+        self.delay = ADVANCED_SETTINGS.get("hedge_delay", 3.0) if delay is None else delay
+        primary = self.members[0]
+        self._model_key = primary.model_key
+        self._model_config = {**primary.model_config, "display_name": f"{primary.model_config['display_name']}（对冲）"}
+        self.winner: Optional[str] = None  # 最近一次胜出的模型代号
+        self._runner: Optional[asyncio.Runner] = None
+
+    def _initialize(self) -> None:
+        """初始化全部成员，成员与本实例共享对话历史"""
+        for member in self.members:
+            member.initialize()
+            member.history = self.history
+
+    @property
+    def answered_by(self) -> Optional[str]:
+        return self.winner or self._model_key
+
+    def _cache_key(self, content: str, **kwargs):
+        """按首选提供方计算缓存键（组内提供方的回答可以互相替代）"""
+        return self.members[0]._cache_key(content, **kwargs)
+
+    async def _open(self, member: OpenAICompatibleModel, lease: Optional["KeyLease"],
+                    params: Dict[str, Any]) -> Tuple[Any, AsyncIterator[Any], List[Any], float]:
+        """
+        发起流式请求并读到第一个有内容的数据块
+
+        Args:
+            member: 提供方
+            lease: 密钥租约（每次尝试时选择的密钥），为None时使用提供方的默认客户端
+            params: 请求参数
+
+        Returns:
+            (原始流, 流的迭代器, 已读取的数据块, 连接建立时刻)
+        """
+        stream = await member._create_async(lease, params)
+        connected = time.perf_counter()
+        iterator = stream.__aiter__()
+        buffered = []
+        try:
+            while True:
+                try:
+                    chunk = await iterator.__anext__()
+                except StopAsyncIteration:
+                    break
+                buffered.append(chunk)
+                if any(event.text for event in openai_events(chunk)):
+                    break
+        except BaseException:
+            # 失败或被取消（落选）时立即关闭连接
+            await close_stream_async(stream)
+            raise
+        return stream, iterator, buffered, connected
+
+    async def _race(self, content: str, metrics: RequestMetrics, **kwargs) -> _PrefetchedStream:
+        """
+        在组内提供方之间竞速，返回胜出的流
+
+        Args:
+            content: 用户输入内容
+            metrics: 请求统计（记录胜出的提供方和发起的提供方数）
+            **kwargs: 其他参数
+
+        Returns:
+            胜出的流
+
+        Raises:
+            Exception: 所有提供方都失败时抛出最后一个错误
+        """
+        waiting = list(self.members)
+        running: Dict[asyncio.Task, OpenAICompatibleModel] = {}
+        leases: Dict[OpenAICompatibleModel, Optional["KeyLease"]] = {}
+        errors: List[BaseException] = []
+        winner = None
+
+        def launch() -> None:
+            member = waiting.pop(0)
+            params = member._get_request_params(content, **{**kwargs, "stream": True})
+            # 每个提供方从各自的密钥池租用密钥并预约该密钥的限流额度
+            lease = leases[member] = member._lease(params)
+            # 对冲本身就是重试，各提供方不再单独重试，但仍经过各自的限流器和熔断器
+            opener = call_with_retries_async(lambda: self._open(member, lease, params), member._base_url,
+                                             retries=0, name=member.model_config["display_name"], ticket=lease)
+            running[asyncio.ensure_future(opener)] = member
+            metrics.hedge_attempts = len(self.members) - len(waiting)
+
+        launch()
+        try:
+            while running:
+                done, _ = await asyncio.wait(running, timeout=self.delay if waiting else None,
+                                             return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    # 等待首字超时，启动下一个提供方
+                    launch()
+                    continue
+                for task in done:
+                    member = running.pop(task)
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                        Console().print(f"提供方 {member.model_key} 请求失败: {task.exception()}", style="dim red")
+                    elif winner is None:
+                        winner = (member, task.result())
+                    else:
+                        await close_stream_async(task.result()[0])
+                if winner is not None:
+                    break
+                # 有提供方失败时立即启动下一个
+                if waiting:
+                    launch()
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            # 失败和落选的请求没有输出，退还预约的输出额度
+            for member, lease in leases.items():
+                if lease is not None and (winner is None or member is not winner[0]):
+                    lease.settle(0)
+
+        if winner is None:
+            raise errors[-1]
+        member, (stream, iterator, buffered, connected) = winner
+        self.winner = metrics.model_key = member.model_key
+        metrics.model_id = member.model_id
+        metrics.connected = connected
+        return _PrefetchedStream(stream, iterator, buffered, leases[member])
+
+    async def _stream_async(self, content: str, **kwargs) -> str:
+        """竞速并实时输出胜出的流"""
+        from ui.output import render_stream_async
+
+        metrics = self.last_metrics = RequestMetrics(self._model_key, self.model_id)
+        stream = None
+        try:
+            stream = await self._race(content, metrics, **kwargs)
+            self.last_result = await render_stream_async(stream, metrics=metrics)
+            return self.last_result.content
+        except Exception as e:
+            metrics.finish(e)
+            raise
+        finally:
+            report_metrics(metrics.finish())
+            if stream is not None and stream.lease is not None:
+                stream.lease.settle(metrics.output_tokens)
+
+    def _request_implementation(self, content: str, **kwargs) -> str:
+        """同步请求：在本实例持有的事件循环中竞速，连接池在多次提问之间保持"""
+        self.winner = None
+        if self._runner is None:
+            self._runner = asyncio.Runner()
+        try:
+            return self._runner.run(self._stream_async(content, **kwargs))
+        except Exception as e:
+            raise request_error(self._model_config.get("display_name", "未知"), e) from e
+
+    async def request_async(self, content: str, **kwargs) -> str:
+        """
+        异步请求模型响应
+
+        Args:
+            content: 用户输入内容
+            **kwargs: 其他参数
+
+        Returns:
+            模型响应
+
+        Raises:
+            ModelRequestError: 所有提供方都失败
+        """
+        from core.utils import get_input
+
+        if content is None:
+            content = get_input(kwargs.get("conclusion"))
+
+        cache_key, response = self._check_cache(content, **kwargs)
+        if response is None:
+            self.last_result = None
+            self.winner = None
+            try:
+                response = await self._stream_async(content, **kwargs)
+            except Exception as e:
+                raise request_error(self._model_config.get("display_name", "未知"), e) from e
+            self._store_cache(cache_key, content)
+        self.add_turn(content, response)
+        return response
+
+    async def _complete_async(self, content: str, sinks: Sequence[StreamSink], metrics: RequestMetrics,
+                              **kwargs) -> StreamAccumulator:
+        """静默请求同样竞速，胜出的流输出到 sinks"""
+        stream = await self._race(content, metrics, **kwargs)
+        try:
+            return await StreamPipeline(openai_events, sinks, metrics=metrics).run_async(stream)
+        finally:
+            if stream.lease is not None:
+                stream.lease.settle(metrics.output_tokens)
+
+
+def create_hedged_model(model_key: str) -> Optional[HedgedModel]:
+    """
+    为别名组中的模型创建对冲请求模型
+
+    Args:
+        model_key: 首选模型代号
+
+    Returns:
+        对冲请求模型，模型不在任何别名组中（或组中只有它自己）时为None
+    """
+    keys = find_alias_group(model_key)
+    if not keys or len(keys) < 2:
+        return None
+    return HedgedModel(keys)
@@ -0,0 +1,207 @@
+"""
+对话历史模块 - 定长环形缓冲区保存的对话历史
+
+历史最多保留 max_history 轮（每轮一问一答），超出后覆盖最早的消息，
+长时间运行的会话内存占用保持不变。消息记录使用 __slots__，
+同时实现 Mapping 接口，可以直接作为请求消息发送。
+"""
+import time
+from bisect import bisect_left
+from collections.abc import Mapping, Sequence
+from typing import Any, Iterator, List, Optional, Union
+
+from core.tokens import message_tokens
+
+
+class Message(Mapping):
+    """
+    一条对话消息
+
+    作为 Mapping 只暴露 role 和 content 两个键，tokens、timestamp 和 model 作为属性访问。
+    """
+
+    __slots__ = ("role", "content", "tokens", "timestamp", "model")
+    _KEYS = ("role", "content")
+
+    def __init__(self, role: str, content: str, tokens: Optional[int] = None, timestamp: Optional[float] = None,
+                 model: Optional[str] = None):
+        self.role = role
+        self.content = content
+        self.tokens = message_tokens(self) if tokens is None else tokens
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.model = model  # 生成回答的模型代号（用户消息为None）
+
+    @classmethod
+    def from_mapping(cls, message: Mapping) -> "Message":
+        """从字典等映射创建消息"""
+        if isinstance(message, cls):
+            return message
+        return cls(message["role"], message["content"])
+
+    def __getitem__(self, key: str) -> str:
+        if key == "role":
+            return self.role
+        if key == "content":
+            return self.content
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return 2
+
+    def __repr__(self) -> str:
+        return f"Message({self.role!r}, {self.content!r}, tokens={self.tokens})"
+
+
+def _sequence_equal(sequence: Sequence, other: Any) -> bool:
+    """按元素比较历史与其他序列（如消息字典列表）"""
+    if isinstance(other, Sequence) and not isinstance(other, str):
+        return len(sequence) == len(other) and all(a == b for a, b in zip(sequence, other))
+    return NotImplemented
+
+
+class HistoryView(Sequence):
+    """历史的只读窗口，按需从环形缓冲区读取，不复制消息（在下一次修改历史之前有效）"""
+
+    __slots__ = ("_history", "_start", "_stop")
+
+    def __init__(self, history: "History", start: int, stop: int):
+        self._history = history
+        self._start = start
+        self._stop = stop
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Message, List[Message]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("历史窗口索引越界")
+        return self._history[self._start + index]
+
+    def __iter__(self) -> Iterator[Message]:
+        history = self._history
+        for index in range(self._start, self._stop):
+            yield history[index]
+
+    def __eq__(self, other: Any) -> bool:
+        return _sequence_equal(self, other)
+
+    def __repr__(self) -> str:
+        return f"HistoryView({list(self)!r})"
+
+
+class _CumulativeTokens(Sequence):
+    """累计token数的逻辑序列，供二分查找使用"""
+
+    __slots__ = ("_history",)
+
+    def __init__(self, history: "History"):
+        self._history = history
+
+    def __len__(self) -> int:
+        return len(self._history)
+
+    def __getitem__(self, index: int) -> int:
+        history = self._history
+        return history._cumulative[(history._head + index) % history.capacity]
+
+
+class History(Sequence):
+    """
+    定长环形缓冲区保存的对话历史
+
+    兼容列表的常用操作（append、len、迭代、下标、clear），
+    每条消息的累计token数随消息一起保存，选取窗口时二分查找起点。
+    """
+
+    def __init__(self, max_turns: int = 20):
+        """
+        Args:
+            max_turns: 最多保留的对话轮数
+        """
+        self.capacity = max(2, max_turns * 2)
+        self._items: List[Optional[Message]] = [None] * self.capacity
+        self._cumulative: List[int] = [0] * self.capacity
+        self._head = 0  # 最早一条消息的位置
+        self._size = 0
+        self._total = 0  # 从创建以来的累计token数（只增不减）
+
+    def append(self, message: Mapping) -> None:
+        """
+        添加一条消息，缓冲区已满时覆盖最早的消息
+
+        Args:
+            message: Message 或包含 role、content 的映射
+        """
+        message = Message.from_mapping(message)
+        self._total += message.tokens
+        if self._size < self.capacity:
+            position = (self._head + self._size) % self.capacity
+            self._size += 1
+        else:
+            position = self._head
+            self._head = (self._head + 1) % self.capacity
+        self._items[position] = message
+        self._cumulative[position] = self._total
+
+    def clear(self) -> None:
+        """清空历史"""
+        self._items = [None] * self.capacity
+        self._head = self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, index: Union[int, slice]) -> Union[Message, List[Message]]:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._size))]
+        if index < 0:
+            index += self._size
+        if not 0 <= index < self._size:
+            raise IndexError("历史索引越界")
+        return self._items[(self._head + index) % self.capacity]
+
+    def __iter__(self) -> Iterator[Message]:
+        for index in range(self._size):
+            yield self._items[(self._head + index) % self.capacity]
+
+    def __eq__(self, other: Any) -> bool:
+        return _sequence_equal(self, other)
+
+    def window(self, budget: int, max_messages: Optional[int] = None) -> HistoryView:
+        """
+        选择不超过token预算的最近历史消息
+
+        Args:
+            budget: token预算
+            max_messages: 最多消息条数，为None时不限制
+
+        Returns:
+            历史窗口（以用户消息开头）
+        """
+        size = self._size
+        if not size or budget <= 0:
+            return HistoryView(self, size, size)
+
+        cumulative = _CumulativeTokens(self)
+        # 第一条消息之前的累计值
+        base = cumulative[0] - self[0].tokens
+        if self._total - base <= budget:
+            start = 0
+        else:
+            start = bisect_left(cumulative, self._total - budget) + 1
+        if max_messages is not None:
+            start = max(start, size - max_messages)
+        # 不以孤立的助手回答开头
+        while start < size and self[start].role != "user":
+            start += 1
+        return HistoryView(self, start, size)
+
+    def __repr__(self) -> str:
+        return f"History({list(self)!r})"
@@ -0,0 +1,226 @@
+"""
+密钥池模块 - 同一提供方的多个API密钥分摊请求
+
+api_key_env 对应的环境变量可以是逗号分隔的多个密钥，也可以另外设置 <变量名>_1、<变量名>_2 ……；
+每次请求选择进行中请求最少的健康密钥，认证失败或额度耗尽的密钥冷却一段时间后再使用。
+每个密钥各有一个限流器，吞吐随密钥数量增长。
+"""
+import threading
+import time
+from typing import Dict, List, Optional
+
+from config import ADVANCED_SETTINGS
+from core.ratelimit import RateTicket, get_limiter
+from core.utils import get_env_var
+
+# 表示额度耗尽（而不是短时限流）的错误码和关键字
+QUOTA_MARKERS = ("insufficient_quota", "quota", "billing", "余额", "欠费")
+
+
+def load_api_keys(api_key_env: str) -> List[str]:
+    """
+    读取API密钥列表
+
+    Args:
+        api_key_env: 环境变量名
+
+    Returns:
+        去重后的密钥列表：先是 api_key_env 中逗号分隔的密钥，再是 <api_key_env>_1 起连续编号的变量
+    """
+    values = [get_env_var(api_key_env)]
+    index = 1
+    while (value := get_env_var(f"{api_key_env}_{index}")) is not None:
+        values.append(value)
+        index += 1
+    keys = (key.strip() for value in values if value for key in value.split(","))
+    return list(dict.fromkeys(key for key in keys if key))
+
+
+def is_key_error(error: BaseException) -> bool:
+    """
+    是否是密钥本身的问题（认证失败、无权限或额度耗尽），换用其他密钥可能成功
+
+    Args:
+        error: 异常
+
+    Returns:
+        是否是密钥错误
+    """
+    from core.resilience import status_code
+
+    status = status_code(error)
+    if status in (401, 402, 403):
+        return True
+    if status == 429:
+        text = f"{getattr(error, 'code', '') or ''} {error}".lower()
+        return any(marker in text for marker in QUOTA_MARKERS)
+    return False
+
+
+class KeyPool:
+    """
+    一个环境变量对应的密钥池
+
+    选择进行中请求最少的健康密钥，相同时选择最久未使用的（相当于轮询）。
+    """
+
+    def __init__(self, name: str, keys: List[str]):
+        """
+        Args:
+            name: 环境变量名
+            keys: 密钥列表
+        """
+        self.name = name
+        self.keys = keys
+        self._in_flight: Dict[str, int] = {key: 0 for key in keys}
+        self._cooldown_until: Dict[str, float] = {key: 0.0 for key in keys}
+        self._last_used: Dict[str, int] = {key: 0 for key in keys}
+        self._uses = 0
+        self._lock = threading.Lock()
+
+    def healthy_keys(self) -> List[str]:
+        """当前不在冷却期的密钥"""
+        now = time.monotonic()
+        return [key for key in self.keys if self._cooldown_until[key] <= now]
+
+    def acquire(self) -> str:
+        """
+        选择一个密钥（进行中请求数加1）
+
+        Returns:
+            密钥；全部在冷却期时返回最早恢复的密钥
+        """
+        with self._lock:
+            candidates = self.healthy_keys() or [min(self.keys, key=self._cooldown_until.__getitem__)]
+            key = min(candidates, key=lambda item: (self._in_flight[item], self._last_used[item]))
+            self._uses += 1
+            self._last_used[key] = self._uses
+            self._in_flight[key] += 1
+            return key
+
+    def release(self, key: str) -> None:
+        """请求结束（进行中请求数减1）"""
+        with self._lock:
+            self._in_flight[key] = max(0, self._in_flight[key] - 1)
+
+    def mark_unhealthy(self, key: str, cooldown: Optional[float] = None) -> None:
+        """
+        使密钥冷却
+
+        Args:
+            key: 密钥
+            cooldown: 冷却时间（秒），为None时使用 key_cooldown 配置
+        """
+        cooldown = ADVANCED_SETTINGS.get("key_cooldown", 300) if cooldown is None else cooldown
+        with self._lock:
+            self._cooldown_until[key] = time.monotonic() + cooldown
+
+    def report_error(self, key: str, error: BaseException) -> bool:
+        """
+        记录请求失败，密钥错误时使该密钥冷却
+
+        Args:
+            key: 失败请求使用的密钥
+            error: 异常
+
+        Returns:
+            是否应换用其他密钥重试（密钥错误且还有其他健康密钥）
+        """
+        if not is_key_error(error):
+            return False
+        self.mark_unhealthy(key)
+        return any(other != key for other in self.healthy_keys())
+
+    def lease(self, prompt_tokens: int = 0) -> "KeyLease":
+        """为一次请求创建密钥租约"""
+        return KeyLease(self, prompt_tokens)
+
+
+class KeyLease:
+    """
+    一次请求的密钥租约
+
+    接口与 RateTicket 相同：每次尝试前 acquire 选择密钥并预约该密钥的限流额度，
+    密钥失效时 on_error 返回True，由重试逻辑立即换用其他密钥；请求结束后 settle 释放密钥。
+    """
+
+    def __init__(self, pool: KeyPool, prompt_tokens: int = 0):
+        self.pool = pool
+        self.prompt_tokens = prompt_tokens
+        self.key: Optional[str] = None
+        self._ticket: Optional[RateTicket] = None
+
+    def _take(self) -> None:
+        if self._ticket is not None:
+            # 上一次尝试失败，没有产生输出，退还为它预约的输出额度
+            self._ticket.settle(0)
+        self._release()
+        self.key = self.pool.acquire()
+        limiter = get_limiter(self.pool.name, self.key)
+        self._ticket = limiter.ticket(self.prompt_tokens) if limiter is not None else None
+
+    def _release(self) -> None:
+        if self.key is not None:
+            self.pool.release(self.key)
+
+    def acquire(self) -> float:
+        """选择密钥并预约额度（同步），返回限流等待的时间（秒）"""
+        self._take()
+        return self._ticket.acquire() if self._ticket is not None else 0.0
+
+    async def acquire_async(self) -> float:
+        """选择密钥并预约额度（异步），返回限流等待的时间（秒）"""
+        self._take()
+        return await self._ticket.acquire_async() if self._ticket is not None else 0.0
+
+    def on_error(self, error: BaseException) -> bool:
+        """
+        请求失败
+
+        Returns:
+            是否已换用其他密钥
+        """
+        if self._ticket is not None:
+            self._ticket.on_error(error)
+        return self.key is not None and self.pool.report_error(self.key, error)
+
+    def on_success(self) -> None:
+        """请求成功"""
+        if self._ticket is not None:
+            self._ticket.on_success()
+
+    def settle(self, output_tokens: int) -> None:
+        """
+        请求结束：按实际输出结算限流额度并释放密钥
+
+        Args:
+            output_tokens: 实际输出的token数
+        """
+        if self._ticket is not None:
+            self._ticket.settle(output_tokens)
+        self._release()
+        self.key = None
+
+
+_pools: Dict[str, KeyPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_key_pool(api_key_env: str) -> Optional[KeyPool]:
+    """
+    获取环境变量对应的密钥池
+
+    Args:
+        api_key_env: 环境变量名
+
+    Returns:
+        密钥池（同一环境变量共享），没有设置任何密钥时为None
+    """
+    with _pools_lock:
+        pool = _pools.get(api_key_env)
+        if pool is None:
+            keys = load_api_keys(api_key_env)
+            if not keys:
+                return None
+            pool = _pools[api_key_env] = KeyPool(api_key_env, keys)
+        return pool
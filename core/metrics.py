@@ -0,0 +1,200 @@
+"""
+请求耗时统计模块 - 记录首字延迟、吞吐和渲染耗时
+"""
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from config import ADVANCED_SETTINGS, UI_CONFIG
+from core.tokens import estimate_tokens
+
+
+# 是否显示统计摘要（None表示使用配置）
+_show_summary: Optional[bool] = None
+
+
+def set_show_summary(show: Optional[bool]) -> None:
+    """设置是否在请求结束后显示统计摘要"""
+    global _show_summary
+    _show_summary = show
+
+
+def show_summary_enabled() -> bool:
+    """是否显示统计摘要"""
+    if _show_summary is not None:
+        return _show_summary
+    return UI_CONFIG.get("show_stats", False)
+
+
+def _percentile(sorted_values: Sequence[float], q: float) -> Optional[float]:
+    """计算已排序序列的分位数"""
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class RequestMetrics:
+    """
+    单次请求的耗时统计
+
+    网络侧时间（连接、首字、数据块间隔）在读取端记录数据到达的时刻，
+    渲染耗时在渲染端单独累计，两者互不包含。
+    """
+
+    def __init__(self, model_key: Optional[str] = None, model_id: Optional[str] = None):
+        self.model_key = model_key
+        self.model_id = model_id
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.connected: Optional[float] = None
+        self.first_reasoning: Optional[float] = None
+        self.first_content: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.chunks = 0
+        self.reasoning_chars = 0
+        self.content_chars = 0
+        self.gaps: List[float] = []
+        self.render_time = 0.0
+        self.frames = 0
+        self.cached = False
+        self.hedge_attempts = 1  # 对冲请求时实际发起的提供方数
+        self.retries = 0  # 重试次数
+        self.throttled = 0.0  # 客户端限流的等待时间（秒）
+        self.output_tokens = 0  # 输出token数（有用量统计时为提供方返回的值，否则为估算值）
+        self.error: Optional[str] = None
+        self._last_chunk: Optional[float] = None
+
+    def mark_connected(self) -> None:
+        """记录连接建立（响应头到达）的时刻"""
+        if self.connected is None:
+            self.connected = time.perf_counter()
+
+    def on_chunk(self, events: Sequence[Any]) -> None:
+        """
+        记录一个数据块到达
+
+        Args:
+            events: 该数据块转换出的流式事件
+        """
+        now = time.perf_counter()
+        if self._last_chunk is not None:
+            self.gaps.append(now - self._last_chunk)
+        self._last_chunk = now
+        self.chunks += 1
+        for event in events:
+            if event.kind == "reasoning":
+                self.reasoning_chars += len(event.text)
+                if self.first_reasoning is None:
+                    self.first_reasoning = now
+            elif event.kind == "content":
+                self.content_chars += len(event.text)
+                if self.first_content is None:
+                    self.first_content = now
+            elif event.kind == "usage":
+                # 用量统计在流的末尾，用提供方的计数替换估算值
+                tokens = getattr(event.data, "completion_tokens", None)
+                if isinstance(tokens, int):
+                    self.output_tokens = tokens
+            if event.text:
+                self.output_tokens += estimate_tokens(event.text)
+
+    def add_render_time(self, seconds: float) -> None:
+        """累计一帧的渲染耗时"""
+        self.render_time += seconds
+        self.frames += 1
+
+    def finish(self, error: Optional[BaseException] = None) -> "RequestMetrics":
+        """记录请求结束"""
+        if self.finished is None:
+            self.finished = time.perf_counter()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        return self
+
+    def _since_start(self, moment: Optional[float]) -> Optional[float]:
+        return None if moment is None else moment - self.started
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为结构化记录（时间单位为秒）"""
+        total = self._since_start(self.finished or time.perf_counter())
+        first_chunk = self.first_reasoning if self.first_content is None else (
+            self.first_content if self.first_reasoning is None else min(self.first_reasoning, self.first_content))
+        stream_time = (self._last_chunk - first_chunk) if first_chunk is not None and self._last_chunk else 0.0
+        gaps = sorted(self.gaps)
+        chars = self.reasoning_chars + self.content_chars
+        return {
+            "timestamp": self.timestamp,
+            "model_key": self.model_key,
+            "model_id": self.model_id,
+            "cached": self.cached,
+            "hedge_attempts": self.hedge_attempts,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "error": self.error,
+            "connect": self._since_start(self.connected),
+            "ttft_reasoning": self._since_start(self.first_reasoning),
+            "ttft_content": self._since_start(self.first_content),
+            "total": total,
+            "chunks": self.chunks,
+            "reasoning_chars": self.reasoning_chars,
+            "content_chars": self.content_chars,
+            "output_tokens": self.output_tokens,
+            "chunks_per_sec": self.chunks / stream_time if stream_time > 0 else None,
+            "chars_per_sec": chars / stream_time if stream_time > 0 else None,
+            "gap_p50": _percentile(gaps, 0.5),
+            "gap_p90": _percentile(gaps, 0.9),
+            "gap_p99": _percentile(gaps, 0.99),
+            "gap_max": gaps[-1] if gaps else None,
+            "render_time": self.render_time,
+            "frames": self.frames,
+        }
+
+    def summary(self) -> str:
+        """生成一行统计摘要"""
+        record = self.to_dict()
+
+        def ms(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value * 1000:.0f}ms"
+
+        def rate(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value:.1f}"
+
+        parts = [
+            f"连接 {ms(record['connect'])}",
+            f"首个思考 {ms(record['ttft_reasoning'])}",
+            f"首个结论 {ms(record['ttft_content'])}",
+            f"总耗时 {ms(record['total'])}",
+            f"{record['chunks']}块 {rate(record['chunks_per_sec'])}块/s {rate(record['chars_per_sec'])}字/s",
+            f"间隔p50/p90/max {ms(record['gap_p50'])}/{ms(record['gap_p90'])}/{ms(record['gap_max'])}",
+            f"渲染 {ms(record['render_time'])}({record['frames']}帧)",
+        ]
+        if self.throttled:
+            parts.insert(0, f"限流等待 {ms(self.throttled)}")
+        if self.retries:
+            parts.insert(0, f"重试{self.retries}次")
+        if self.hedge_attempts > 1:
+            parts.insert(0, f"对冲{self.hedge_attempts}路 采用 {self.model_key}")
+        if self.cached:
+            parts.insert(0, "缓存命中")
+        return " | ".join(parts)
+
+
+def report_metrics(metrics: RequestMetrics) -> None:
+    """
+    输出请求统计：按配置显示摘要行，并追加结构化记录到 metrics_file
+
+    Args:
+        metrics: 请求统计
+    """
+    if show_summary_enabled():
+        from ui.console import Console
+        Console().print(f"⏱  {metrics.summary()}", style="dim")
+
+    metrics_file = ADVANCED_SETTINGS.get("metrics_file")
+    if metrics_file:
+        path = Path(metrics_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(metrics.to_dict(), ensure_ascii=False) + "\n")
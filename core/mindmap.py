@@ -0,0 +1,104 @@
+"""
+思维导图流水线 - 把回答整理成思维导图内容
+
+整理请求在后台事件循环中静默进行，不在终端重复渲染整理后的内容；
+主回答开始时就在后台创建整理模型实例并预先建立连接，回答结束后整理请求立即发出。
+整理模型实例和连接池在多次提问之间复用。
+"""
+import asyncio
+import concurrent.futures
+import threading
+from typing import Any, Coroutine, Optional
+
+import config
+from core.model import BaseModel
+
+# 整理回答的提示词
+MIND_MAP_PROMPT = "请将以下内容整理为一个结构化的思维导图内容:\n\n{content}"
+
+
+class MindMapPipeline:
+    """思维导图整理流水线（后台线程中的事件循环持有整理模型实例及其连接池）"""
+
+    def __init__(self, model_key: Optional[str] = None):
+        """
+        Args:
+            model_key: 整理模型代号，为None时使用 MODEL_GENERATE_MIND 配置
+        """
+        self.model_key = model_key or config.MODEL_GENERATE_MIND
+        self._instance: Optional[BaseModel] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _submit(self, coroutine: Coroutine[Any, Any, Any]) -> concurrent.futures.Future:
+        """在后台事件循环中运行协程（首次使用时启动后台线程）"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                threading.Thread(target=self._loop.run_forever, name="mind-map", daemon=True).start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop)
+
+    def _get_instance(self) -> BaseModel:
+        """整理模型实例（在后台事件循环中创建并复用）"""
+        if self._instance is None:
+            from core.registry import ModelRegistry
+
+            instance = ModelRegistry().create_instance(self.model_key)
+            instance.initialize()
+            self._instance = instance
+        return self._instance
+
+    async def _warm_up(self) -> None:
+        await self._get_instance().warm_up_async()
+
+    def start(self) -> None:
+        """
+        主回答开始时调用：在后台创建整理模型实例并预先建立连接，与主回答并行
+
+        预热失败时忽略，整理时会再次报告错误。
+        """
+        self._submit(self._warm_up()).add_done_callback(lambda future: future.exception())
+
+    async def _summarize(self, content: str) -> str:
+        from core.stream import StreamSink
+
+        # 使用不输出任何内容的输出端发送流式请求，长内容的整理也受首字和空闲超时保护
+        result = await self._get_instance().complete_async(MIND_MAP_PROMPT.format(content=content),
+                                                           sinks=[StreamSink()])
+        return result.content
+
+    def summarize(self, content: str) -> str:
+        """
+        整理回答（阻塞直到完成，可以在事件循环之外或同步代码中调用）
+
+        Args:
+            content: 主回答
+
+        Returns:
+            整理后的思维导图Markdown内容
+
+        Raises:
+            Exception: 整理请求失败
+        """
+        future = self._submit(self._summarize(content))
+        try:
+            return future.result()
+        except BaseException:
+            # 中断时取消后台请求
+            future.cancel()
+            raise
+
+    async def summarize_async(self, content: str) -> str:
+        """summarize 的异步版本：等待时不阻塞调用方的事件循环"""
+        return await asyncio.wrap_future(self._submit(self._summarize(content)))
+
+
+_pipeline: Optional[MindMapPipeline] = None
+
+
+def get_mind_map_pipeline() -> MindMapPipeline:
+    """获取思维导图流水线单例"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = MindMapPipeline()
+    return _pipeline
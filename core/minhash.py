@@ -0,0 +1,126 @@
+"""
+MinHash/LSH模块 - 基于字符片段的近似重复文本检测
+
+签名使用单次哈希分桶（one-permutation hashing）：每个字符片段只计算一次稳定哈希，
+按哈希值分配到各个桶并保留桶内最小值，计算量与文本长度成正比。
+签名按带（band）切分后生成LSH桶键，相似文本以高概率落入同一个桶。
+"""
+import hashlib
+import struct
+import unicodedata
+from typing import FrozenSet, List, Sequence
+
+# 签名长度（桶数）
+NUM_BINS = 64
+# LSH带数，每带 NUM_BINS // NUM_BANDS 个值；带数越多，召回的低相似度候选越多
+NUM_BANDS = 16
+# 默认字符片段长度（中文问题适合使用2字符片段）
+SHINGLE_SIZE = 2
+
+_MASK64 = (1 << 64) - 1
+_EMPTY = _MASK64
+
+
+def normalize_for_shingles(text: str) -> str:
+    """规范化文本：全半角统一、转小写，去掉空白、标点和符号"""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return "".join(ch for ch in text if unicodedata.category(ch)[0] not in "ZPSC")
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> FrozenSet[str]:
+    """
+    生成字符片段集合
+
+    Args:
+        text: 原始文本
+        size: 片段长度
+
+    Returns:
+        片段集合，规范化后短于片段长度的文本整体作为一个片段
+    """
+    text = normalize_for_shingles(text)
+    if len(text) <= size:
+        return frozenset((text,)) if text else frozenset()
+    return frozenset(text[i:i + size] for i in range(len(text) - size + 1))
+
+
+def _stable_hash(value: str) -> int:
+    """跨进程稳定的64位哈希（不使用受随机化影响的内置hash）"""
+    return int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def signature(shingle_set: FrozenSet[str], num_bins: int = NUM_BINS) -> List[int]:
+    """
+    计算MinHash签名
+
+    Args:
+        shingle_set: 字符片段集合
+        num_bins: 签名长度
+
+    Returns:
+        签名（每个桶的最小值），空集合返回空列表
+    """
+    if not shingle_set:
+        return []
+    bins = [_EMPTY] * num_bins
+    for shingle in shingle_set:
+        h = _stable_hash(shingle)
+        index, value = h % num_bins, h // num_bins
+        if value < bins[index]:
+            bins[index] = value
+    # 空桶按循环方向借用下一个非空桶的值（加上偏移区分来源），保证签名稠密
+    if _EMPTY in bins:
+        source = next(i for i in range(num_bins - 1, -1, -1) if bins[i] != _EMPTY) - num_bins
+        raw = bins[:]
+        for i in range(num_bins - 1, -1, -1):
+            if raw[i] != _EMPTY:
+                source = i
+            else:
+                offset = source - i if source > i else source + num_bins - i
+                bins[i] = (raw[source % num_bins] + offset * 0x9E3779B97F4A7C15) & _MASK64
+    return bins
+
+
+def similarity(sig_a: Sequence[int], sig_b: Sequence[int]) -> float:
+    """根据签名估计Jaccard相似度"""
+    if not sig_a or len(sig_a) != len(sig_b):
+        return 0.0
+    return sum(1 for a, b in zip(sig_a, sig_b) if a == b) / len(sig_a)
+
+
+def jaccard(set_a: FrozenSet[str], set_b: FrozenSet[str]) -> float:
+    """计算两个片段集合的精确Jaccard相似度"""
+    if not set_a or not set_b:
+        return 0.0
+    return len(set_a & set_b) / len(set_a | set_b)
+
+
+def band_buckets(sig: Sequence[int], num_bands: int = NUM_BANDS) -> List[int]:
+    """
+    计算签名各个带的LSH桶键
+
+    Args:
+        sig: MinHash签名
+        num_bands: 带数
+
+    Returns:
+        每个带一个有符号64位桶键（可直接存入SQLite INTEGER列）
+    """
+    if not sig:
+        return []
+    rows = len(sig) // num_bands
+    buckets = []
+    for band in range(num_bands):
+        data = struct.pack(f"<I{rows}Q", band, *sig[band * rows:(band + 1) * rows])
+        buckets.append(int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little", signed=True))
+    return buckets
+
+
+def pack_signature(sig: Sequence[int]) -> bytes:
+    """将签名打包为字节串"""
+    return struct.pack(f"<{len(sig)}Q", *sig)
+
+
+def unpack_signature(data: bytes) -> List[int]:
+    """从字节串还原签名"""
+    return list(struct.unpack(f"<{len(data) // 8}Q", data)) if data else []
@@ -2,7 +2,16 @@
 模型基类和接口定义
 """
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, Sequence, Tuple
+
+from config import ADVANCED_SETTINGS
+from core.history import History, HistoryView, Message
+
+if TYPE_CHECKING:
+    from core.cache import CacheKey
+    from core.metrics import RequestMetrics
+    from core.session import Session
+    from core.stream import StreamAccumulator, StreamSink
 
 
 class ModelInterface(ABC):
@@ -39,7 +48,10 @@ class BaseModel(ModelInterface):
     
     def __init__(self):
         self.initialized = False
-        self.history: List[Dict[str, str]] = []  # 聊天历史
+        self.history = History(ADVANCED_SETTINGS.get("max_history", 20))  # 聊天历史（最多保留 max_history 轮）
+        self.session: Optional["Session"] = None  # 持久化会话
+        self.last_metrics = None  # 最近一次请求的耗时统计
+        self.last_result = None  # 最近一次成功请求的思考和结论内容（由子类设置，用于写入缓存）
     
     def initialize(self) -> None:
         """
@@ -88,19 +100,203 @@ class BaseModel(ModelInterface):
         if content is None:
             content = get_input(kwargs.get("conclusion"))
         
-        # 添加到历史记录
-        if content:
-            self.history.append({"role": "user", "content": content})
+        # 先查询缓存
+        cache_key, response = self._check_cache(content, **kwargs)
         
-        # 调用实际实现
-        response = self._request_implementation(content, **kwargs)
+        # 缓存未命中时调用实际实现
+        if response is None:
+            self.last_result = None
+            response = self._request_implementation(content, **kwargs)
+            self._store_cache(cache_key, content)
         
-        # 添加响应到历史
-        if response:
-            self.history.append({"role": "assistant", "content": response})
+        # 请求完成后再将本轮问答加入历史，请求中的消息由实现自行拼接
+        self.add_turn(content, response)
             
         return response
     
+    def add_history(self, role: str, content: str, model: Optional[str] = None) -> None:
+        """
+        添加一条历史消息（token数在添加时估算一次）
+        
+        Args:
+            role: 角色（user/assistant）
+            content: 消息内容
+            model: 生成回答的模型代号
+        """
+        message = Message(role, content, model=model)
+        self.history.append(message)
+        if self.session is not None:
+            self.session.append(message)
+    
+    def attach_session(self, session: "Session") -> int:
+        """
+        关联持久化会话，并从会话恢复最近的历史
+        
+        Args:
+            session: 会话
+            
+        Returns:
+            恢复的消息条数
+        """
+        self.session = None
+        self.history.clear()
+        messages = session.load(self.history.capacity)
+        for message in messages:
+            self.history.append(message)
+        self.session = session
+        return len(messages)
+    
+    def adopt_history(self, other: "BaseModel") -> None:
+        """
+        接管另一个模型实例的历史和会话（切换模型后继续同一段对话）
+        
+        Args:
+            other: 原模型实例
+        """
+        self.session = None
+        self.history.clear()
+        for message in other.history:
+            self.history.append(message)
+        self.session = other.session
+    
+    def add_turn(self, content: Optional[str], response: Optional[str]) -> None:
+        """将一轮问答加入历史（回答记录生成它的模型）"""
+        if content:
+            self.add_history("user", content)
+        if response:
+            self.add_history("assistant", response, self.answered_by)
+    
+    def history_window(self, budget: int, max_messages: Optional[int] = None) -> HistoryView:
+        """
+        选择不超过token预算的最近历史消息
+        
+        Args:
+            budget: token预算
+            max_messages: 最多消息条数，为None时不限制
+            
+        Returns:
+            历史窗口（以用户消息开头，不复制消息）
+        """
+        return self.history.window(budget, max_messages)
+    
+    @property
+    def answered_by(self) -> Optional[str]:
+        """生成最近一次回答的模型代号"""
+        return self._model_key
+    
+    @property
+    def model_id(self) -> Optional[str]:
+        """提供方的模型ID"""
+        config = self._model_config or {}
+        return (config.get("openai_config") or config).get("model_id")
+    
+    def _cache_key(self, content: str, **kwargs) -> Optional["CacheKey"]:
+        """
+        计算请求的缓存键
+        子类可以重写此方法，按实际发送的消息和采样参数计算；返回None表示不缓存
+        
+        Args:
+            content: 用户输入内容
+            **kwargs: 其他参数
+            
+        Returns:
+            缓存键
+        """
+        return None
+    
+    def _check_cache(self, content: str, **kwargs) -> Tuple[Optional["CacheKey"], Optional[str]]:
+        """
+        在发起网络请求前查询响应缓存，命中时通过正常的渲染流程回放
+        
+        精确匹配未命中且启用了近似查找时，交互模式下询问用户是否使用相似问题的回答。
+        
+        Args:
+            content: 用户输入内容
+            **kwargs: 其他参数
+            
+        Returns:
+            (缓存键, 命中时回放的响应)，未启用缓存时缓存键为None
+        """
+        from core.cache import get_response_cache
+        from core.utils import is_interactive
+        
+        cache = get_response_cache() if content else None
+        cache_key = self._cache_key(content, **kwargs) if cache is not None else None
+        if not cache_key:
+            return None, None
+        entry = cache.get(cache_key.key)
+        if entry is None and ADVANCED_SETTINGS.get("near_dup_enabled") and not kwargs.get("conclusion") \
+                and is_interactive():
+            similar = cache.find_similar(cache_key.scope, content, ADVANCED_SETTINGS.get("near_dup_threshold", 0.8))
+            if similar is not None and self._offer_similar(*similar):
+                entry = similar[0]
+        if entry is None:
+            return cache_key, None
+        return cache_key, self._replay_cached(entry)
+    
+    def _offer_similar(self, entry, score: float) -> bool:
+        """
+        询问用户是否使用相似问题的缓存回答
+        
+        Args:
+            entry: 相似问题的缓存响应
+            score: 相似度
+            
+        Returns:
+            用户是否接受
+        """
+        from core.utils import confirm
+        from ui.console import Console
+        
+        preview = entry.prompt if len(entry.prompt) <= 200 else entry.prompt[:200] + "..."
+        Console().print(f"💾 发现相似的问题（相似度 {score:.0%}）：\n{preview}", style="cyan")
+        return confirm("使用缓存的回答？")
+    
+    def _replay_cached(self, entry) -> str:
+        """
+        回放缓存的响应
+        
+        Args:
+            entry: 缓存的响应
+            
+        Returns:
+            缓存的结论内容
+        """
+        from core.metrics import RequestMetrics, report_metrics
+        from core.stream import StreamEvent, passthrough_events
+        from ui.output import render_stream
+        
+        events = []
+        if entry.reasoning:
+            events.append(StreamEvent(StreamEvent.REASONING, entry.reasoning))
+        events.append(StreamEvent(StreamEvent.CONTENT, entry.content))
+        
+        metrics = self.last_metrics = RequestMetrics(self._model_key, self.model_id)
+        metrics.cached = True
+        try:
+            self.last_result = render_stream([events], adapter=passthrough_events, metrics=metrics)
+        finally:
+            report_metrics(metrics.finish())
+        return self.last_result.content
+    
+    def _store_cache(self, cache_key: Optional["CacheKey"], content: str) -> None:
+        """
+        将成功的响应写入缓存（失败的请求不会设置 last_result）
+        
+        Args:
+            cache_key: 缓存键
+            content: 用户输入内容
+        """
+        from core.cache import get_response_cache
+        
+        result = self.last_result
+        if not cache_key or result is None or not result.content:
+            return
+        cache = get_response_cache()
+        if cache is not None:
+            cache.put(cache_key.key, self.model_id or self._model_key, content, result.content, result.reasoning,
+                      scope=cache_key.scope)
+    
     def _request_implementation(self, content: str, **kwargs) -> str:
         """
         实际的请求实现
@@ -115,9 +311,97 @@ class BaseModel(ModelInterface):
         """
         raise NotImplementedError("子类必须实现_request_implementation方法")
     
+    async def warm_up_async(self) -> None:
+        """预先建立到提供方的连接，之后的请求无需等待握手（默认不做任何事）"""
+        pass
+    
+    @property
+    def supports_complete_async(self) -> bool:
+        """是否实现了静默的异步请求（批量和多模型并发使用）"""
+        return type(self)._complete_async is not BaseModel._complete_async
+    
+    async def complete_async(self,
+                             content: str,
+                             sinks: Sequence["StreamSink"] = (),
+                             metrics: Optional["RequestMetrics"] = None,
+                             **kwargs) -> "StreamAccumulator":
+        """
+        静默的异步请求：不使用也不修改对话历史，只输出到指定的输出端，可以在同一实例上并发调用
+        
+        Args:
+            content: 用户输入内容
+            sinks: 流式输出端，为空时发送非流式请求
+            metrics: 请求耗时统计，为None时新建
+            **kwargs: 其他参数（如 temperature、max_tokens）
+            
+        Returns:
+            包含思考和结论内容的结果
+            
+        Raises:
+            Exception: 请求失败时抛出原始异常
+        """
+        from core.cache import get_response_cache
+        from core.metrics import RequestMetrics, report_metrics
+        from core.stream import StreamAccumulator, StreamEvent
+        
+        kwargs.update(stream=bool(sinks), history_limit=0)
+        metrics = metrics or RequestMetrics(self._model_key, self.model_id)
+        cache = get_response_cache()
+        cache_key = self._cache_key(content, **kwargs) if cache is not None else None
+        entry = cache.get(cache_key.key) if cache_key else None
+        if entry is not None:
+            events = []
+            if entry.reasoning:
+                events.append(StreamEvent(StreamEvent.REASONING, entry.reasoning))
+            events.append(StreamEvent(StreamEvent.CONTENT, entry.content))
+            metrics.cached = True
+            metrics.on_chunk(events)
+            for sink in sinks:
+                sink.open()
+                for event in events:
+                    sink.feed(event)
+                sink.close()
+            report_metrics(metrics.finish())
+            return StreamAccumulator.from_events(events)
+        
+        try:
+            result = await self._complete_async(content, sinks, metrics, **kwargs)
+        except Exception as e:
+            metrics.finish(e)
+            raise
+        finally:
+            report_metrics(metrics.finish())
+        
+        if cache_key and result.content:
+            cache.put(cache_key.key, self.model_id or self._model_key, content, result.content, result.reasoning,
+                      scope=cache_key.scope)
+        return result
+    
+    async def _complete_async(self,
+                              content: str,
+                              sinks: Sequence["StreamSink"],
+                              metrics: "RequestMetrics",
+                              **kwargs) -> "StreamAccumulator":
+        """
+        静默异步请求的实现
+        子类可以重写此方法，kwargs 中 stream 为真时通过流式事件管道输出到 sinks
+        
+        Args:
+            content: 用户输入内容
+            sinks: 流式输出端
+            metrics: 请求耗时统计
+            **kwargs: 其他参数
+            
+        Returns:
+            包含思考和结论内容的结果
+        """
+        raise NotImplementedError(f"模型 {self._model_key} 不支持并发请求")
+    
     def clear_history(self) -> None:
         """清除聊天历史"""
-        self.history = []
+        self.history.clear()
+        if self.session is not None:
+            self.session.clear()
     
     @property
     def model_key(self) -> str:
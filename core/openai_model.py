@@ -2,15 +2,20 @@
 OpenAI兼容模型基类
 """
 import os
-from typing import Dict, Any, Optional, Union, List
+from typing import TYPE_CHECKING, Dict, Any, Optional, Sequence, Union, List
 import asyncio
 
-from openai import OpenAI, AsyncOpenAI
-from openai.types.chat import ChatCompletion, ChatCompletionChunk
-
+from core.clients import ClientPool
+from core.metrics import RequestMetrics, report_metrics
 from core.model import BaseModel
-from core.utils import get_env_var
-from ui.console import Console, print_stream, print_conclusion
+from core.resilience import (call_with_retries, call_with_retries_async, open_stream, open_stream_async,
+                             request_error)
+from core.stream import StreamAccumulator, StreamPipeline, StreamSink, openai_events, openai_message_events
+from ui.output import render_stream, render_stream_async, print_conclusion
+
+if TYPE_CHECKING:
+    from core.cache import CacheKey
+    from core.keys import KeyLease, KeyPool
 
 
 class OpenAICompatibleModel(BaseModel):
@@ -27,34 +32,70 @@ class OpenAICompatibleModel(BaseModel):
     
     def __init__(self):
         super().__init__()
-        self.client = None
-        self.async_client = None
+        self._client = None
+        self._async_client = None
+        self._base_url: Optional[str] = None
+        self._api_key: Optional[str] = None
+        self._key_pool: Optional["KeyPool"] = None
     
     def _initialize(self) -> None:
-        """初始化OpenAI客户端"""
+        """校验OpenAI配置，客户端在首次使用时从客户端池获取"""
         if not self._model_config or not self._model_config.get("openai_config"):
             raise ValueError("缺少OpenAI配置，请确保已通过装饰器设置")
         
         openai_config = self._model_config["openai_config"]
         
-        # 创建客户端参数
-        client_args = {}
-        
         # 设置API基础URL
-        if openai_config.get("base_url"):
-            client_args["base_url"] = openai_config["base_url"]
+        self._base_url = openai_config.get("base_url") or None
         
-        # 设置API密钥
+        # 设置API密钥（可以是多个密钥组成的密钥池）
         api_key_env = openai_config.get("api_key_env")
         if api_key_env:
-            api_key = get_env_var(api_key_env)
-            if not api_key:
+            from core.keys import get_key_pool
+            
+            self._key_pool = get_key_pool(api_key_env)
+            if self._key_pool is None:
                 raise ValueError(f"环境变量 {api_key_env} 未设置，无法调用模型")
-            client_args["api_key"] = api_key
+            self._api_key = self._key_pool.keys[0]
+    
+    @property
+    def client(self):
+        """同步客户端（按 base_url 和密钥共享，首次使用时创建）"""
+        if self._client is None:
+            self._client = ClientPool.get_client(self._base_url, self._api_key)
+        return self._client
+    
+    @client.setter
+    def client(self, value) -> None:
+        self._client = value
+    
+    @property
+    def async_client(self):
+        """当前事件循环的异步客户端（按 base_url 和密钥共享）"""
+        return ClientPool.get_async_client(self._base_url, self._api_key) if self._async_client is None \
+            else self._async_client
+    
+    @async_client.setter
+    def async_client(self, value) -> None:
+        self._async_client = value
+    
+    async def warm_up_async(self) -> None:
+        """预先建立当前事件循环到服务地址的连接"""
+        await ClientPool.warm_up_async(self._base_url)
+    
+    def _start_metrics(self) -> RequestMetrics:
+        """开始记录一次请求的耗时统计"""
+        self.last_metrics = RequestMetrics(self._model_key, self._model_config["openai_config"].get("model_id"))
+        return self.last_metrics
+    
+    def _cache_key(self, content: str, **kwargs) -> Optional["CacheKey"]:
+        """按模型ID、服务地址、消息和采样参数计算缓存键"""
+        from core.cache import SAMPLING_PARAMS, make_cache_keys
         
-        # 创建客户端
-        self.client = OpenAI(**client_args)
-        self.async_client = AsyncOpenAI(**client_args)
+        params = self._get_request_params(content, **kwargs)
+        sampling = {key: params[key] for key in SAMPLING_PARAMS if key in params}
+        sampling["base_url"] = self._base_url
+        return make_cache_keys(params["model"], params["messages"], sampling)
     
     def _get_request_params(self, content: str, **kwargs) -> Dict[str, Any]:
         """
@@ -67,26 +108,24 @@ class OpenAICompatibleModel(BaseModel):
         Returns:
             请求参数字典
         """
+        from core.tokens import history_budget, message_tokens
+        
         openai_config = self._model_config["openai_config"]
+        system_message = {"role": "system", "content": openai_config.get("system_message", "")}
+        user_message = {"role": "user", "content": content}
+        
+        # 历史消息按token预算选取：上下文窗口扣除回答预留、系统消息和本轮问题
+        max_tokens = kwargs.get("max_tokens", openai_config.get("max_tokens"))
+        budget = history_budget(openai_config, message_tokens(system_message) + message_tokens(user_message), max_tokens)
+        history_limit = kwargs.get("history_limit")
+        history = self.history_window(budget, history_limit * 2 if history_limit is not None else None)
         
         # 基本参数
         params = {
             "model": openai_config["model_id"],
-            "messages": [
-                {"role": "system", "content": openai_config.get("system_message", "")}
-            ]
+            "messages": [system_message, *history, user_message]
         }
         
-        # 添加历史消息
-        history_limit = kwargs.get("history_limit", 10)
-        if history_limit > 0 and len(self.history) > 0:
-            # 添加最近的历史记录（不超过限制）
-            history_to_add = self.history[-history_limit*2:] if history_limit > 0 else []
-            params["messages"].extend(history_to_add)
-        
-        # 添加当前消息
-        params["messages"].append({"role": "user", "content": content})
-        
         # 添加流式参数
         if kwargs.get("stream", openai_config.get("stream", True)):
             params["stream"] = True
@@ -106,6 +145,36 @@ class OpenAICompatibleModel(BaseModel):
         
         return params
     
+    def _lease(self, params: Dict[str, Any]) -> Optional["KeyLease"]:
+        """为本次请求租用密钥池中的密钥（并按该密钥限流），没有配置密钥时为None"""
+        from core.tokens import message_tokens
+        
+        if self._key_pool is None:
+            return None
+        return self._key_pool.lease(sum(message_tokens(message) for message in params["messages"]))
+    
+    def _create(self, lease: Optional["KeyLease"], params: Dict[str, Any]):
+        """用租约选中的密钥发起请求（同步）"""
+        client = self.client if self._client is not None or lease is None or lease.key is None \
+            else ClientPool.get_client(self._base_url, lease.key)
+        return client.chat.completions.create(**params)
+    
+    def _create_async(self, lease: Optional["KeyLease"], params: Dict[str, Any]):
+        """用租约选中的密钥发起请求（异步，返回可等待对象）"""
+        client = self.async_client if self._async_client is not None or lease is None or lease.key is None \
+            else ClientPool.get_async_client(self._base_url, lease.key)
+        return client.chat.completions.create(**params)
+    
+    def _call(self, fn, metrics: RequestMetrics, lease: Optional["KeyLease"] = None):
+        """经过密钥选择、限流、重试和熔断调用提供方（同步）"""
+        return call_with_retries(fn, self._base_url, metrics, name=self._model_config.get("display_name", ""),
+                                 ticket=lease)
+    
+    async def _call_async(self, fn, metrics: RequestMetrics, lease: Optional["KeyLease"] = None):
+        """经过密钥选择、限流、重试和熔断调用提供方（异步）"""
+        return await call_with_retries_async(fn, self._base_url, metrics,
+                                             name=self._model_config.get("display_name", ""), ticket=lease)
+    
     def _request_implementation(self, content: str, **kwargs) -> str:
         """
         实现OpenAI API请求
@@ -116,30 +185,43 @@ class OpenAICompatibleModel(BaseModel):
             
         Returns:
             模型响应
+            
+        Raises:
+            ModelRequestError: 重试后仍然失败
         """
-        console = Console()
+        metrics = self._start_metrics()
+        lease = None
         
         try:
             # 获取请求参数
             params = self._get_request_params(content, **kwargs)
-            is_stream = params.get("stream", True)
+            is_stream = params.get("stream", False)
+            lease = self._lease(params)
             
             # 发送请求
             if is_stream:
-                # 流式请求
-                stream = self.client.chat.completions.create(**params)
-                return print_stream(stream)
+                # 流式请求：读到首字之前的失败和超时会重试
+                stream = self._call(lambda: open_stream(lambda: self._create(lease, params), metrics=metrics),
+                                    metrics, lease)
+                result = render_stream(stream, metrics=metrics)
+                self.last_result = result
+                return result.content
             else:
                 # 非流式请求
-                response = self.client.chat.completions.create(**params)
-                content = response.choices[0].message.content
-                return print_conclusion(content)
+                response = self._call(lambda: self._create(lease, params), metrics, lease)
+                metrics.mark_connected()
+                events = openai_message_events(response)
+                metrics.on_chunk(events)
+                self.last_result = StreamAccumulator.from_events(events)
+                return print_conclusion(response.choices[0].message.content)
                 
         except Exception as e:
-            error_message = f"模型调用失败: {type(e).__name__}: {e}"
-            console.print(error_message, style="bold red")
-            return f"模型 {self._model_config.get('display_name', '未知')} 调用出错: {str(e)}\n\n" \
-                   f"请检查以下可能的问题：\n1. API密钥是否正确设置\n2. 网络连接是否正常\n3. 模型服务是否可用"
+            metrics.finish(e)
+            raise request_error(self._model_config.get("display_name", "未知"), e) from e
+        finally:
+            report_metrics(metrics.finish())
+            if lease is not None:
+                lease.settle(metrics.output_tokens)
     
     async def request_async(self, content: str, **kwargs) -> str:
         """
@@ -151,54 +233,95 @@ class OpenAICompatibleModel(BaseModel):
             
         Returns:
             模型响应
+            
+        Raises:
+            ModelRequestError: 重试后仍然失败（失败的请求不会加入历史）
         """
-        console = Console()
+        from core.utils import get_input
+        
+        # 如果没有传入内容，从标准输入获取
+        if content is None:
+            content = get_input(kwargs.get("conclusion"))
+        
+        # 先查询缓存，命中时直接回放
+        cache_key, response = self._check_cache(content, **kwargs)
+        if response is not None:
+            self.add_turn(content, response)
+            return response
+        
+        self.last_result = None
+        metrics = self._start_metrics()
+        lease = None
         
         try:
-            # 添加到历史记录
-            if content:
-                self.history.append({"role": "user", "content": content})
-            
             # 获取请求参数
             params = self._get_request_params(content, **kwargs)
-            is_stream = params.get("stream", True)
+            is_stream = params.get("stream", False)
+            lease = self._lease(params)
             
             # 发送请求
             if is_stream:
-                # 流式请求
-                stream = await self.async_client.chat.completions.create(**params)
-                response = await self._process_stream_async(stream)
+                # 流式请求：读到首字之前的失败和超时会重试
+                stream = await self._call_async(
+                    lambda: open_stream_async(lambda: self._create_async(lease, params),
+                                              metrics=metrics), metrics, lease)
+                response = await self._process_stream_async(stream, metrics)
             else:
                 # 非流式请求
-                response = await self.async_client.chat.completions.create(**params)
-                response = response.choices[0].message.content
-            
-            # 添加响应到历史
-            if response:
-                self.history.append({"role": "assistant", "content": response})
-                
-            return response
-                
+                response = await self._call_async(lambda: self._create_async(lease, params), metrics, lease)
+                metrics.mark_connected()
+                events = openai_message_events(response)
+                metrics.on_chunk(events)
+                self.last_result = StreamAccumulator.from_events(events)
+                response = print_conclusion(response.choices[0].message.content)
         except Exception as e:
-            error_message = f"模型调用失败: {type(e).__name__}: {e}"
-            console.print(error_message, style="bold red")
-            return f"模型 {self._model_config.get('display_name', '未知')} 调用出错: {str(e)}\n\n" \
-                   f"请检查以下可能的问题：\n1. API密钥是否正确设置\n2. 网络连接是否正常\n3. 模型服务是否可用"
+            metrics.finish(e)
+            raise request_error(self._model_config.get("display_name", "未知"), e) from e
+        finally:
+            report_metrics(metrics.finish())
+            if lease is not None:
+                lease.settle(metrics.output_tokens)
+        
+        self._store_cache(cache_key, content)
+        
+        # 请求完成后将本轮问答加入历史
+        self.add_turn(content, response)
+        return response
+    
+    async def _complete_async(self,
+                              content: str,
+                              sinks: Sequence[StreamSink],
+                              metrics: RequestMetrics,
+                              **kwargs) -> StreamAccumulator:
+        """通过异步客户端请求，流式时输出到 sinks"""
+        params = self._get_request_params(content, **kwargs)
+        lease = self._lease(params)
+        try:
+            if params.get("stream"):
+                stream = await self._call_async(
+                    lambda: open_stream_async(lambda: self._create_async(lease, params),
+                                              metrics=metrics), metrics, lease)
+                return await StreamPipeline(openai_events, sinks, metrics=metrics).run_async(stream)
+            response = await self._call_async(lambda: self._create_async(lease, params), metrics, lease)
+            metrics.mark_connected()
+            events = openai_message_events(response)
+            metrics.on_chunk(events)
+            return StreamAccumulator.from_events(events)
+        finally:
+            if lease is not None:
+                lease.settle(metrics.output_tokens)
     
-    async def _process_stream_async(self, stream) -> str:
+    async def _process_stream_async(self, stream, metrics: Optional[RequestMetrics] = None) -> str:
         """
-        异步处理流式响应
+        异步处理流式响应，实时显示思考内容和结论
         
         Args:
             stream: 流式响应
+            metrics: 请求耗时统计
             
         Returns:
             完整响应内容
         """
-        # 这里可以实现异步流式输出，暂时简化为收集完整内容
-        response = ""
-        async for chunk in stream:
-            if chunk.choices and chunk.choices[0].delta.content:
-                response += chunk.choices[0].delta.content
-        
-        return response 
\ No newline at end of file
+        result = await render_stream_async(stream, metrics=metrics)
+        self.last_result = result
+        return result.content 
\ No newline at end of file
@@ -0,0 +1,264 @@
+"""
+限流模块 - 按API密钥在客户端控制请求速率
+
+同一个密钥被多个模型共享（如 ARK_API_KEY），限流器按 api_key_env 共享，
+同时限制每分钟请求数（rpm）和每分钟token数（tpm）。
+
+- 令牌桶采用预约制：每个请求先预约额度，额度不足时按排队顺序计算需要等待的时间，
+  异步请求在事件循环中等待，不占用线程；桶容量只有约1秒的额度，吞吐平稳而不是先突发再限流
+- 请求时预约输入token和预计的输出token，完成后按实际输出多退少补
+- 收到429时速率减半，之后每次成功逐步恢复（加性增、乘性减），稳定在提供方限额之下
+"""
+import asyncio
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from config import ADVANCED_SETTINGS, RATE_LIMITS
+
+# 收到429后速率最低降到配置限额的比例
+MIN_RATE_FACTOR = 0.1
+
+# 尚无历史时预计的单次输出token数
+INITIAL_EXPECTED_OUTPUT = 256
+
+
+class TokenBucket:
+    """
+    令牌桶
+
+    额度按 rate 每秒补充，最多积累 capacity；预约可以使额度为负（欠账），
+    之后的预约需要等到欠账补齐，因此并发请求按预约顺序依次放行。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        """
+        Args:
+            rate: 每秒补充的额度
+            capacity: 最多积累的额度
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.level = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount: float, now: float) -> float:
+        """
+        预约额度
+
+        Args:
+            amount: 预约的额度
+            now: 当前时刻（time.monotonic）
+
+        Returns:
+            需要等待的时间（秒）
+        """
+        self._refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def set_rate(self, rate: float, capacity: float, now: float) -> None:
+        """调整补充速率（先按原速率结算到当前时刻）"""
+        self._refill(now)
+        self.rate = rate
+        self.capacity = capacity
+        self.level = min(self.level, capacity)
+
+    def adjust(self, amount: float, now: float) -> None:
+        """补扣（为负时退还）额度，不等待"""
+        self._refill(now)
+        self.level = min(self.capacity, self.level - amount)
+
+    def drain(self, now: float) -> None:
+        """清空已积累的额度（收到429后不再突发）"""
+        self._refill(now)
+        self.level = min(self.level, 0.0)
+
+
+class RateLimiter:
+    """单个API密钥的限流器"""
+
+    def __init__(self, name: str, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        """
+        Args:
+            name: 名称（API密钥的环境变量名）
+            rpm: 每分钟请求数限额，为None时不限制
+            tpm: 每分钟token数限额，为None时不限制
+        """
+        self.name = name
+        self.limits = {"requests": rpm, "tokens": tpm}
+        self.factor = 1.0  # 当前速率占限额的比例（收到429后降低）
+        self.expected_output = float(INITIAL_EXPECTED_OUTPUT)  # 输出token数的滑动平均
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+        for kind, limit in self.limits.items():
+            if limit:
+                rate = self._rate(limit)
+                self._buckets[kind] = TokenBucket(rate, self._capacity(rate, kind))
+
+    def _rate(self, limit: float) -> float:
+        """每秒速率：限额乘以余量比例和当前速率比例"""
+        return limit / 60 * ADVANCED_SETTINGS.get("rate_limit_headroom", 0.9) * self.factor
+
+    @staticmethod
+    def _capacity(rate: float, kind: str) -> float:
+        """桶容量：约1秒的额度，请求数至少为1"""
+        return max(rate, 1.0) if kind == "requests" else rate
+
+    def _apply_factor(self, factor: float, now: float) -> None:
+        self.factor = min(1.0, max(MIN_RATE_FACTOR, factor))
+        for kind, bucket in self._buckets.items():
+            rate = self._rate(self.limits[kind])
+            bucket.set_rate(rate, self._capacity(rate, kind), now)
+
+    def reserve(self, tokens: float) -> float:
+        """
+        预约一次请求的额度
+
+        Args:
+            tokens: 预约的token数
+
+        Returns:
+            需要等待的时间（秒）
+        """
+        with self._lock:
+            now = time.monotonic()
+            waits = [bucket.reserve(1 if kind == "requests" else tokens, now)
+                     for kind, bucket in self._buckets.items()]
+            return max(waits, default=0.0)
+
+    def charge(self, tokens: float) -> None:
+        """补扣（为负时退还）token额度，不等待"""
+        bucket = self._buckets.get("tokens")
+        if bucket is None or not tokens:
+            return
+        with self._lock:
+            bucket.adjust(tokens, time.monotonic())
+
+    def record_output(self, tokens: int) -> None:
+        """更新输出token数的滑动平均"""
+        with self._lock:
+            self.expected_output += (tokens - self.expected_output) * 0.2
+
+    def on_rate_limited(self) -> None:
+        """收到429：速率减半并清空积累的额度"""
+        with self._lock:
+            now = time.monotonic()
+            self._apply_factor(self.factor / 2, now)
+            for bucket in self._buckets.values():
+                bucket.drain(now)
+
+    def on_success(self) -> None:
+        """请求成功：逐步恢复速率"""
+        if self.factor >= 1.0:
+            return
+        with self._lock:
+            self._apply_factor(self.factor + ADVANCED_SETTINGS.get("rate_limit_recovery", 0.05), time.monotonic())
+
+    def ticket(self, prompt_tokens: int) -> "RateTicket":
+        """为一次请求创建限流凭据"""
+        return RateTicket(self, prompt_tokens)
+
+
+class RateTicket:
+    """
+    一次请求的限流凭据
+
+    每次尝试（包括重试）调用 acquire 预约输入token和预计的输出token（重试时先退还上一次预约的输出额度），
+    请求结束后调用 settle 按实际输出结算差额。
+    """
+
+    def __init__(self, limiter: RateLimiter, prompt_tokens: int):
+        self.limiter = limiter
+        self.prompt_tokens = prompt_tokens
+        self.reserved_output = 0.0
+        self._reserved = False
+        self._settled = False
+
+    def _reserve(self) -> float:
+        if self._reserved:
+            # 上一次尝试失败，没有产生输出，退还为它预约的输出额度
+            self.limiter.charge(-self.reserved_output)
+        self._reserved = True
+        self.reserved_output = self.limiter.expected_output
+        return self.limiter.reserve(self.prompt_tokens + self.reserved_output)
+
+    def acquire(self) -> float:
+        """
+        预约额度，不足时阻塞等待（同步请求）
+
+        Returns:
+            等待的时间（秒）
+        """
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+    async def acquire_async(self) -> float:
+        """预约额度，不足时在事件循环中等待，返回等待的时间（秒）"""
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def on_error(self, error: BaseException) -> bool:
+        """
+        请求失败：收到429时降低速率
+
+        Returns:
+            是否已换用其他密钥（单个密钥的凭据总是False）
+        """
+        from core.resilience import status_code
+
+        if status_code(error) == 429:
+            self.limiter.on_rate_limited()
+        return False
+
+    def on_success(self) -> None:
+        """请求成功：逐步恢复速率"""
+        self.limiter.on_success()
+
+    def settle(self, output_tokens: int) -> None:
+        """
+        按实际输出结算
+
+        Args:
+            output_tokens: 实际输出的token数
+        """
+        if self._settled:
+            return
+        self._settled = True
+        self.limiter.charge(output_tokens - self.reserved_output)
+        if output_tokens:
+            self.limiter.record_output(output_tokens)
+
+
+_limiters: Dict[Tuple[str, Optional[str]], RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(api_key_env: Optional[str], api_key: Optional[str] = None) -> Optional[RateLimiter]:
+    """
+    获取API密钥对应的限流器
+
+    Args:
+        api_key_env: API密钥的环境变量名
+        api_key: 密钥池中的具体密钥（限额按账户计算，池中每个密钥各有一个限流器）
+
+    Returns:
+        限流器（同一密钥共享），RATE_LIMITS 中没有配置时为None
+    """
+    limits = RATE_LIMITS.get(api_key_env) if api_key_env else None
+    if not limits:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get((api_key_env, api_key))
+        if limiter is None:
+            limiter = _limiters[(api_key_env, api_key)] = RateLimiter(api_key_env, limits.get("rpm"),
+                                                                      limits.get("tpm"))
+        return limiter
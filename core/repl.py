@@ -0,0 +1,162 @@
+"""
+连续对话模块 - 在一个进程内连续提问
+
+模型实例、对话历史和连接池在多次提问之间复用，
+第二个及以后的问题不再承担启动、导入、客户端创建和TLS握手的开销。
+以 / 开头的单行输入作为命令处理。
+"""
+import asyncio
+import traceback
+from contextlib import nullcontext
+from typing import Callable, Dict, Optional
+
+import config
+from core.model import BaseModel
+from core.registry import ModelRegistry
+from core.utils import get_input
+from ui.console import Console
+
+# 命令及说明
+COMMANDS = {
+    "/model": "切换模型并保留对话历史，例如 /model d",
+    "/clear": "清空对话历史",
+    "/mind": "开启或关闭脑图模式",
+    "/help": "显示命令列表",
+    "/exit": "退出",
+}
+
+
+class Repl:
+    """连续对话"""
+
+    def __init__(self, instance: BaseModel, is_mind: bool = False, use_async: bool = False,
+                 mind_map: Optional[Callable[[str], None]] = None,
+                 prepare_mind_map: Optional[Callable[[], None]] = None):
+        """
+        Args:
+            instance: 已初始化的模型实例
+            is_mind: 是否生成思维导图
+            use_async: 是否使用异步请求（所有问题共用一个事件循环）
+            mind_map: 根据回答生成思维导图的函数
+            prepare_mind_map: 提问时在后台准备思维导图整理的函数（与回答并行）
+        """
+        self.console = Console()
+        self.instance = instance
+        self.is_mind = is_mind
+        self.use_async = use_async
+        self.mind_map = mind_map
+        self.prepare_mind_map = prepare_mind_map
+        # 已创建的模型实例，切换回来时复用其客户端
+        self._instances: Dict[str, BaseModel] = {instance.model_key: instance}
+        self._running = False
+
+    def run(self) -> None:
+        """循环读取问题直到退出"""
+        self._running = True
+        self.console.print("已进入连续对话模式，输入 /help 查看命令", style="dim")
+        # 异步模式下复用同一个事件循环，异步客户端的连接池才能跨问题保持
+        with asyncio.Runner() if self.use_async else nullcontext() as runner:
+            while self._running:
+                try:
+                    content = get_input()
+                except (EOFError, KeyboardInterrupt):
+                    break
+                content = content.strip()
+                if not content:
+                    continue
+                if content.startswith("/") and "\n" not in content:
+                    self.handle_command(content)
+                else:
+                    self.ask(content, runner)
+        self.console.print("\n[bold yellow]👋 已退出连续对话[/bold yellow]", style="on black")
+
+    def ask(self, content: str, runner: Optional[asyncio.Runner] = None) -> Optional[str]:
+        """
+        提问并输出回答，出错时显示错误并继续
+
+        Args:
+            content: 问题
+            runner: 异步模式下的事件循环
+
+        Returns:
+            模型响应，出错或中断时为None
+        """
+        if self.is_mind and self.prepare_mind_map is not None:
+            self.prepare_mind_map()
+        try:
+            if runner is not None:
+                response = runner.run(self.instance.request_async(content))
+            else:
+                response = self.instance.req_model(content)
+        except KeyboardInterrupt:
+            self.console.print("\n[bold yellow]⚠️ 已中断本次回答[/bold yellow]", style="on black")
+            return None
+        except Exception as e:
+            self.console.print(f"[bold red]🔥 系统错误:[/bold red] {e}", style="on black")
+            if config.ADVANCED_SETTINGS.get("debug", False):
+                self.console.print(traceback.format_exc(), style="dim red")
+            return None
+
+        if self.is_mind and response and self.mind_map is not None:
+            self.mind_map(response)
+        return response
+
+    def handle_command(self, line: str) -> None:
+        """
+        执行命令
+
+        Args:
+            line: 以 / 开头的命令行
+        """
+        command, _, argument = line.partition(" ")
+        argument = argument.strip()
+
+        if command == "/model":
+            self.switch_model(argument)
+        elif command == "/clear":
+            self.instance.clear_history()
+            self.console.print("已清空对话历史", style="bold yellow")
+        elif command == "/mind":
+            self.is_mind = not self.is_mind
+            self.console.print(f"脑图模式已{'开启' if self.is_mind else '关闭'}", style="bold yellow")
+        elif command in ("/exit", "/quit"):
+            self._running = False
+        elif command == "/help":
+            for name, description in COMMANDS.items():
+                self.console.print(f"  [bold]{name.ljust(7)}[/] {description}")
+        else:
+            self.console.print(f"未知命令 {command}，输入 /help 查看命令", style="bold red")
+
+    def switch_model(self, model_key: str) -> None:
+        """
+        切换模型，新模型接管当前的对话历史和会话；新模型初始化失败时保留当前模型
+
+        Args:
+            model_key: 模型标识符
+        """
+        registry = ModelRegistry()
+        if not model_key:
+            self.console.print(f"当前模型：[bold green]{self.instance.model_key}[/]，"
+                               f"可用模型：{' '.join(sorted(registry._models))}")
+            return
+        if registry.get_model_class(model_key) is None:
+            self.console.print(f"错误：未知模型代号 '{model_key}'", style="bold red")
+            return
+        if model_key == self.instance.model_key:
+            return
+
+        instance = self._instances.get(model_key)
+        if instance is None:
+            try:
+                instance = registry.create_instance(model_key)
+                instance.initialize()
+            except Exception as e:
+                # 初始化失败（如缺少API密钥）时继续使用当前模型
+                self.console.print(f"错误：无法切换到模型 '{model_key}'：{e}", style="bold red")
+                return
+            self._instances[model_key] = instance
+        instance.adopt_history(self.instance)
+        self.instance = instance
+        self.console.print(f"已切换模型：[bold green]{model_key}[/] "
+                           f"([blue]{instance.model_config['display_name']}[/])")
+
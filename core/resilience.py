@@ -0,0 +1,561 @@
+"""
+容错模块 - 提供方调用的超时、重试和熔断
+
+- 超时：连接超时和读取超时由HTTP客户端设置；流式请求另有首字超时和数据块间隔（空闲）超时
+- 重试：429、5xx、连接错误和首字超时按指数退避加随机抖动重试，优先遵循 Retry-After
+- 熔断：按服务地址统计连续失败，达到阈值后在冷却期内直接失败，不再等待超时
+- 已开始输出后的中途失败不重试（内容已经显示），由调用方报告错误
+"""
+import asyncio
+import email.utils
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, Iterator, AsyncIterator, List, Optional, TypeVar
+
+from config import ADVANCED_SETTINGS
+from core.stream import StreamAdapter, openai_events
+
+if TYPE_CHECKING:
+    from core.metrics import RequestMetrics
+    from core.keys import KeyLease
+    from core.ratelimit import RateTicket
+
+T = TypeVar("T")
+
+# 可以重试的HTTP状态码（另外所有5xx都可以重试）
+RETRYABLE_STATUS = (408, 409, 429)
+
+
+class StreamTimeoutError(TimeoutError):
+    """流式响应在规定时间内没有数据"""
+
+
+class CircuitOpenError(RuntimeError):
+    """提供方处于熔断状态"""
+
+
+class ModelRequestError(RuntimeError):
+    """模型请求最终失败（已重试）"""
+
+
+class CircuitBreaker:
+    """
+    熔断器
+
+    连续失败达到阈值后打开，冷却期内直接拒绝请求；
+    冷却期过后放行一个试探请求（半开），成功则关闭，失败则重新打开。
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Args:
+            failure_threshold: 打开熔断的连续失败次数
+            reset_timeout: 熔断冷却时间（秒）
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        """状态：closed、open 或 half_open"""
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return "open"
+        return "half_open"
+
+    def before_call(self, name: str = "") -> None:
+        """
+        请求前检查
+
+        Raises:
+            CircuitOpenError: 熔断中，或半开状态下已有试探请求
+        """
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return
+            if state == "half_open" and not self._trial:
+                self._trial = True
+                return
+            remaining = max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+            raise CircuitOpenError(f"{name or '提供方'} 连续失败 {self.failures} 次，已熔断，{remaining:.0f}秒后重试")
+
+    def record_success(self) -> None:
+        """记录成功"""
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def release(self) -> None:
+        """请求被取消（不计成败），允许下一个请求试探"""
+        with self._lock:
+            self._trial = False
+
+    def record_failure(self) -> None:
+        """记录失败"""
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._trial = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(base_url: Optional[str]) -> CircuitBreaker:
+    """
+    获取服务地址对应的熔断器
+
+    Args:
+        base_url: 服务地址，为空时表示提供方的默认地址
+
+    Returns:
+        熔断器（同一地址共享）
+    """
+    key = base_url or ""
+    with _breakers_lock:
+        breaker = _breakers.get(key)
+        if breaker is None:
+            breaker = _breakers[key] = CircuitBreaker(
+                ADVANCED_SETTINGS.get("circuit_failure_threshold", 5),
+                ADVANCED_SETTINGS.get("circuit_reset_timeout", 30),
+            )
+        return breaker
+
+
+def status_code(error: BaseException) -> Optional[int]:
+    """读取错误的HTTP状态码，没有时为None"""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    """
+    是否是可以重试的错误（限流、服务端错误、连接错误和超时）
+
+    Args:
+        error: 异常
+
+    Returns:
+        是否可以重试
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    status = status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS or status >= 500
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    # SDK的连接错误（openai.APIConnectionError、httpx.TransportError 等）按类名识别，不导入SDK
+    return any(cls.__name__ in ("APIConnectionError", "APITimeoutError", "TransportError", "TimeoutException")
+               for cls in type(error).__mro__)
+
+
+def retry_after(error: BaseException) -> Optional[float]:
+    """
+    读取错误响应中的 Retry-After（秒数或HTTP日期）
+
+    Args:
+        error: 异常
+
+    Returns:
+        建议的等待时间（秒），没有时为None
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if (value := headers.get("retry-after-ms")) is not None:
+            return max(0.0, float(value) / 1000)
+        if (value := headers.get("retry-after")) is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            moment = email.utils.parsedate_to_datetime(value)
+            return max(0.0, moment.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt: int, suggested: Optional[float] = None) -> float:
+    """
+    计算第 attempt 次重试前的等待时间：指数退避加全随机抖动，服务端建议的时间优先
+
+    Args:
+        attempt: 重试序号（从1开始）
+        suggested: 服务端通过 Retry-After 建议的等待时间
+
+    Returns:
+        等待时间（秒），不超过 retry_max_delay
+    """
+    base = ADVANCED_SETTINGS.get("retry_backoff", 1.0)
+    max_delay = ADVANCED_SETTINGS.get("retry_max_delay", 30)
+    delay = random.uniform(0, min(max_delay, base * 2 ** (attempt - 1)))
+    if suggested is not None:
+        delay = max(delay, suggested)
+    return min(delay, max_delay)
+
+
+def _retry_plan(error: BaseException, attempt: int, retries: int, name: str,
+                switched: bool = False) -> Optional[float]:
+    """判断是否重试，需要重试时返回等待时间并提示（已换用其他密钥时不等待）"""
+    from ui.console import Console
+
+    if attempt > retries:
+        return None
+    if switched:
+        Console().print(f"{name or '请求'}失败（{type(error).__name__}: {error}），换用其他密钥重试", style="dim yellow")
+        return 0.0
+    if not is_retryable(error):
+        return None
+    delay = backoff_delay(attempt, retry_after(error))
+    Console().print(f"{name or '请求'}失败（{type(error).__name__}: {error}），{delay:.1f}秒后第{attempt}次重试",
+                    style="dim yellow")
+    return delay
+
+
+def _count_retry(metrics: Optional["RequestMetrics"]) -> None:
+    if metrics is not None:
+        metrics.retries += 1
+        metrics.connected = None
+
+
+def _count_throttle(metrics: Optional["RequestMetrics"], delay: float) -> None:
+    if metrics is not None:
+        metrics.throttled += delay
+
+
+def call_with_retries(fn: Callable[[], T],
+                      base_url: Optional[str] = None,
+                      metrics: Optional["RequestMetrics"] = None,
+                      retries: Optional[int] = None,
+                      name: str = "",
+                      ticket: Optional["RateTicket | KeyLease"] = None) -> T:
+    """
+    调用提供方，失败时按策略重试，并经过服务地址的熔断器
+
+    Args:
+        fn: 发起请求的函数
+        base_url: 服务地址（熔断器的键）
+        metrics: 请求统计（记录重试次数）
+        retries: 最多重试次数，为None时使用 retry_count 配置
+        name: 提示信息中的提供方名称
+        ticket: 限流凭据或密钥租约：每次尝试前预约额度（并选择密钥），失败时通知它调整速率或换用其他密钥
+
+    Returns:
+        fn 的返回值
+
+    Raises:
+        Exception: 不可重试的错误或重试耗尽后的最后一个错误
+    """
+    breaker = get_breaker(base_url)
+    retries = ADVANCED_SETTINGS.get("retry_count", 3) if retries is None else retries
+    attempt = 0
+    while True:
+        if ticket is not None:
+            _count_throttle(metrics, ticket.acquire())
+        breaker.before_call(name)
+        try:
+            result = fn()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # 被用户中断或对冲落选时取消，不计入熔断
+            breaker.release()
+            raise
+        except Exception as e:
+            # 密钥失效时换用其他密钥立即重试
+            switched = ticket is not None and ticket.on_error(e)
+            # 客户端错误（如400、401）说明服务可用，不计入熔断
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            attempt += 1
+            delay = _retry_plan(e, attempt, retries, name, switched)
+            if delay is None:
+                raise
+            _count_retry(metrics)
+            time.sleep(delay)
+            continue
+        breaker.record_success()
+        if ticket is not None:
+            ticket.on_success()
+        return result
+
+
+async def call_with_retries_async(fn: Callable[[], Awaitable[T]],
+                                  base_url: Optional[str] = None,
+                                  metrics: Optional["RequestMetrics"] = None,
+                                  retries: Optional[int] = None,
+                                  name: str = "",
+                                  ticket: Optional["RateTicket | KeyLease"] = None) -> T:
+    """call_with_retries 的异步版本，fn 返回可等待对象"""
+    breaker = get_breaker(base_url)
+    retries = ADVANCED_SETTINGS.get("retry_count", 3) if retries is None else retries
+    attempt = 0
+    while True:
+        if ticket is not None:
+            _count_throttle(metrics, await ticket.acquire_async())
+        breaker.before_call(name)
+        try:
+            result = await fn()
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            # 被用户中断或对冲落选时取消，不计入熔断
+            breaker.release()
+            raise
+        except Exception as e:
+            # 密钥失效时换用其他密钥立即重试
+            switched = ticket is not None and ticket.on_error(e)
+            # 客户端错误（如400、401）说明服务可用，不计入熔断
+            if is_retryable(e):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            attempt += 1
+            delay = _retry_plan(e, attempt, retries, name, switched)
+            if delay is None:
+                raise
+            _count_retry(metrics)
+            await asyncio.sleep(delay)
+            continue
+        breaker.record_success()
+        if ticket is not None:
+            ticket.on_success()
+        return result
+
+
+def _has_text(adapter: StreamAdapter, chunk: Any) -> bool:
+    return any(event.text for event in adapter(chunk))
+
+
+def _close(stream: Any) -> None:
+    close = getattr(stream, "close", None)
+    if callable(close):
+        try:
+            close()
+        except Exception:
+            pass
+
+
+async def close_stream_async(stream: Any) -> None:
+    """关闭提供方的流（同步或异步的 close/aclose，忽略关闭时的错误）"""
+    close = getattr(stream, "close", None) or getattr(stream, "aclose", None)
+    if callable(close):
+        try:
+            result = close()
+            if asyncio.iscoroutine(result):
+                await result
+        except Exception:
+            pass
+
+
+class _Watchdog:
+    """超时看门狗：截止时间到达时调用 on_expire（用于中断阻塞在读取上的同步流）"""
+
+    def __init__(self, on_expire: Callable[[], None]):
+        self._on_expire = on_expire
+        self._deadline: Optional[float] = None
+        self._stopped = False
+        self.expired = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="stream-watchdog", daemon=True)
+        self._thread.start()
+
+    def arm(self, timeout: Optional[float]) -> None:
+        """设置新的截止时间（None表示不限）"""
+        with self._cond:
+            deadline = None if timeout is None else time.monotonic() + timeout
+            earlier = deadline is not None and (self._deadline is None or deadline < self._deadline)
+            self._deadline = deadline
+            # 截止时间推后时看门狗醒来后会自行重新等待，无需唤醒
+            if earlier:
+                self._cond.notify()
+
+    def stop(self) -> None:
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _run(self) -> None:
+        with self._cond:
+            while not self._stopped:
+                if self._deadline is None:
+                    self._cond.wait()
+                    continue
+                remaining = self._deadline - time.monotonic()
+                if remaining <= 0:
+                    self.expired = True
+                    break
+                self._cond.wait(remaining)
+        if self.expired:
+            self._on_expire()
+
+
+class GuardedStream:
+    """
+    带首字超时和空闲超时的同步流
+
+    创建时读到第一个有内容的数据块（超时视为可重试的错误），之后每个数据块的间隔不超过空闲超时。
+    """
+
+    def __init__(self, stream: Any, adapter: StreamAdapter = openai_events,
+                 first_token_timeout: Optional[float] = None, idle_timeout: Optional[float] = None):
+        self._stream = stream
+        self._iterator: Iterator[Any] = iter(stream)
+        self._idle_timeout = idle_timeout
+        self._buffered: List[Any] = []
+        self._watchdog = _Watchdog(lambda: _close(stream))
+        self._watchdog.arm(first_token_timeout)
+        try:
+            for chunk in self._iterator:
+                self._buffered.append(chunk)
+                if _has_text(adapter, chunk):
+                    break
+            self._check(first_token_timeout, "首字")
+        except BaseException as e:
+            self.close()
+            if self._watchdog.expired and not isinstance(e, StreamTimeoutError):
+                raise StreamTimeoutError(f"{first_token_timeout}秒内没有收到首字") from e
+            raise
+        self._watchdog.arm(idle_timeout)
+
+    def _check(self, timeout: Optional[float], what: str) -> None:
+        if self._watchdog.expired:
+            raise StreamTimeoutError(f"{timeout}秒内没有收到{what}")
+
+    def __iter__(self) -> Iterator[Any]:
+        yield from self._buffered
+        self._buffered = []
+        try:
+            for chunk in self._iterator:
+                self._watchdog.arm(self._idle_timeout)
+                yield chunk
+        except Exception as e:
+            if self._watchdog.expired:
+                raise StreamTimeoutError(f"{self._idle_timeout}秒内没有收到新数据") from e
+            raise
+        self._check(self._idle_timeout, "新数据")
+        self._watchdog.stop()
+
+    def close(self) -> None:
+        self._watchdog.stop()
+        _close(self._stream)
+
+
+class GuardedAsyncStream:
+    """GuardedStream 的异步版本，使用 open() 读取首个数据块"""
+
+    def __init__(self, stream: Any, adapter: StreamAdapter = openai_events,
+                 first_token_timeout: Optional[float] = None, idle_timeout: Optional[float] = None):
+        self._stream = stream
+        self._iterator: AsyncIterator[Any] = stream.__aiter__()
+        self._adapter = adapter
+        self._first_token_timeout = first_token_timeout
+        self._idle_timeout = idle_timeout
+        self._buffered: List[Any] = []
+
+    async def _next(self, timeout: Optional[float], what: str) -> Any:
+        try:
+            return await asyncio.wait_for(self._iterator.__anext__(), timeout)
+        except asyncio.TimeoutError:
+            raise StreamTimeoutError(f"{timeout}秒内没有收到{what}") from None
+
+    async def open(self) -> "GuardedAsyncStream":
+        """读到第一个有内容的数据块"""
+        deadline = None if self._first_token_timeout is None else time.monotonic() + self._first_token_timeout
+        try:
+            while True:
+                remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    chunk = await self._next(remaining, "首字")
+                except StopAsyncIteration:
+                    break
+                self._buffered.append(chunk)
+                if _has_text(self._adapter, chunk):
+                    break
+        except BaseException:
+            await self.close()
+            raise
+        return self
+
+    async def __aiter__(self) -> AsyncIterator[Any]:
+        buffered, self._buffered = self._buffered, []
+        for chunk in buffered:
+            yield chunk
+        while True:
+            try:
+                chunk = await self._next(self._idle_timeout, "新数据")
+            except StopAsyncIteration:
+                return
+            yield chunk
+
+    async def close(self) -> None:
+        await close_stream_async(self._stream)
+
+
+def _stream_timeouts() -> Dict[str, Optional[float]]:
+    return {
+        "first_token_timeout": ADVANCED_SETTINGS.get("first_token_timeout"),
+        "idle_timeout": ADVANCED_SETTINGS.get("idle_timeout"),
+    }
+
+
+def open_stream(create: Callable[[], Any],
+                adapter: StreamAdapter = openai_events,
+                metrics: Optional["RequestMetrics"] = None) -> GuardedStream:
+    """
+    发起流式请求并读到首字
+
+    Args:
+        create: 发起请求、返回流的函数
+        adapter: 数据块适配器（判断数据块是否有内容）
+        metrics: 请求统计（记录连接建立时刻）
+
+    Returns:
+        带超时保护的流
+    """
+    stream = create()
+    if metrics is not None:
+        metrics.mark_connected()
+    return GuardedStream(stream, adapter, **_stream_timeouts())
+
+
+async def open_stream_async(create: Callable[[], Awaitable[Any]],
+                            adapter: StreamAdapter = openai_events,
+                            metrics: Optional["RequestMetrics"] = None) -> GuardedAsyncStream:
+    """open_stream 的异步版本"""
+    stream = await create()
+    if metrics is not None:
+        metrics.mark_connected()
+    return await GuardedAsyncStream(stream, adapter, **_stream_timeouts()).open()
+
+
+def request_error(display_name: str, error: BaseException) -> ModelRequestError:
+    """
+    生成面向用户的请求失败异常
+
+    Args:
+        display_name: 模型显示名称
+        error: 原始异常
+
+    Returns:
+        请求失败异常（调用方使用 raise ... from error）
+    """
+    hint = ""
+    status = status_code(error)
+    if status in (401, 403):
+        hint = "，请检查API密钥是否正确设置"
+    elif is_retryable(error):
+        hint = "，请检查网络连接和模型服务是否可用"
+    return ModelRequestError(f"模型 {display_name} 调用失败: {type(error).__name__}: {error}{hint}")
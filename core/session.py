@@ -0,0 +1,216 @@
+"""
+会话模块 - 持久化的命名会话
+
+会话消息只追加写入 SQLite（WAL模式）数据库，按 (会话名, 序号) 建立索引；
+恢复会话时只读取历史缓冲区能容纳的最近若干条消息。
+写入由后台线程批量提交，不阻塞流式输出。
+"""
+import atexit
+import queue
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from config import ADVANCED_SETTINGS
+from core.history import Message
+from core.utils import project_path
+
+# 清空历史的标记（恢复时只读取最后一个标记之后的消息）
+CLEAR_MARKER = "clear"
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS messages ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " session TEXT NOT NULL,"
+    " role TEXT NOT NULL,"
+    " content TEXT NOT NULL,"
+    " tokens INTEGER NOT NULL,"
+    " timestamp REAL NOT NULL,"
+    " model TEXT)",
+    "CREATE INDEX IF NOT EXISTS messages_session ON messages(session, id)",
+)
+
+_store: Optional["SessionStore"] = None
+_store_lock = threading.Lock()
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    conn = sqlite3.connect(str(path), timeout=10, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+class SessionStore:
+    """
+    会话存储
+
+    读取使用调用线程的连接，写入在后台线程中使用单独的连接，
+    每次取出队列中积压的全部消息后在一个事务中提交。
+    """
+
+    def __init__(self, path: Path, flush_interval: float = 0.5):
+        """
+        Args:
+            path: 数据库文件路径
+            flush_interval: 后台线程等待更多消息合并提交的最长时间（秒）
+        """
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = _connect(self.path)
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+        # 旧版本的数据库没有 model 列
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(messages)")}
+        if "model" not in columns:
+            self._conn.execute("ALTER TABLE messages ADD COLUMN model TEXT")
+        self._queue: "queue.Queue[Optional[Tuple[str, str, str, int, float, Optional[str]]]]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def load_tail(self, session: str, limit: int) -> List[Message]:
+        """
+        读取会话最近的消息
+
+        Args:
+            session: 会话名
+            limit: 最多读取的消息条数
+
+        Returns:
+            按时间顺序排列的消息（从最后一次清空之后开始）
+        """
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT role, content, tokens, timestamp, model FROM messages WHERE session = ? ORDER BY id DESC LIMIT ?",
+                (session, limit)
+            ).fetchall()
+        messages = []
+        for role, content, tokens, timestamp, model in rows:
+            if role == CLEAR_MARKER:
+                break
+            messages.append(Message(role, content, tokens, timestamp, model))
+        messages.reverse()
+        return messages
+
+    def append(self, session: str, message: Message) -> None:
+        """追加一条消息（由后台线程写入）"""
+        self._ensure_writer()
+        self._queue.put((session, message.role, message.content, message.tokens, message.timestamp, message.model))
+
+    def _ensure_writer(self) -> None:
+        with self._lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self) -> None:
+        conn = _connect(self.path)
+        pending: List[Tuple[str, str, str, int, float, Optional[str]]] = []
+        try:
+            while True:
+                item = self._queue.get()
+                batch, stop = [], item is None
+                if item is not None:
+                    batch.append(item)
+                # 合并短时间内到达的消息，一次提交
+                while not stop:
+                    try:
+                        item = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        stop = True
+                    else:
+                        batch.append(item)
+                pending.extend(batch)
+                if pending:
+                    try:
+                        with conn:
+                            conn.execute("BEGIN IMMEDIATE")
+                            conn.executemany(
+                                "INSERT INTO messages (session, role, content, tokens, timestamp, model) "
+                                "VALUES (?, ?, ?, ?, ?, ?)",
+                                pending
+                            )
+                        pending = []
+                    except sqlite3.Error as e:
+                        # 数据库被锁定或磁盘已满时保留这批消息，下次写入时重试，写入线程继续运行
+                        from ui.console import Console
+                        
+                        retry = "已放弃" if stop else "将在下次写入时重试"
+                        Console().print(f"会话消息写入失败（{e}），{len(pending)} 条消息{retry}", style="bold red")
+                if stop:
+                    return
+        finally:
+            conn.close()
+
+    def flush(self) -> None:
+        """等待已追加的消息全部写入"""
+        with self._lock:
+            writer = self._writer
+        if writer is not None and writer.is_alive():
+            self._queue.put(None)
+            writer.join()
+
+    def list_sessions(self) -> Dict[str, int]:
+        """列出所有会话及其消息数"""
+        self.flush()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT session, COUNT(*) FROM messages WHERE role != ? GROUP BY session ORDER BY MAX(id) DESC",
+                (CLEAR_MARKER,)
+            ).fetchall()
+        return dict(rows)
+
+    def close(self) -> None:
+        """写入剩余消息并关闭连接"""
+        self.flush()
+        with self._lock:
+            self._conn.close()
+
+
+class Session:
+    """命名会话"""
+
+    def __init__(self, name: str, store: SessionStore):
+        self.name = name
+        self.store = store
+
+    def load(self, limit: int) -> List[Message]:
+        """读取最近的消息"""
+        return self.store.load_tail(self.name, limit)
+
+    def append(self, message: Message) -> None:
+        """追加一条消息"""
+        self.store.append(self.name, message)
+
+    def clear(self) -> None:
+        """记录清空历史（已保存的消息保留在存储中）"""
+        self.store.append(self.name, Message(CLEAR_MARKER, "", 0))
+
+
+def get_session_store() -> SessionStore:
+    """获取按配置创建的会话存储"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            session_dir = project_path(ADVANCED_SETTINGS.get("session_dir", "sessions"))
+            _store = SessionStore(session_dir / "sessions.sqlite3")
+            atexit.register(_store.close)
+        return _store
+
+
+def open_session(name: str) -> Session:
+    """
+    打开（或创建）命名会话
+
+    Args:
+        name: 会话名
+
+    Returns:
+        会话
+    """
+    return Session(name, get_session_store())
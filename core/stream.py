@@ -0,0 +1,458 @@
+"""
+流式响应处理模块 - 统一的流式事件管道
+
+各模型提供方的数据块先由适配器转换为统一的流式事件，再由累积器和
+可插拔的输出端（渲染、历史、持久化等）处理；网络读取与终端渲染解耦。
+"""
+import asyncio
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List, Optional, Sequence
+
+if TYPE_CHECKING:
+    from core.metrics import RequestMetrics
+
+
+class ThreadedStreamReader:
+    """
+    后台线程流读取器
+
+    生产者线程全速读取SDK返回的流并写入缓冲区，消费者按帧间隔一次性取出
+    期间累积的全部数据块，渲染速度慢时不会反压网络读取。
+    """
+
+    def __init__(self, stream: Iterable[Any], source: Any = None):
+        """
+        Args:
+            stream: 要读取的可迭代对象
+            source: 关闭时需要关闭的底层流，默认为 stream 本身
+        """
+        self._stream = stream
+        self._source = stream if source is None else source
+        self._pending: List[Any] = []
+        self._done = False
+        self._closed = False
+        self._error: Optional[BaseException] = None
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="stream-reader", daemon=True)
+
+    def _run(self) -> None:
+        """生产者线程：读取流直到结束"""
+        try:
+            for item in self._stream:
+                with self._cond:
+                    if self._closed:
+                        break
+                    self._pending.append(item)
+                    self._cond.notify()
+        except BaseException as e:
+            with self._cond:
+                if not self._closed:
+                    self._error = e
+        finally:
+            with self._cond:
+                self._done = True
+                self._cond.notify()
+
+    def start(self) -> "ThreadedStreamReader":
+        """启动读取线程"""
+        self._thread.start()
+        return self
+
+    def batches(self, interval: float) -> Iterator[List[Any]]:
+        """
+        按帧间隔产出合并后的数据块批次
+
+        首个数据块到达后立即产出，之后每个帧间隔最多产出一次。
+
+        Args:
+            interval: 帧间隔（秒）
+
+        Yields:
+            距上一帧以来到达的全部数据块
+        """
+        last_frame = float("-inf")
+        while True:
+            with self._cond:
+                # 等待数据到达或读取结束
+                while not self._pending and not self._done:
+                    self._cond.wait(interval or 0.1)
+                # 距上一帧不足一个帧间隔时继续累积
+                remaining = last_frame + interval - time.monotonic()
+                while remaining > 0 and not self._done:
+                    self._cond.wait(remaining)
+                    remaining = last_frame + interval - time.monotonic()
+                items, self._pending = self._pending, []
+                done, error = self._done, self._error
+
+            if items:
+                last_frame = time.monotonic()
+                yield items
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    def close(self) -> None:
+        """停止读取并关闭底层流"""
+        with self._cond:
+            if self._done:
+                return
+            self._closed = True
+        close = getattr(self._source, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception:
+                pass
+
+    def __enter__(self) -> "ThreadedStreamReader":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class AsyncStreamReader:
+    """
+    异步流读取器
+
+    读取任务在事件循环中全速消费异步流并写入缓冲区，消费者按帧间隔取出
+    期间累积的全部数据块，与 ThreadedStreamReader 的行为保持一致。
+    """
+
+    def __init__(self, stream: AsyncIterable[Any], source: Any = None):
+        """
+        Args:
+            stream: 要读取的异步可迭代对象
+            source: 关闭时需要关闭的底层流，默认为 stream 本身
+        """
+        self._stream = stream
+        self._source = stream if source is None else source
+        self._pending: List[Any] = []
+        self._done = False
+        self._error: Optional[BaseException] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        """读取任务：读取流直到结束"""
+        try:
+            async for item in self._stream:
+                self._pending.append(item)
+                self._wakeup.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error = e
+        finally:
+            self._done = True
+            self._wakeup.set()
+
+    def start(self) -> "AsyncStreamReader":
+        """启动读取任务"""
+        self._task = asyncio.ensure_future(self._run())
+        return self
+
+    async def batches(self, interval: float) -> AsyncIterator[List[Any]]:
+        """
+        按帧间隔产出合并后的数据块批次
+
+        Args:
+            interval: 帧间隔（秒）
+
+        Yields:
+            距上一帧以来到达的全部数据块
+        """
+        loop = asyncio.get_running_loop()
+        last_frame = float("-inf")
+        while True:
+            # 等待数据到达或读取结束
+            while not self._pending and not self._done:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+            # 距上一帧不足一个帧间隔时继续累积
+            remaining = last_frame + interval - loop.time()
+            if remaining > 0 and not self._done:
+                await asyncio.sleep(remaining)
+
+            items, self._pending = self._pending, []
+            done, error = self._done, self._error
+
+            if items:
+                last_frame = loop.time()
+                yield items
+            if done:
+                if error is not None:
+                    raise error
+                return
+
+    async def close(self) -> None:
+        """停止读取并关闭底层流"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            close = getattr(self._source, "close", None)
+            if callable(close):
+                try:
+                    result = close()
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    pass
+
+    async def __aenter__(self) -> "AsyncStreamReader":
+        return self.start()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        await self.close()
+
+
+class StreamEvent:
+    """流式事件"""
+    
+    __slots__ = ("kind", "text", "data")
+    
+    # 事件类型
+    REASONING = "reasoning"  # 思考内容增量
+    CONTENT = "content"  # 结论内容增量
+    USAGE = "usage"  # 用量统计
+    FINISH = "finish"  # 结束原因
+    
+    def __init__(self, kind: str, text: str = "", data: Any = None):
+        self.kind = kind
+        self.text = text
+        self.data = data
+    
+    def __repr__(self) -> str:
+        return f"StreamEvent({self.kind!r}, {self.text!r}, {self.data!r})"
+
+
+# 适配器：将提供方的数据块转换为流式事件列表
+StreamAdapter = Callable[[Any], List[StreamEvent]]
+
+
+def openai_events(chunk: Any) -> List[StreamEvent]:
+    """OpenAI协议数据块适配器（兼容 reasoning_content 思考内容）"""
+    events = []
+    choices = getattr(chunk, "choices", None)
+    if choices:
+        choice = choices[0]
+        delta = getattr(choice, "delta", None)
+        if delta is not None:
+            if reasoning := getattr(delta, "reasoning_content", None):
+                events.append(StreamEvent(StreamEvent.REASONING, reasoning))
+            if content := getattr(delta, "content", None):
+                events.append(StreamEvent(StreamEvent.CONTENT, content))
+        if finish_reason := getattr(choice, "finish_reason", None):
+            events.append(StreamEvent(StreamEvent.FINISH, data=finish_reason))
+    if usage := getattr(chunk, "usage", None):
+        events.append(StreamEvent(StreamEvent.USAGE, data=usage))
+    return events
+
+
+def openai_message_events(response: Any) -> List[StreamEvent]:
+    """OpenAI协议非流式响应适配器，将完整消息转换为事件"""
+    choices = getattr(response, "choices", None)
+    if not choices:
+        return []
+    message = getattr(choices[0], "message", None)
+    events = []
+    if reasoning := getattr(message, "reasoning_content", None):
+        events.append(StreamEvent(StreamEvent.REASONING, reasoning))
+    if content := getattr(message, "content", None):
+        events.append(StreamEvent(StreamEvent.CONTENT, content))
+    if finish_reason := getattr(choices[0], "finish_reason", None):
+        events.append(StreamEvent(StreamEvent.FINISH, data=finish_reason))
+    if usage := getattr(response, "usage", None):
+        events.append(StreamEvent(StreamEvent.USAGE, data=usage))
+    return events
+
+
+def mistral_events(chunk: Any) -> List[StreamEvent]:
+    """Mistral数据块适配器（流式事件的数据位于 data 属性中）"""
+    return openai_events(getattr(chunk, "data", chunk))
+
+
+def passthrough_events(chunk: Any) -> List[StreamEvent]:
+    """回放适配器：数据块本身就是事件列表（如缓存的响应）"""
+    return list(chunk)
+
+
+def text_events(chunk: Any) -> List[StreamEvent]:
+    """纯文本数据块适配器（如Gemini的 text 属性）"""
+    text = getattr(chunk, "text", None)
+    return [StreamEvent(StreamEvent.CONTENT, text)] if text else []
+
+
+class StreamSink:
+    """
+    流式事件输出端基类
+
+    管道在开始时调用 open()，每个事件调用 feed()，每帧调用一次 flush()，
+    结束（包括异常）时调用 close()。
+    """
+    
+    def open(self) -> None:
+        """开始输出"""
+        pass
+    
+    def feed(self, event: StreamEvent) -> None:
+        """处理一个事件"""
+        pass
+    
+    def flush(self) -> None:
+        """输出一帧"""
+        pass
+    
+    def close(self) -> None:
+        """结束输出"""
+        pass
+
+
+class StreamAccumulator(StreamSink):
+    """流式响应累积器，使用列表缓冲避免字符串重复拼接"""
+    
+    def __init__(self):
+        self._reasoning: List[str] = []
+        self._content: List[str] = []
+        self.usage: Any = None
+        self.finish_reason: Optional[str] = None
+    
+    @classmethod
+    def from_events(cls, events: Iterable[StreamEvent]) -> "StreamAccumulator":
+        """从事件序列（如非流式响应转换出的事件）创建累积结果"""
+        accumulator = cls()
+        for event in events:
+            accumulator.feed(event)
+        return accumulator
+    
+    def feed(self, event: StreamEvent) -> None:
+        kind = event.kind
+        if kind == StreamEvent.CONTENT:
+            self._content.append(event.text)
+        elif kind == StreamEvent.REASONING:
+            self._reasoning.append(event.text)
+        elif kind == StreamEvent.USAGE:
+            self.usage = event.data
+        elif kind == StreamEvent.FINISH:
+            self.finish_reason = event.data
+    
+    @property
+    def reasoning(self) -> str:
+        """完整思考内容"""
+        return "".join(self._reasoning)
+    
+    @property
+    def content(self) -> str:
+        """完整结论内容"""
+        return "".join(self._content)
+
+
+class StreamPipeline:
+    """
+    流式事件管道
+
+    读取端在后台线程（同步）或读取任务（异步）中全速读取数据块并转换为事件，
+    输出端每帧一次性处理期间到达的全部事件。
+    """
+    
+    def __init__(self,
+                 adapter: StreamAdapter = openai_events,
+                 sinks: Sequence[StreamSink] = (),
+                 frame_interval: float = 0.0,
+                 metrics: Optional["RequestMetrics"] = None):
+        """
+        Args:
+            adapter: 数据块适配器
+            sinks: 输出端列表
+            frame_interval: 帧间隔（秒），为0时每批事件到达后立即输出
+            metrics: 请求耗时统计，数据到达时刻在读取端记录，渲染耗时在输出端记录
+        """
+        self.adapter = adapter
+        self.accumulator = StreamAccumulator()
+        self.sinks: List[StreamSink] = [self.accumulator, *sinks]
+        self.frame_interval = frame_interval
+        self.metrics = metrics
+    
+    def _events(self, stream: Iterable[Any]) -> Iterator[StreamEvent]:
+        adapter, metrics = self.adapter, self.metrics
+        for chunk in stream:
+            events = adapter(chunk)
+            if metrics is not None:
+                metrics.on_chunk(events)
+            yield from events
+    
+    async def _events_async(self, stream: AsyncIterable[Any]) -> AsyncIterator[StreamEvent]:
+        adapter, metrics = self.adapter, self.metrics
+        async for chunk in stream:
+            events = adapter(chunk)
+            if metrics is not None:
+                metrics.on_chunk(events)
+            for event in events:
+                yield event
+    
+    def _dispatch(self, events: List[StreamEvent]) -> None:
+        for sink in self.sinks:
+            for event in events:
+                sink.feed(event)
+    
+    def _flush(self) -> None:
+        for sink in self.sinks:
+            sink.flush()
+    
+    def _close(self) -> None:
+        for sink in reversed(self.sinks):
+            sink.close()
+    
+    def run(self, stream: Iterable[Any]) -> StreamAccumulator:
+        """
+        处理同步流
+        
+        Args:
+            stream: 提供方返回的流
+            
+        Returns:
+            累积器
+        """
+        for sink in self.sinks:
+            sink.open()
+        try:
+            with ThreadedStreamReader(self._events(stream), source=stream) as reader:
+                for events in reader.batches(self.frame_interval):
+                    started = time.perf_counter()
+                    self._dispatch(events)
+                    self._flush()
+                    if self.metrics is not None:
+                        self.metrics.add_render_time(time.perf_counter() - started)
+        finally:
+            self._close()
+        return self.accumulator
+    
+    async def run_async(self, stream: AsyncIterable[Any]) -> StreamAccumulator:
+        """
+        处理异步流，渲染放到线程中执行，不阻塞事件循环
+        
+        Args:
+            stream: 提供方返回的异步流
+            
+        Returns:
+            累积器
+        """
+        for sink in self.sinks:
+            sink.open()
+        try:
+            async with AsyncStreamReader(self._events_async(stream), source=stream) as reader:
+                async for events in reader.batches(self.frame_interval):
+                    started = time.perf_counter()
+                    self._dispatch(events)
+                    # 渲染期间读取任务继续接收数据
+                    await asyncio.to_thread(self._flush)
+                    if self.metrics is not None:
+                        self.metrics.add_render_time(time.perf_counter() - started)
+        finally:
+            self._close()
+        return self.accumulator
@@ -0,0 +1,54 @@
+"""
+Token估算模块 - 在不加载分词器的情况下估算消息的token数
+
+不同提供方的分词器不同，这里采用偏保守的估算：
+中日韩字符按每字1个token，其余字符按每4个字符1个token，每条消息另加固定开销。
+"""
+import re
+from typing import Any, Mapping, Optional
+
+from config import ADVANCED_SETTINGS
+
+# 每条消息的格式开销（角色标记、分隔符等）
+MESSAGE_OVERHEAD = 4
+
+# 中日韩字符（统一表意文字、假名、谚文及全角标点）
+_CJK = re.compile(r"[　-ヿ㐀-䶿一-鿿가-힯豈-﫿＀-￯]")
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    """
+    估算文本的token数
+
+    Args:
+        text: 文本
+
+    Returns:
+        估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def message_tokens(message: Mapping[str, Any]) -> int:
+    """估算一条消息（含格式开销）的token数"""
+    return estimate_tokens(message.get("content")) + MESSAGE_OVERHEAD
+
+
+def history_budget(config: Mapping[str, Any], prompt_tokens: int, max_tokens: Optional[int] = None) -> int:
+    """
+    计算可用于历史消息的token预算
+
+    Args:
+        config: 模型配置（读取 context_window）
+        prompt_tokens: 系统消息和本轮问题占用的token数
+        max_tokens: 为回答预留的token数，为空时使用 reserve_output_tokens 配置
+
+    Returns:
+        历史消息的token预算（不小于0）
+    """
+    context_window = config.get("context_window") or ADVANCED_SETTINGS.get("default_context_window", 32768)
+    reserve = max_tokens or ADVANCED_SETTINGS.get("reserve_output_tokens", 4096)
+    return max(0, context_window - reserve - prompt_tokens)
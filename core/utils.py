@@ -4,6 +4,7 @@
 import os
 import sys
 import asyncio
+from pathlib import Path
 from typing import Optional, List, Dict, Any, Callable
 
 
@@ -35,6 +36,36 @@ def get_input(conclusion: Optional[str] = None) -> str:
     return '\n'.join(lines)
 
 
+def is_interactive() -> bool:
+    """标准输入和标准输出都是终端时才可以向用户提问"""
+    from ui.output import is_headless
+    
+    return sys.stdin.isatty() and not is_headless()
+
+
+def confirm(question: str, default: bool = True) -> bool:
+    """
+    向用户确认
+    
+    Args:
+        question: 问题
+        default: 直接回车时的选择
+        
+    Returns:
+        用户是否确认
+    """
+    from ui.console import Console
+    
+    Console().print(f"{question} [{'Y/n' if default else 'y/N'}]", style="bold cyan", end=" ")
+    try:
+        answer = input().strip().lower()
+    except EOFError:
+        return False
+    if not answer:
+        return default
+    return answer in ("y", "yes", "是")
+
+
 def get_env_var(name: str, default: Optional[str] = None, required: bool = False) -> Optional[str]:
     """
     安全地获取环境变量
@@ -53,6 +84,22 @@ def get_env_var(name: str, default: Optional[str] = None, required: bool = False
     return value
 
 
+def project_path(path: str) -> Path:
+    """
+    解析配置中的路径，相对路径基于项目根目录
+    
+    Args:
+        path: 配置的路径
+        
+    Returns:
+        绝对路径
+    """
+    resolved = Path(path).expanduser()
+    if not resolved.is_absolute():
+        resolved = Path(__file__).resolve().parent.parent / resolved
+    return resolved
+
+
 def run_async(func: Callable, *args, **kwargs) -> Any:
     """
     运行异步函数
@@ -6,14 +6,16 @@
 """
 import traceback
 import asyncio
-from typing import Any, Optional
+from typing import Any, List, Optional
 from functools import wraps
 import shutil
+from pathlib import Path
 
 import config
 from ui.console import Console
 from core.args import ArgumentParser
 from core.registry import ModelRegistry
+from core.resilience import ModelRequestError
 from utils.markmap import markdown_to_markmap
 
 # 导入所有模型，确保它们被注册
@@ -34,6 +36,8 @@ def handle_exceptions(func):
             return func(*args, **kwargs)
         except KeyboardInterrupt:
             console.print("\n[bold yellow]⚠️ 检测到用户终止操作，Bye😊！[/bold yellow]", style="on black")
+        except ModelRequestError as e:
+            console.print(f"[bold red]🔥 模型调用失败:[/bold red] {e}", style="on black")
         except ValueError as e:
             console.print(f"[bold red]❌ 输入错误:[/bold red] {e}", style="on black")
         except Exception as e:
@@ -50,6 +54,8 @@ def handle_exceptions(func):
             return await func(*args, **kwargs)
         except KeyboardInterrupt:
             console.print("\n[bold yellow]⚠️ 检测到用户终止操作，Bye😊！[/bold yellow]", style="on black")
+        except ModelRequestError as e:
+            console.print(f"[bold red]🔥 模型调用失败:[/bold red] {e}", style="on black")
         except ValueError as e:
             console.print(f"[bold red]❌ 输入错误:[/bold red] {e}", style="on black")
         except Exception as e:
@@ -63,6 +69,32 @@ def handle_exceptions(func):
     return async_wrapper if asyncio.iscoroutinefunction(func) else sync_wrapper
 
 
+def start_mind_map() -> None:
+    """在后台创建思维导图整理模型实例并预先建立连接"""
+    from core.mindmap import get_mind_map_pipeline
+    
+    get_mind_map_pipeline().start()
+
+
+def _direct_outline(response: str) -> Optional[str]:
+    """回答本身已经是结构清晰的大纲时返回大纲（直接生成，不再请求模型整理），否则为None"""
+    from utils.outline import extract_outline
+    
+    outline = extract_outline(response)
+    if outline is not None:
+        console.print("回答已是结构化大纲，直接生成思维导图", style="bold cyan")
+    else:
+        # 将原始响应发送给整理模型（默认为C模型，豆包256k）静默整理，不在终端重复输出
+        console.print("正在将内容整理为思维导图...", style="bold cyan")
+    return outline
+
+
+def _report_mind_map_error(e: Exception) -> None:
+    console.print(f"[bold red]🔥 创建思维导图失败:[/bold red] {e}", style="on black")
+    if config.ADVANCED_SETTINGS.get("debug", False):
+        console.print(traceback.format_exc(), style="dim red")
+
+
 def create_mind_map(response: str) -> None:
     """
     创建思维导图
@@ -73,67 +105,104 @@ def create_mind_map(response: str) -> None:
     if not response:
         return
     
+    from core.mindmap import get_mind_map_pipeline
+    
     try:
-        # 将原始响应发送给C模型（豆包256k）进行整理
-        console.print("正在将内容整理为思维导图...", style="bold cyan")
+        outline = _direct_outline(response)
+        if outline is not None:
+            markdown_to_markmap(outline)
+            return
         
-        # 使用run_model方法调用C模型，并传入原始响应作为输入
-        mind_map_content = run_model(config.MODEL_GENERATE_MIND, False, f"请将以下内容整理为一个结构化的思维导图内容:\n\n{response}")
-
-        # 显示成功提示
+        mind_map_content = get_mind_map_pipeline().summarize(response)
         console.print("[bold green]✨ 思维导图生成完成！[/bold green]", style="on black")
+        markdown_to_markmap(mind_map_content)
+    except Exception as e:
+        _report_mind_map_error(e)
 
-        # 使用处理后的内容创建思维导图
+
+async def create_mind_map_async(response: str) -> None:
+    """
+    创建思维导图（异步模式：等待整理时不阻塞事件循环）
+    
+    Args:
+        response: 模型响应文本
+    """
+    if not response:
+        return
+    
+    from core.mindmap import get_mind_map_pipeline
+    
+    try:
+        outline = _direct_outline(response)
+        if outline is not None:
+            markdown_to_markmap(outline)
+            return
+        
+        mind_map_content = await get_mind_map_pipeline().summarize_async(response)
+        console.print("[bold green]✨ 思维导图生成完成！[/bold green]", style="on black")
         markdown_to_markmap(mind_map_content)
     except Exception as e:
-        console.print(f"[bold red]🔥 创建思维导图失败:[/bold red] {e}", style="on black")
-        if config.ADVANCED_SETTINGS.get("debug", False):
-            console.print(traceback.format_exc(), style="dim red")
+        _report_mind_map_error(e)
 
 
-def initialize_model(model_key: str):
+def initialize_model(model_key: str, session: Optional[str] = None):
     """
     初始化模型实例
     
     Args:
         model_key: 模型标识符
+        session: 会话名，指定时从会话恢复历史并保存新的对话
         
     Returns:
         初始化后的模型实例
     """
+    from core.hedge import create_hedged_model, hedge_enabled
+    
     registry = ModelRegistry()
-    instance = registry.create_instance(model_key)
+    instance = create_hedged_model(model_key) if hedge_enabled() else None
+    if instance is not None:
+        keys = ", ".join(member.model_key for member in instance.members)
+        console.print(f"已启用对冲请求：{keys}", style="bold cyan")
+    else:
+        instance = registry.create_instance(model_key)
     instance.initialize()
+    if session:
+        from core.session import open_session
+        restored = instance.attach_session(open_session(session))
+        if restored:
+            console.print(f"已恢复会话 {session} 的 {restored} 条历史消息", style="dim")
     return instance
 
 
 @handle_exceptions
-async def run_async_model(model_key: str, is_mind: bool) -> None:
+async def run_async_model(model_key: str, is_mind: bool, session: Optional[str] = None) -> None:
     """
     异步运行模型
     
     Args:
         model_key: 模型标识符
         is_mind: 是否生成思维导图
+        session: 会话名
     """
     # 初始化模型
-    instance = initialize_model(model_key)
+    instance = initialize_model(model_key, session)
+    
+    # 在后台准备思维导图整理模型，与主回答并行
+    if is_mind:
+        start_mind_map()
     
-    # 异步请求模型响应
-    with console.create_progress() as progress:
-        task = progress.add_task("正在处理请求...", total=None)
-        response = await instance.request_async(None)
-        progress.update(task, completed=100, description="[bold green]✓ 思考完成！")
+    # 异步请求模型响应（流式实时显示）
+    response = await instance.request_async(None)
     
     # 如果启用了思维导图模式，创建思维导图
     if is_mind and response:
-        create_mind_map(response)
+        await create_mind_map_async(response)
         
     return response
 
 
 @handle_exceptions
-def run_model(model_key: str, is_mind: bool, content: str = None) -> Any | None:
+def run_model(model_key: str, is_mind: bool, content: str = None, session: Optional[str] = None) -> Any | None:
     """
     同步运行模型
 
@@ -141,9 +210,14 @@ def run_model(model_key: str, is_mind: bool, content: str = None) -> Any | None:
         model_key: 模型标识符
         is_mind: 是否生成思维导图
         content: 模型输入内容，默认为None表示从标准输入获取
+        session: 会话名
     """
     # 初始化模型
-    instance = initialize_model(model_key)
+    instance = initialize_model(model_key, session)
+
+    # 在后台准备思维导图整理模型，与主回答并行
+    if is_mind:
+        start_mind_map()
 
     # 请求模型响应
     response = instance.req_model(content)
@@ -155,20 +229,109 @@ def run_model(model_key: str, is_mind: bool, content: str = None) -> Any | None:
     return response
 
 
+def run_repl(model_key: str, is_mind: bool, use_async: bool, session: Optional[str] = None) -> None:
+    """
+    连续对话模式，复用模型实例、对话历史和连接
+    
+    Args:
+        model_key: 模型标识符
+        is_mind: 是否生成思维导图
+        use_async: 是否使用异步模式
+        session: 会话名
+    """
+    from core.repl import Repl
+    
+    instance = initialize_model(model_key, session)
+    Repl(instance, is_mind, use_async, mind_map=create_mind_map, prepare_mind_map=start_mind_map).run()
+
+
+@handle_exceptions
+async def run_batch_mode(model_key: str, input_path: str, output_path: Optional[str] = None,
+                         concurrency: Optional[int] = None) -> None:
+    """
+    批量模式，并发运行JSONL文件中的问题
+    
+    Args:
+        model_key: 模型标识符
+        input_path: 输入文件路径
+        output_path: 输出文件路径
+        concurrency: 最大并发请求数
+    """
+    from core.batch import default_output_path, run_batch
+    
+    instance = initialize_model(model_key)
+    output_path = output_path or default_output_path(Path(input_path))
+    succeeded, failed = await run_batch(instance, input_path, output_path, concurrency)
+    
+    style = "bold green" if not failed else "bold yellow"
+    console.print(f"批量完成：成功 {succeeded} 个，失败 {failed} 个，结果已写入 {output_path}", style=style)
+    if failed:
+        console.print("重新运行相同的命令将只重试失败的问题", style="dim")
+
+
+@handle_exceptions
+async def run_fanout_mode(model_keys: List[str]) -> None:
+    """
+    多模型并发模式，把同一个问题同时发给多个模型
+    
+    Args:
+        model_keys: 模型标识符列表
+    """
+    from core.fanout import print_results, run_fanout
+    from core.utils import get_input
+    
+    content = get_input()
+    if not content:
+        return
+    print_results(await run_fanout(model_keys, content))
+
+
+def run_rebuild_mode(directory: Optional[str] = None, workers: Optional[int] = None) -> None:
+    """
+    重建思维导图模式，只重新生成内容或模板变化过的文件
+    
+    Args:
+        directory: Markdown文件所在目录，为None时使用 resource/md_cache
+        workers: 工作进程数
+    """
+    from utils.markmap_rebuild import rebuild_markmaps
+    
+    try:
+        result = rebuild_markmaps(directory, workers)
+    except FileNotFoundError as e:
+        console.print(f"错误：{e}", style="bold red")
+        return
+    style = "bold green" if not result.failed else "bold yellow"
+    console.print(f"重建完成：生成 {result.rebuilt} 个，失败 {result.failed} 个，未变化 {result.skipped} 个", style=style)
+
+
 def main() -> None:
     """程序主入口"""
     # 解析命令行参数
     parser = ArgumentParser()
     model_key, is_mind, use_async = parser.parse_args()
     
+    args = parser.args
+    if args is not None and args.rebuild_mindmaps is not None and not args.help:
+        run_rebuild_mode(args.rebuild_mindmaps or None, args.concurrency)
+        return
+    
     if model_key is None:
         return
     
+    session = args.session
+    
     # 根据不同模式运行
-    if use_async:
-        asyncio.run(run_async_model(model_key, is_mind))
+    if args.batch:
+        asyncio.run(run_batch_mode(model_key, args.batch, args.batch_output, args.concurrency))
+    elif args.models:
+        asyncio.run(run_fanout_mode(args.models))
+    elif args.interactive:
+        run_repl(model_key, is_mind, use_async, session)
+    elif use_async:
+        asyncio.run(run_async_model(model_key, is_mind, session))
     else:
-        run_model(model_key, is_mind)
+        run_model(model_key, is_mind, session=session)
 
 
 if __name__ == "__main__":
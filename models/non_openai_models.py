@@ -2,20 +2,26 @@
 非 OpenAI 协议模型实现
 """
 import os
-from typing import Optional, Dict, Any
-
-# Google Gemini
-import google.generativeai as genai
-
-# Mistral
-from mistralai import Mistral
+from typing import TYPE_CHECKING, Optional, Dict, Any, Sequence
 
+# 各提供方SDK在模型初始化时才导入，注册只依赖配置元数据
 from core.model import BaseModel
 from core.registry import register_model
 from core.utils import get_input, get_env_var
-from ui.console import print_stream, print_conclusion, markdown_stream
+from core.metrics import RequestMetrics, report_metrics
+from core.resilience import (call_with_retries, call_with_retries_async, open_stream, open_stream_async,
+                             request_error)
+from core.stream import StreamAccumulator, StreamPipeline, StreamSink, mistral_events, openai_message_events
+from ui.output import render_stream, print_conclusion, markdown_stream
 from config import non_openai_models_config
 
+if TYPE_CHECKING:
+    from core.cache import CacheKey
+
+
+# Mistral服务地址（熔断器的键）
+MISTRAL_BASE_URL = "https://api.mistral.ai"
+
 
 # 使用配置自动注册装饰器
 def model_config_register(model_key: str):
@@ -44,6 +50,8 @@ def get_model_config(model_name: str, key: str, default=None):
     
 #     def _initialize(self) -> None:
 #         """初始化Gemini模型"""
+#         import google.generativeai as genai
+#         
 #         api_key_env = self._model_config.get("api_key_env")
 #         api_key = get_env_var(api_key_env)
         
@@ -82,6 +90,8 @@ class MistralModel(BaseModel):
     
     def _initialize(self) -> None:
         """初始化Mistral模型"""
+        from mistralai import Mistral
+        
         api_key_env = self._model_config.get("api_key_env")
         api_key = get_env_var(api_key_env)
         
@@ -97,46 +107,90 @@ class MistralModel(BaseModel):
             get_model_config("mistral", "system_message")
         )
     
+    def _build_messages(self, content: str, **kwargs) -> list:
+        """构建Mistral请求消息"""
+        from core.tokens import history_budget, message_tokens
+        
+        system_message = {"role": "system", "content": self.system_message}
+        user_message = {"role": "user", "content": content}
+        
+        # 历史消息按token预算选取
+        budget = history_budget(self._model_config, message_tokens(system_message) + message_tokens(user_message),
+                                kwargs.get("max_tokens", self._model_config.get("max_tokens")))
+        history_limit = kwargs.get("history_limit")
+        history = self.history_window(budget, history_limit * 2 if history_limit is not None else None)
+        return [system_message, *(dict(message) for message in history), user_message]
+    
+    def _cache_key(self, content: str, **kwargs) -> Optional["CacheKey"]:
+        """按模型ID和消息计算缓存键"""
+        from core.cache import make_cache_keys
+        
+        model_id = self._model_config.get("model_id", get_model_config("mistral", "model_id"))
+        return make_cache_keys(model_id, self._build_messages(content, **kwargs))
+    
     def _request_implementation(self, content: str, **kwargs) -> str:
-        """实现Mistral请求"""
+        """实现Mistral请求（失败时抛出 ModelRequestError）"""
+        metrics = self.last_metrics = RequestMetrics(self._model_key, self._model_config.get("model_id"))
+        name = self._model_config.get("display_name", "Mistral")
         try:
             # 准备消息
-            messages = [
-                {"role": "system", "content": self.system_message}
-            ]
-            
-            # 添加历史消息
-            history_limit = kwargs.get("history_limit", get_model_config("mistral", "history_limit", 10))
-            if history_limit > 0 and len(self.history) > 0:
-                # 添加最近的历史记录（不超过限制）
-                history_to_add = self.history[-history_limit*2:] if history_limit > 0 else []
-                for msg in history_to_add:
-                    messages.append({"role": msg["role"], "content": msg["content"]})
-            
-            # 添加当前消息
-            messages.append({"role": "user", "content": content})
+            messages = self._build_messages(content, **kwargs)
             
             # 设置参数
             model_id = self._model_config.get("model_id", get_model_config("mistral", "model_id"))
             stream = kwargs.get("stream", get_model_config("mistral", "stream"))
             
             if stream:
-                # 流式请求
-                response_stream = self.client.chat_stream(
-                    model=model_id,
-                    messages=messages
+                # 流式请求：读到首字之前的失败和超时会重试
+                response_stream = call_with_retries(
+                    lambda: open_stream(lambda: self.client.chat.stream(model=model_id, messages=messages),
+                                        adapter=mistral_events, metrics=metrics),
+                    MISTRAL_BASE_URL, metrics, name=name
                 )
-                return print_stream(response_stream)
+                self.last_result = render_stream(response_stream, adapter=mistral_events, metrics=metrics)
+                return self.last_result.content
             else:
                 # 非流式请求
-                response = self.client.chat.complete(
-                    model=model_id,
-                    messages=messages
+                response = call_with_retries(
+                    lambda: self.client.chat.complete(model=model_id, messages=messages),
+                    MISTRAL_BASE_URL, metrics, name=name
                 )
-                content = response.choices[0].message.content
-                return print_conclusion(content)
+                metrics.mark_connected()
+                events = openai_message_events(response)
+                metrics.on_chunk(events)
+                self.last_result = StreamAccumulator.from_events(events)
+                return print_conclusion(response.choices[0].message.content)
                 
         except Exception as e:
-            error_message = f"Mistral模型调用失败: {str(e)}"
-            print(error_message)
-            return error_message 
\ No newline at end of file
+            metrics.finish(e)
+            raise request_error(name, e) from e
+        finally:
+            report_metrics(metrics.finish())
+    
+    async def _complete_async(self,
+                              content: str,
+                              sinks: Sequence[StreamSink],
+                              metrics: RequestMetrics,
+                              **kwargs) -> StreamAccumulator:
+        """通过Mistral异步接口请求，流式时输出到 sinks"""
+        messages = self._build_messages(content, **kwargs)
+        model_id = self._model_config.get("model_id", get_model_config("mistral", "model_id"))
+        
+        name = self._model_config.get("display_name", "Mistral")
+        
+        if kwargs.get("stream"):
+            response_stream = await call_with_retries_async(
+                lambda: open_stream_async(lambda: self.client.chat.stream_async(model=model_id, messages=messages),
+                                          adapter=mistral_events, metrics=metrics),
+                MISTRAL_BASE_URL, metrics, name=name
+            )
+            return await StreamPipeline(mistral_events, sinks, metrics=metrics).run_async(response_stream)
+        
+        response = await call_with_retries_async(
+            lambda: self.client.chat.complete_async(model=model_id, messages=messages),
+            MISTRAL_BASE_URL, metrics, name=name
+        )
+        metrics.mark_connected()
+        events = openai_message_events(response)
+        metrics.on_chunk(events)
+        return StreamAccumulator.from_events(events)
@@ -0,0 +1,114 @@
+import asyncio
+import io
+import json
+import tempfile
+import unittest
+from contextlib import redirect_stdout
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from core import cache as cache_module
+from core.batch import load_completed, run_batch
+from core.openai_model import OpenAICompatibleModel
+from core.stream import StreamAccumulator, StreamEvent
+
+
+class FakeBatchModel:
+    """记录并发数的假模型"""
+
+    model_key = "fake"
+    model_id = "fake-model"
+    supports_complete_async = True
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.in_flight = self.max_in_flight = 0
+        self.prompts = []
+
+    async def complete_async(self, content, **kwargs):
+        self.prompts.append(content)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.01)
+            if content in self.fail:
+                raise RuntimeError("服务不可用")
+            return StreamAccumulator.from_events([StreamEvent(StreamEvent.CONTENT, f"回答:{content}")])
+        finally:
+            self.in_flight -= 1
+
+
+class TestBatch(unittest.TestCase):
+    """测试批量模式"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.input = Path(self.tmp.name) / "prompts.jsonl"
+        self.output = Path(self.tmp.name) / "prompts.out.jsonl"
+        lines = [json.dumps({"id": f"q{i}", "prompt": f"问题{i}"}, ensure_ascii=False) for i in range(10)]
+        self.input.write_text("\n".join(lines) + "\n\n" + json.dumps("纯文本问题", ensure_ascii=False) + "\n",
+                              encoding="utf-8")
+
+    def run_batch(self, model, concurrency=3):
+        with redirect_stdout(io.StringIO()):
+            return asyncio.run(run_batch(model, self.input, self.output, concurrency))
+
+    def rows(self):
+        return [json.loads(line) for line in self.output.read_text(encoding="utf-8").splitlines()]
+
+    def test_bounded_concurrency(self):
+        model = FakeBatchModel(fail={"问题3"})
+        self.assertEqual(self.run_batch(model), (10, 1))
+        self.assertEqual(model.max_in_flight, 3)
+        rows = {row["id"]: row for row in self.rows()}
+        self.assertEqual(rows["q1"]["content"], "回答:问题1")
+        self.assertIn("服务不可用", rows["q3"]["error"])
+        self.assertEqual(rows[12]["content"], "回答:纯文本问题")
+
+    def test_resume(self):
+        """重新运行时只请求未成功的问题，并跳过崩溃时写了一半的行"""
+        self.run_batch(FakeBatchModel(fail={"问题3"}))
+        with open(self.output, "a", encoding="utf-8") as f:
+            f.write('{"id": "q5", "cont')
+
+        model = FakeBatchModel()
+        self.assertEqual(self.run_batch(model), (1, 0))
+        self.assertEqual(model.prompts, ["问题3"])
+        self.assertEqual(len(load_completed(self.output)), 11)
+
+
+class FakeModel(OpenAICompatibleModel):
+    _model_key = "fake"
+    _model_config = {"display_name": "假模型", "openai_config": {"model_id": "fake", "stream": True}}
+
+
+class TestCompleteAsync(unittest.TestCase):
+    """测试静默异步请求"""
+
+    def test_quiet_request(self):
+        """不输出、不使用也不修改对话历史"""
+        message = SimpleNamespace(content="答案", reasoning_content="思考")
+        response = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+        create = mock.AsyncMock(return_value=response)
+        model = FakeModel()
+        model.initialize()
+        model.async_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        model.add_turn("旧问题", "旧回答")
+
+        output = io.StringIO()
+        with mock.patch.object(cache_module, "get_response_cache", return_value=None), redirect_stdout(output):
+            result = asyncio.run(model.complete_async("问题", temperature=0.1))
+
+        self.assertEqual((result.content, result.reasoning), ("答案", "思考"))
+        self.assertEqual(output.getvalue(), "")
+        self.assertEqual(len(model.history), 2)
+        params = create.call_args.kwargs
+        self.assertNotIn("stream", params)
+        self.assertEqual(params["temperature"], 0.1)
+        self.assertEqual([m["content"] for m in params["messages"]], ["", "问题"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,201 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+
+from config import ADVANCED_SETTINGS
+from core import cache as cache_module
+from core import minhash, resilience
+from core.cache import ResponseCache, make_cache_key
+from core.openai_model import OpenAICompatibleModel
+from core.resilience import ModelRequestError
+from ui.output import set_output_mode
+
+
+class TestResponseCache(unittest.TestCase):
+    """测试响应缓存"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "responses.sqlite3")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_key_normalizes_whitespace(self):
+        """消息首尾空白、行尾空白和换行符差异不影响缓存键"""
+        a = make_cache_key("m", [{"role": "user", "content": "  你好\r\n世界  "}], {"temperature": 0.5})
+        b = make_cache_key("m", [{"role": "user", "content": "你好\n世界"}], {"temperature": 0.5})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, make_cache_key("m", [{"role": "user", "content": "你好\n世界"}], {"temperature": 1}))
+        self.assertNotEqual(a, make_cache_key("n", [{"role": "user", "content": "你好\n世界"}], {"temperature": 0.5}))
+
+    def test_put_get(self):
+        cache = ResponseCache(self.path)
+        cache.put("k", "m", "问题", "答案", "思考")
+        entry = cache.get("k")
+        self.assertEqual((entry.content, entry.reasoning, entry.prompt), ("答案", "思考", "问题"))
+        self.assertIsNone(cache.get("missing"))
+
+    def test_ttl(self):
+        """超过有效期的条目视为未命中"""
+        cache = ResponseCache(self.path, ttl=10)
+        cache.put("k", "m", "问题", "答案")
+        with mock.patch("core.cache.time.time", return_value=time.time() + 11):
+            self.assertIsNone(cache.get("k"))
+        self.assertEqual(len(cache), 0)
+
+    def test_lru_eviction(self):
+        """超过条目上限时淘汰最久未访问的条目"""
+        cache = ResponseCache(self.path, max_entries=2)
+        cache.put("a", "m", "1", "A")
+        time.sleep(0.01)
+        cache.put("b", "m", "2", "B")
+        time.sleep(0.01)
+        cache.get("a")
+        time.sleep(0.01)
+        cache.put("c", "m", "3", "C")
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNotNone(cache.get("c"))
+
+    def test_concurrent_connections(self):
+        """多个连接（对应多个进程）同时写入同一个数据库"""
+        caches = [ResponseCache(self.path) for _ in range(4)]
+
+        def write(index, cache):
+            for i in range(20):
+                cache.put(f"{index}-{i}", "m", "问题", "答案")
+
+        threads = [threading.Thread(target=write, args=item) for item in enumerate(caches)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(caches[0]), 80)
+
+
+class TestNearDuplicate(unittest.TestCase):
+    """测试近似重复问题查找"""
+
+    PROMPT = "如何在Python中读取一个很大的CSV文件，并按某一列分组统计平均值？"
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = ResponseCache(os.path.join(self.tmp.name, "responses.sqlite3"))
+        self.cache.put("k", "m", self.PROMPT, "答案", scope="s")
+        self.cache.put("other", "m", "今天北京的天气怎么样，需要带伞吗", "答案", scope="s")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_signature_is_stable(self):
+        """签名不依赖进程内的哈希随机化"""
+        sig = minhash.signature(minhash.shingles(self.PROMPT))
+        self.assertEqual(len(sig), minhash.NUM_BINS)
+        self.assertEqual(minhash.unpack_signature(minhash.pack_signature(sig)), sig)
+        self.assertEqual(len(minhash.band_buckets(sig)), minhash.NUM_BANDS)
+
+    def test_punctuation_and_whitespace(self):
+        """标点和空白不同的问题视为相同"""
+        entry, score = self.cache.find_similar("s", "如何在 Python 中读取一个很大的 CSV 文件 并按某一列分组统计平均值", 0.8)
+        self.assertEqual(entry.key, "k")
+        self.assertEqual(score, 1.0)
+
+    def test_reordered_sentence(self):
+        """语序调整后仍然找到相似问题"""
+        result = self.cache.find_similar("s", "按某一列分组统计平均值，如何在Python中读取一个很大的CSV文件？", 0.8)
+        self.assertEqual(result[0].key, "k")
+
+    def test_threshold_and_scope(self):
+        """不相似的问题和不同作用域的条目不会命中"""
+        self.assertIsNone(self.cache.find_similar("s", "如何用Go写一个HTTP服务器", 0.8))
+        self.assertIsNone(self.cache.find_similar("other-scope", self.PROMPT, 0.8))
+
+    def test_evicted_entries_leave_index(self):
+        """淘汰的条目同时从LSH索引中删除"""
+        cache = ResponseCache(os.path.join(self.tmp.name, "small.sqlite3"), max_entries=1)
+        cache.put("a", "m", self.PROMPT, "A", scope="s")
+        cache.put("b", "m", "完全不同的另一个问题", "B", scope="s")
+        self.assertIsNone(cache.find_similar("s", self.PROMPT, 0.5))
+        count = cache._conn.execute("SELECT COUNT(*) FROM lsh_buckets WHERE key = 'a'").fetchone()[0]
+        self.assertEqual(count, 0)
+
+
+class FakeModel(OpenAICompatibleModel):
+    _model_key = "fake"
+    _model_config = {"display_name": "假模型", "openai_config": {"model_id": "fake", "stream": False}}
+
+
+class TestModelCache(unittest.TestCase):
+    """测试模型请求前查询缓存"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        cache = ResponseCache(os.path.join(self.tmp.name, "responses.sqlite3"))
+        patcher = mock.patch.object(cache_module, "get_response_cache", return_value=cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        set_output_mode("text")
+        self.addCleanup(set_output_mode, None)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def create_model(self):
+        message = SimpleNamespace(content="答案", reasoning_content="思考")
+        response = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+        create = mock.Mock(return_value=response)
+        model = FakeModel()
+        model.initialize()
+        model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+        return model, create
+
+    def test_hit_skips_request(self):
+        """相同问题第二次请求直接回放缓存，不调用接口"""
+        first, create = self.create_model()
+        with redirect_stdout(io.StringIO()):
+            self.assertEqual(first.req_model("问题"), "答案")
+        second, second_create = self.create_model()
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(second.req_model("问题"), "答案")
+        second_create.assert_not_called()
+        self.assertTrue(second.last_metrics.cached)
+        self.assertIn("答案", out.getvalue())
+        self.assertEqual([m["role"] for m in second.history], ["user", "assistant"])
+
+    def test_near_duplicate_offered(self):
+        """措辞相近的问题在用户确认后使用缓存的回答"""
+        first, _ = self.create_model()
+        with redirect_stdout(io.StringIO()):
+            first.req_model("如何读取很大的CSV文件并分组统计？")
+        second, second_create = self.create_model()
+        with mock.patch.dict("config.ADVANCED_SETTINGS", {"near_dup_enabled": True}), \
+                mock.patch("core.utils.is_interactive", return_value=True), \
+                mock.patch("core.utils.confirm", return_value=True) as confirm, \
+                redirect_stdout(io.StringIO()):
+            self.assertEqual(second.req_model("如何读取很大的 CSV 文件，并分组统计"), "答案")
+        confirm.assert_called_once()
+        second_create.assert_not_called()
+
+    def test_failure_not_cached(self):
+        """失败的请求不写入缓存"""
+        model, create = self.create_model()
+        create.side_effect = ConnectionError("boom")
+        with redirect_stdout(io.StringIO()), mock.patch.dict(ADVANCED_SETTINGS, retry_count=0), \
+                mock.patch.dict(resilience._breakers, clear=True), self.assertRaises(ModelRequestError):
+            model.req_model("问题")
+        self.assertEqual(len(model.history), 0)
+        retry, retry_create = self.create_model()
+        with redirect_stdout(io.StringIO()):
+            retry.req_model("问题")
+        retry_create.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import asyncio
+import gc
+import unittest
+import weakref
+
+from core.clients import ClientPool
+
+
+class TestClientPool(unittest.TestCase):
+    """测试客户端池"""
+
+    def setUp(self):
+        ClientPool.close()
+        self.addCleanup(ClientPool.close)
+
+    def test_sync_reuse(self):
+        """客户端按 (base_url, api_key) 复用，同一主机共享连接池"""
+        client = ClientPool.get_client("https://api.example.com/v1", "k1")
+        self.assertIs(ClientPool.get_client("https://api.example.com/v1", "k1"), client)
+        other_key = ClientPool.get_client("https://api.example.com/v1", "k2")
+        other_path = ClientPool.get_client("https://api.example.com/v2", "k1")
+        other_host = ClientPool.get_client("https://api.other.com/v1", "k1")
+        self.assertIsNot(other_key, client)
+        self.assertIs(other_key._client, client._client)
+        self.assertIs(other_path._client, client._client)
+        self.assertIsNot(other_host._client, client._client)
+
+    def test_async_reuse(self):
+        """异步客户端在同一事件循环中复用，同一主机共享连接池"""
+        async def main():
+            client = ClientPool.get_async_client("https://api.example.com/v1", "k1")
+            self.assertIs(ClientPool.get_async_client("https://api.example.com/v1", "k1"), client)
+            other_key = ClientPool.get_async_client("https://api.example.com/v1", "k2")
+            other_host = ClientPool.get_async_client("https://api.other.com/v1", "k1")
+            self.assertIsNot(other_key, client)
+            self.assertIs(other_key._client, client._client)
+            self.assertIsNot(other_host._client, client._client)
+            return client
+
+        first = asyncio.run(main())
+        second = asyncio.run(main())
+        self.assertIsNot(first, second)
+        self.assertIsNot(first._client, second._client)
+
+    def test_async_closed_with_loop(self):
+        """asyncio.run 结束时关闭该循环的连接池，不保留循环和客户端"""
+        async def main():
+            return ClientPool.get_async_client("https://api.example.com/v1", "k1"), asyncio.get_running_loop()
+
+        http_clients = []
+        loops = []
+        for _ in range(5):
+            client, loop = asyncio.run(main())
+            http_clients.append(client._client)
+            loops.append(weakref.ref(loop))
+            del client, loop
+        self.assertEqual(ClientPool._loops, {})
+        self.assertTrue(all(http_client.is_closed for http_client in http_clients))
+        gc.collect()
+        self.assertEqual([ref() for ref in loops], [None] * 5)
+
+    def test_dead_loop_evicted(self):
+        """未结束剩余任务就关闭的事件循环在下次获取客户端时丢弃"""
+        async def get_client():
+            return ClientPool.get_async_client("https://api.example.com/v1", "k1")
+
+        loop = asyncio.new_event_loop()
+        old = loop.run_until_complete(get_client())
+        loop.close()
+        self.assertIn(loop, ClientPool._loops)
+
+        new = asyncio.run(get_client())
+        self.assertIsNot(new, old)
+        self.assertNotIn(loop, ClientPool._loops)
+        ref = weakref.ref(loop)
+        del loop, old
+        gc.collect()
+        self.assertIsNone(ref())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import asyncio
+import io
+import json
+import time
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from core import cache as cache_module
+from core.cache import CacheKey, CachedResponse
+from core.fanout import parse_model_keys, print_results, run_fanout
+from core.model import BaseModel
+from core.registry import ModelRegistry
+from core.stream import StreamPipeline, StreamEvent, passthrough_events
+from ui.output import set_output_mode
+
+
+class SlowModel(BaseModel):
+    """按配置的延迟流式返回固定回答"""
+
+    delay = 0.0
+
+    async def _complete_async(self, content, sinks, metrics, **kwargs):
+        async def chunks():
+            await asyncio.sleep(self.delay)
+            yield [StreamEvent(StreamEvent.CONTENT, f"{self._model_key}:")]
+            yield [StreamEvent(StreamEvent.CONTENT, content)]
+
+        return await StreamPipeline(passthrough_events, sinks, metrics=metrics).run_async(chunks())
+
+
+def make_model(key, delay):
+    return type(f"Model_{key}", (SlowModel,), {"delay": delay, "_model_key": key,
+                                                "_model_config": {"display_name": f"模型{key}"}})
+
+
+class FailingModel(SlowModel):
+    async def _complete_async(self, content, sinks, metrics, **kwargs):
+        raise RuntimeError("服务不可用")
+
+
+class CachedModel(SlowModel):
+    def _cache_key(self, content, **kwargs):
+        return CacheKey(f"{self._model_key}:{content}", self._model_key)
+
+
+class TestFanout(unittest.TestCase):
+    """测试多模型并发"""
+
+    def setUp(self):
+        models = {"a": make_model("a", 0.2), "b": make_model("b", 0.1), "c": make_model("c", 0.15)}
+        models["x"] = type("Model_x", (FailingModel,), {"_model_key": "x", "_model_config": {"display_name": "模型x"}})
+        configs = {key: model._model_config for key, model in models.items()}
+        for patcher in (mock.patch.dict(ModelRegistry._models, models), mock.patch.dict(ModelRegistry._configs, configs),
+                        mock.patch.object(cache_module, "get_response_cache", return_value=None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(set_output_mode, None)
+
+    def test_parse_model_keys(self):
+        self.assertEqual(parse_model_keys("a, b,a,,c"), ["a", "b", "c"])
+        with self.assertRaises(ValueError):
+            parse_model_keys("a,不存在")
+
+    def test_concurrent(self):
+        """总耗时接近最慢的模型，失败的模型不影响其他模型"""
+        set_output_mode("jsonl")
+        started = time.perf_counter()
+        results = asyncio.run(run_fanout(["a", "b", "c", "x"], "问题"))
+        elapsed = time.perf_counter() - started
+        self.assertLess(elapsed, 0.4)
+        self.assertEqual([r.content for r in results], ["a:问题", "b:问题", "c:问题", ""])
+        self.assertIn("服务不可用", results[3].error)
+
+        output = io.StringIO()
+        with redirect_stdout(output):
+            print_results(results)
+        rows = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([row["model"] for row in rows], ["a", "b", "c", "x"])
+
+        # 纯文本模式只输出各模型的回答，不输出终端对比表
+        set_output_mode("text")
+        output = io.StringIO()
+        with redirect_stdout(output), mock.patch("ui.console.Console.print_table") as print_table:
+            print_results(results)
+        print_table.assert_not_called()
+        self.assertIn("a:问题", output.getvalue())
+
+    def test_live_regions(self):
+        """终端模式下每个模型输出到各自的区域"""
+        set_output_mode("rich")
+        output = io.StringIO()
+        with redirect_stdout(output), mock.patch("ui.console.Console.create_fanout_display") as create_display:
+            results = asyncio.run(run_fanout(["a", "x"], "问题"))
+        regions = create_display.call_args.args[0]
+        self.assertEqual(results[0].content, "a:问题")
+        self.assertTrue(regions[0].view.has_conclusion)
+        self.assertTrue(regions[0].status.startswith("完成"))
+        self.assertEqual(regions[1].border_style, "red")
+        create_display.return_value.stop.assert_called_once()
+
+    def test_cached_without_reasoning(self):
+        """命中没有思考内容的缓存时不显示空的思考面板"""
+        set_output_mode("rich")
+        model = type("Model_k", (CachedModel,), {"_model_key": "k", "_model_config": {"display_name": "模型k"}})
+        cache = mock.Mock()
+        cache.get.return_value = CachedResponse("k:问题", "k", "问题", "缓存的回答", "", 0.0)
+        output = io.StringIO()
+        with mock.patch.dict(ModelRegistry._models, {"k": model}), \
+                mock.patch.dict(ModelRegistry._configs, {"k": model._model_config}), \
+                mock.patch.object(cache_module, "get_response_cache", return_value=cache), \
+                redirect_stdout(output), mock.patch("ui.console.Console.create_fanout_display") as create_display:
+            results = asyncio.run(run_fanout(["k"], "问题"))
+        view = create_display.call_args.args[0][0].view
+        self.assertEqual(results[0].content, "缓存的回答")
+        self.assertTrue(view.has_conclusion)
+        self.assertFalse(view.has_reasoning)
+
+
+if __name__ == "__main__":
+    unittest.main()
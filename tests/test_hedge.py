@@ -0,0 +1,142 @@
+import asyncio
+import io
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+
+from core import cache as cache_module
+from core.hedge import HedgedModel, find_alias_group
+from core.keys import KeyPool
+from core.openai_model import OpenAICompatibleModel
+from core.registry import ModelRegistry
+from ui.output import set_output_mode
+
+
+def chunk(text):
+    delta = SimpleNamespace(content=text, reasoning_content=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+
+
+class FakeStream:
+    """首个数据块延迟到达的流"""
+
+    def __init__(self, delay, texts):
+        self.delay = delay
+        self.texts = texts
+        self.closed = False
+
+    async def __aiter__(self):
+        await asyncio.sleep(self.delay)
+        for text in self.texts:
+            yield chunk(text)
+
+    async def close(self):
+        self.closed = True
+
+
+def make_member(key, delay, fail=False):
+    stream = FakeStream(delay, [f"{key}:", "回答"])
+
+    async def create(**params):
+        if fail:
+            raise ConnectionError("连接失败")
+        return stream
+
+    cls = type(f"Member_{key}", (OpenAICompatibleModel,), {
+        "_model_key": key,
+        "_model_config": {"display_name": f"模型{key}", "openai_config": {"model_id": f"id-{key}", "stream": True}},
+    })
+    cls.stream = stream
+    cls.fake_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return cls
+
+
+class TestHedge(unittest.TestCase):
+    """测试对冲请求"""
+
+    def setUp(self):
+        set_output_mode("text")
+        self.addCleanup(set_output_mode, None)
+        patcher = mock.patch.object(cache_module, "get_response_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def hedged(self, members, delay=0.05):
+        with mock.patch.dict(ModelRegistry._models, {key: cls for key, cls in members.items()}):
+            model = HedgedModel(list(members), delay=delay)
+        model.initialize()
+        for member in model.members:
+            member.async_client = type(member).fake_client
+        return model
+
+    def ask(self, model):
+        with redirect_stdout(io.StringIO()):
+            return asyncio.run(model.request_async("问题"))
+
+    def test_backup_wins(self):
+        """首选提供方超时后启动备用，最先输出的胜出，落选的流被关闭"""
+        members = {"p": make_member("p", 1.0), "q": make_member("q", 0.0), "r": make_member("r", 0.0)}
+        model = self.hedged(members)
+        self.assertEqual(self.ask(model), "q:回答")
+        self.assertEqual(model.winner, "q")
+        self.assertTrue(members["p"].stream.closed)
+        self.assertEqual(model.last_metrics.model_key, "q")
+        self.assertEqual(model.last_metrics.hedge_attempts, 2)
+        self.assertEqual(model.history[-1].model, "q")
+        self.assertIs(model.members[1].history, model.history)
+
+    def test_primary_fast(self):
+        members = {"p": make_member("p", 0.0), "q": make_member("q", 0.0)}
+        model = self.hedged(members, delay=1.0)
+        self.assertEqual(self.ask(model), "p:回答")
+        self.assertEqual(model.last_metrics.hedge_attempts, 1)
+
+    def test_failover(self):
+        """请求失败时立即启动下一个提供方，不等待对冲延迟"""
+        members = {"p": make_member("p", 0.0, fail=True), "q": make_member("q", 0.0)}
+        model = self.hedged(members, delay=10)
+        self.assertEqual(self.ask(model), "q:回答")
+
+    def test_leases_settled(self):
+        """每个提供方都经过限流预约，胜出者按实际输出结算，落选者退还预约"""
+        members = {"p": make_member("p", 1.0), "q": make_member("q", 0.0)}
+        model = self.hedged(members)
+        leases = {}
+        for member in model.members:
+            lease = leases[member.model_key] = mock.Mock(acquire_async=mock.AsyncMock(return_value=0.0))
+            member._lease = mock.Mock(return_value=lease)
+        self.assertEqual(self.ask(model), "q:回答")
+        for lease in leases.values():
+            lease.acquire_async.assert_awaited_once()
+        leases["p"].settle.assert_called_once_with(0)
+        leases["q"].settle.assert_called_once_with(model.last_metrics.output_tokens)
+        self.assertGreater(model.last_metrics.output_tokens, 0)
+
+    def test_keys_leased_from_pool(self):
+        """对冲请求使用各提供方密钥池中租用的密钥，结束后释放"""
+        members = {"p": make_member("p", 1.0), "q": make_member("q", 0.0)}
+        model = self.hedged(members)
+        used = []
+        for member in model.members:
+            member._key_pool = KeyPool(member.model_key, [f"{member.model_key}-1", f"{member.model_key}-2"])
+            create = member._create_async
+
+            def record(lease, params, create=create):
+                used.append(lease.key)
+                return create(lease, params)
+
+            member._create_async = record
+        self.assertEqual(self.ask(model), "q:回答")
+        self.assertEqual(used, ["p-1", "q-1"])
+        for member in model.members:
+            self.assertEqual(set(member._key_pool._in_flight.values()), {0})
+
+    def test_alias_group(self):
+        with mock.patch.dict("core.hedge.MODEL_ALIAS_GROUPS", {"r1": ["i", "b", "d"]}, clear=True):
+            self.assertEqual(find_alias_group("b"), ["b", "i", "d"])
+            self.assertIsNone(find_alias_group("c"))
+
+
+if __name__ == "__main__":
+    unittest.main()
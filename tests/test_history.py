@@ -0,0 +1,133 @@
+import io
+import unittest
+from contextlib import redirect_stdout
+from types import SimpleNamespace
+from unittest import mock
+
+from core import cache as cache_module
+from core.history import History, Message
+from core.model import BaseModel
+from core.openai_model import OpenAICompatibleModel
+from core.tokens import MESSAGE_OVERHEAD, estimate_tokens, history_budget
+from ui.output import set_output_mode
+
+
+class FakeModel(OpenAICompatibleModel):
+    _model_key = "fake"
+    _model_config = {"display_name": "假模型",
+                     "openai_config": {"model_id": "fake", "stream": False, "context_window": 1000, "max_tokens": 100}}
+
+
+class TestTokenEstimate(unittest.TestCase):
+    """测试token估算"""
+
+    def test_estimate(self):
+        self.assertEqual(estimate_tokens(""), 0)
+        self.assertEqual(estimate_tokens("你好世界"), 4)
+        self.assertEqual(estimate_tokens("hello world!"), 3)
+        self.assertEqual(estimate_tokens("你好 world"), 4)
+
+    def test_budget_reserves_output(self):
+        config = {"context_window": 1000}
+        self.assertEqual(history_budget(config, 100, max_tokens=200), 700)
+        self.assertEqual(history_budget(config, 900, max_tokens=200), 0)
+
+
+class TestHistoryWindow(unittest.TestCase):
+    """测试按token预算选取历史消息"""
+
+    def setUp(self):
+        self.model = BaseModel()
+        for i in range(10):
+            self.model.add_turn("问" * 10, "答" * 10)
+        self.message_tokens = 10 + MESSAGE_OVERHEAD
+
+    def test_window_fits_budget(self):
+        """窗口是不超过预算的最近若干轮，并以用户消息开头"""
+        window = self.model.history_window(self.message_tokens * 5)
+        self.assertEqual(len(window), 4)
+        self.assertEqual(window[0]["role"], "user")
+        self.assertEqual(window, self.model.history[-4:])
+
+    def test_whole_history_and_limits(self):
+        self.assertEqual(len(self.model.history_window(10 ** 6)), 20)
+        self.assertEqual(len(self.model.history_window(10 ** 6, max_messages=6)), 6)
+        self.assertEqual(self.model.history_window(0), [])
+
+    def test_direct_mutation(self):
+        """直接修改历史列表后重新计算前缀和"""
+        self.model.history.append({"role": "user", "content": "问" * 10})
+        self.assertEqual(len(self.model.history_window(self.message_tokens)), 1)
+
+
+class TestHistoryBuffer(unittest.TestCase):
+    """测试环形缓冲区历史"""
+
+    def test_bounded(self):
+        """超过最大轮数后覆盖最早的消息"""
+        history = History(max_turns=2)
+        for i in range(5):
+            history.append({"role": "user", "content": f"问{i}"})
+            history.append(Message("assistant", f"答{i}"))
+        self.assertEqual(len(history), 4)
+        self.assertEqual([m["content"] for m in history], ["问3", "答3", "问4", "答4"])
+        self.assertEqual(history[-1].content, "答4")
+        self.assertEqual(history[1:3], [history[1], history[2]])
+
+    def test_window_after_wraparound(self):
+        history = History(max_turns=2)
+        for i in range(5):
+            history.append({"role": "user", "content": "问" * 10})
+            history.append({"role": "assistant", "content": "答" * 10})
+        tokens = 10 + MESSAGE_OVERHEAD
+        self.assertEqual(len(history.window(tokens * 2)), 2)
+        self.assertEqual(len(history.window(tokens * 3)), 2)
+        self.assertEqual(len(history.window(10 ** 6)), 4)
+
+    def test_message_is_mapping(self):
+        """消息记录可以直接作为请求消息使用"""
+        message = Message("user", "你好")
+        self.assertEqual(dict(message), {"role": "user", "content": "你好"})
+        self.assertEqual(message, {"role": "user", "content": "你好"})
+        self.assertEqual(message.tokens, 2 + MESSAGE_OVERHEAD)
+        with self.assertRaises(AttributeError):
+            message.extra = 1
+
+    def test_clear(self):
+        history = History(max_turns=1)
+        history.append({"role": "user", "content": "问"})
+        history.clear()
+        self.assertEqual(len(history), 0)
+        self.assertEqual(history, [])
+
+
+class TestRequestMessages(unittest.TestCase):
+    """测试请求消息的组成"""
+
+    def setUp(self):
+        patcher = mock.patch.object(cache_module, "get_response_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        set_output_mode("text")
+        self.addCleanup(set_output_mode, None)
+
+    def test_current_message_sent_once(self):
+        """本轮问题只出现一次，完成后问答加入历史"""
+        message = SimpleNamespace(content="答案", reasoning_content=None)
+        response = SimpleNamespace(choices=[SimpleNamespace(message=message, finish_reason="stop")], usage=None)
+        create = mock.Mock(return_value=response)
+        model = FakeModel()
+        model.initialize()
+        model.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+
+        with redirect_stdout(io.StringIO()):
+            model.req_model("第一个问题")
+            model.req_model("第二个问题")
+
+        messages = create.call_args.kwargs["messages"]
+        self.assertEqual([m["content"] for m in messages], ["", "第一个问题", "答案", "第二个问题"])
+        self.assertEqual(len(model.history), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from core import resilience
+from core.keys import KeyPool, is_key_error, load_api_keys
+from core.ratelimit import RateLimiter
+from core.resilience import call_with_retries, call_with_retries_async
+
+
+def status_error(status, message=""):
+    error = Exception(f"HTTP {status} {message}")
+    error.status_code = status
+    error.response = SimpleNamespace(status_code=status, headers={})
+    return error
+
+
+class KeyPoolTest(unittest.TestCase):
+    def setUp(self):
+        for patcher in (mock.patch.dict(resilience._breakers, clear=True),
+                        mock.patch("ui.console.Console.print")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_load_keys(self):
+        env = {"POOL_KEY": "a, b", "POOL_KEY_1": "c", "POOL_KEY_2": "a", "POOL_KEY_4": "skipped"}
+        with mock.patch.dict("os.environ", env):
+            self.assertEqual(load_api_keys("POOL_KEY"), ["a", "b", "c"])
+        with mock.patch.dict("os.environ", {"ONLY_NUMBERED_1": "x", "ONLY_NUMBERED_2": "y"}):
+            self.assertEqual(load_api_keys("ONLY_NUMBERED"), ["x", "y"])
+
+    def test_least_loaded(self):
+        pool = KeyPool("K", ["a", "b", "c"])
+        # 空闲时轮流使用
+        self.assertEqual([pool.acquire() for _ in range(3)], ["a", "b", "c"])
+        pool.release("b")
+        self.assertEqual(pool.acquire(), "b")
+        pool.release("a")
+        pool.release("c")
+        self.assertEqual(pool.acquire(), "a")
+
+    def test_key_errors(self):
+        self.assertTrue(is_key_error(status_error(401)))
+        self.assertTrue(is_key_error(status_error(429, "You exceeded your current quota")))
+        self.assertFalse(is_key_error(status_error(429, "Rate limit reached")))
+        self.assertFalse(is_key_error(status_error(500)))
+
+    def test_unhealthy_key_switched(self):
+        """密钥认证失败时冷却，立即换用其他密钥重试"""
+        pool = KeyPool("K", ["bad", "good"])
+        used = []
+        lease = pool.lease()
+
+        def fn():
+            used.append(lease.key)
+            if lease.key == "bad":
+                raise status_error(401)
+            return "ok"
+
+        with mock.patch("time.sleep") as sleep:
+            self.assertEqual(call_with_retries(fn, "https://a", retries=2, ticket=lease), "ok")
+        lease.settle(0)
+        self.assertEqual(used, ["bad", "good"])
+        self.assertTrue(all(call.args[0] == 0 for call in sleep.call_args_list))
+        self.assertEqual(pool.healthy_keys(), ["good"])
+        self.assertEqual([pool.acquire() for _ in range(2)], ["good", "good"])
+
+    def test_switch_refunds_previous_ticket(self):
+        pool = KeyPool("K", ["bad", "good"])
+        limiters = {key: RateLimiter(key, tpm=60000) for key in pool.keys}
+        lease = pool.lease(50)
+        with mock.patch("core.keys.get_limiter", side_effect=lambda name, key: limiters[key]):
+            lease.acquire()
+            pool.mark_unhealthy("bad")
+            lease.acquire()
+        lease.settle(0)
+        # 失败的尝试只扣输入token，预约的输出额度退还
+        for limiter in limiters.values():
+            bucket = limiter._buckets["tokens"]
+            self.assertAlmostEqual(bucket.level, bucket.capacity - 50, delta=1)
+
+    def test_single_key_auth_error_not_retried(self):
+        pool = KeyPool("K", ["only"])
+        calls = []
+
+        async def fn():
+            calls.append(1)
+            raise status_error(401)
+
+        with self.assertRaises(Exception):
+            asyncio.run(call_with_retries_async(fn, "https://a", retries=2, ticket=pool.lease()))
+        self.assertEqual(len(calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
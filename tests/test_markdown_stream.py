@@ -0,0 +1,80 @@
+import unittest
+import unittest.mock as mock
+
+from rich.console import Console as RichConsole
+from rich.markdown import Markdown
+
+import ui.markdown_stream as markdown_stream
+from ui.markdown_stream import IncrementalMarkdown
+
+
+SAMPLE = """# 标题
+
+第一段，包含 `code` 和 **粗体**。
+第二行。
+
+- 列表项一
+- 列表项二
+
+  续行段落
+
+```python
+def f():
+
+    return 1
+```
+## 小节
+> 引用
+
+| a | b |
+|---|---|
+| 1 | 2 |
+
+结尾段落"""
+
+
+def render(renderable) -> str:
+    console = RichConsole(width=60, color_system=None)
+    with console.capture() as capture:
+        console.print(renderable)
+    return capture.get()
+
+
+class TestIncrementalMarkdown(unittest.TestCase):
+    """测试增量Markdown渲染"""
+
+    def test_matches_full_render(self):
+        """逐块追加后的渲染结果与整体渲染一致"""
+        md = IncrementalMarkdown()
+        for i in range(0, len(SAMPLE), 7):
+            md.append(SAMPLE[i:i + 7])
+            render(md)
+        self.assertEqual(render(md), render(Markdown(SAMPLE)))
+        self.assertEqual(md.text, SAMPLE)
+
+    def test_code_fence_kept_together(self):
+        """代码围栏内的空行不会切分块"""
+        md = IncrementalMarkdown("```\na\n\nb\n")
+        self.assertEqual(md._blocks, [])
+        md.append("```\n")
+        self.assertEqual(md._blocks, ["```\na\n\nb\n```"])
+
+    def test_finished_blocks_parsed_once(self):
+        """已完成的块只解析一次，每帧只解析尾部块"""
+        md = IncrementalMarkdown()
+        with mock.patch.object(markdown_stream, "Markdown", wraps=Markdown) as parser:
+            for i in range(20):
+                md.append(f"段落{i}\n\n")
+                render(md)
+            sources = [call.args[0] for call in parser.call_args_list]
+        self.assertEqual(len(sources), len(set(sources)))
+
+    def test_max_lines(self):
+        """限制渲染行数时只输出末尾部分"""
+        md = IncrementalMarkdown("\n\n".join(f"段落{i}" for i in range(10)))
+        md.max_lines = 3
+        self.assertEqual(render(md).split(), ["段落8", "段落9"])
+
+
+if __name__ == "__main__":
+    unittest.main()
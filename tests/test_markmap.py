@@ -1,18 +1,25 @@
 import os
 import shutil
+import tempfile
+import time
 import unittest
 import re
 import unittest.mock as mock
-import common.markmap  as markmap
+import utils.markmap as markmap
+from utils.md_cache import MarkdownCache
 
 class TestSaveMarkdownToFile(unittest.TestCase):
     """测试 markdown 文件保存功能"""
     
     def setUp(self):
-        """测试前设置，确保测试目录不存在"""
-        self.test_dir = "resource/md_cache"
-        if os.path.exists(self.test_dir):
-            shutil.rmtree(self.test_dir)
+        """测试前设置，确保测试目录不存在（使用临时目录代替 resource/md_cache）"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.test_dir = os.path.join(self.temp_dir, "md_cache")
+        self.cache = MarkdownCache(self.test_dir, max_bytes=0, max_age=0)
+        patcher = mock.patch("utils.md_cache._cache", self.cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
     
     # def tearDown(self):
     #     """测试后清理，删除创建的测试目录"""
@@ -44,7 +51,7 @@ class TestSaveMarkdownToFile(unittest.TestCase):
         filename = os.path.basename(file_path)
         
         # 检查文件名格式
-        pattern = r"模型总结_\d+\.md"
+        pattern = r"模型总结_[0-9a-f]+\.md"
         self.assertTrue(re.match(pattern, filename))
     
     def test_custom_prefix(self):
@@ -67,6 +74,31 @@ class TestSaveMarkdownToFile(unittest.TestCase):
         self.assertTrue(file_path.startswith(self.test_dir))
         self.assertTrue(file_path.endswith(".md"))
 
+    def test_same_content_reused(self):
+        """测试相同内容复用同一文件，已生成的思维导图直接返回"""
+        first = markmap.save_markdown_to_file("# 标题\n- 要点")
+        self.assertEqual(markmap.save_markdown_to_file("# 标题\n- 要点"), first)
+        self.assertNotEqual(markmap.save_markdown_to_file("# 标题\n- 其他要点"), first)
+
+        html_path, status, _ = markmap.generate_markmap(first)
+        self.assertEqual(status, 0)
+        with mock.patch("utils.markmap._render_markmap") as render:
+            self.assertEqual(markmap.generate_markmap(first)[0], html_path)
+        render.assert_not_called()
+
+    def test_eviction(self):
+        """测试按容量淘汰最久未使用的文件"""
+        self.cache.max_bytes = 15
+        paths = [markmap.save_markdown_to_file(f"内容{index}") for index in range(3)]
+        self.assertFalse(os.path.exists(paths[0]))
+        self.assertTrue(os.path.exists(paths[2]))
+
+        # 超过有效期的文件也会被淘汰
+        self.cache.max_bytes, self.cache.max_age = 0, 60
+        with mock.patch("utils.md_cache.time.time", return_value=time.time() + 120):
+            newest = markmap.save_markdown_to_file("新内容")
+        self.assertEqual(sorted(os.listdir(self.test_dir)), sorted(["index.json", os.path.basename(newest)]))
+
 
     def test_generate_mind_map(self):
         markdown_text = """
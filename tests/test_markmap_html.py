@@ -0,0 +1,71 @@
+import json
+import re
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import markmap, markmap_html
+from utils.markmap_html import parse_markdown, render_inline, render_markmap_html
+
+
+def titles(node):
+    return [child["content"] for child in node["children"]]
+
+
+class TestMarkmapHtml(unittest.TestCase):
+    """测试内置思维导图生成器"""
+
+    def test_headings_and_lists(self):
+        tree = parse_markdown("# 主题\n\n## 一\n- a\n  - b\n- c\n\n## 二\n段落\n1. 有序\n")
+        self.assertEqual(tree["content"], "主题")
+        self.assertEqual(titles(tree), ["一", "二"])
+        first, second = tree["children"]
+        self.assertEqual(titles(first), ["a", "c"])
+        self.assertEqual(titles(first["children"][0]), ["b"])
+        self.assertEqual(titles(second), ["段落", "有序"])
+
+    def test_multiple_top_level_nodes(self):
+        tree = parse_markdown("# 甲\n# 乙\n")
+        self.assertEqual(tree["content"], "")
+        self.assertEqual(titles(tree), ["甲", "乙"])
+
+    def test_inline_and_escaping(self):
+        self.assertEqual(render_inline("**粗** `a*b*` <x>"), "<strong>粗</strong> <code>a*b*</code> &lt;x&gt;")
+        tree = parse_markdown("# 代码\n```\n</script>\n```\n")
+        self.assertIn("&lt;/script&gt;", tree["children"][0]["content"])
+
+    def test_html_embeds_tree(self):
+        page = render_markmap_html("# 主题\n- </script>分支", title="测试")
+        self.assertIn(f"markmap template v{markmap_html.TEMPLATE_VERSION}", page)
+        self.assertIn("<title>测试</title>", page)
+        data = re.search(r"\}\)\((\{.*\}), \{\}\);", page).group(1)
+        self.assertEqual(json.loads(data)["children"][0]["content"], "&lt;/script&gt;分支")
+        self.assertNotIn("{{", page)
+
+    def test_generate_without_npx(self):
+        """默认在进程内生成，保持 (路径, 状态码, 输出) 的返回格式"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "总结.md"
+            source.write_text("# 主题\n- 分支\n", encoding="utf-8")
+            with mock.patch("subprocess.run") as run, mock.patch.object(markmap, "get_console"):
+                path, code, output = markmap.generate_markmap(str(source))
+            run.assert_not_called()
+            self.assertEqual((path, code), (str(source.with_suffix(".html")), 0))
+            self.assertIn("分支", Path(path).read_text(encoding="utf-8"))
+
+
+    def test_cdn_fallback_warns(self):
+        """没有本地前端资源时引用CDN并提示"""
+        with tempfile.TemporaryDirectory() as tmp:
+            source = Path(tmp) / "总结.md"
+            source.write_text("# 主题\n", encoding="utf-8")
+            with mock.patch.object(markmap_html, "missing_assets", return_value=["d3.min.js"]), \
+                    mock.patch.object(markmap, "get_console") as get_console:
+                markmap.generate_markmap(str(source))
+            messages = [call.args[0] for call in get_console.return_value.print.call_args_list]
+            self.assertTrue(any("d3.min.js" in message and "CDN" in message for message in messages))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import markmap_html
+from utils.markmap_rebuild import MANIFEST_FILE, rebuild_markmaps
+
+
+class TestRebuildMarkmaps(unittest.TestCase):
+    """测试思维导图批量重建"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        for index in range(6):
+            self._write(f"导图{index}.md", f"# 主题{index}\n- 要点\n")
+
+    def _write(self, name, content):
+        with open(os.path.join(self.directory, name), "w", encoding="utf-8") as f:
+            f.write(content)
+
+    def test_incremental_rebuild(self):
+        result = rebuild_markmaps(self.directory, workers=2)
+        self.assertEqual((result.rebuilt, result.failed, result.skipped), (6, 0, 0))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, "导图0.html")))
+        self.assertTrue(os.path.exists(os.path.join(self.directory, MANIFEST_FILE)))
+
+        # 没有变化时不重建
+        started = time.perf_counter()
+        self.assertEqual(rebuild_markmaps(self.directory).rebuilt, 0)
+        self.assertLess(time.perf_counter() - started, 1.0)
+
+        # 只重建内容变化和网页缺失的文件
+        self._write("导图1.md", "# 新主题\n- 新要点\n")
+        os.remove(os.path.join(self.directory, "导图2.html"))
+        os.utime(os.path.join(self.directory, "导图3.md"))
+        result = rebuild_markmaps(self.directory, workers=1)
+        self.assertEqual((result.rebuilt, result.skipped), (2, 4))
+        with open(os.path.join(self.directory, "导图1.html"), encoding="utf-8") as f:
+            self.assertIn("新主题", f.read())
+
+    def test_template_change_rebuilds_all(self):
+        rebuild_markmaps(self.directory, workers=1)
+        with mock.patch("utils.markmap_rebuild.template_fingerprint", return_value="new"):
+            self.assertEqual(rebuild_markmaps(self.directory, workers=1).rebuilt, 6)
+            self.assertEqual(rebuild_markmaps(self.directory, workers=1).rebuilt, 0)
+
+    def test_vendored_assets_rebuild_all(self):
+        """下载本地前端资源后，之前引用CDN的网页全部重建"""
+        rebuild_markmaps(self.directory, workers=1)
+        markmap_dir = Path(self.directory) / "markmap"
+        markmap_dir.mkdir()
+        shutil.copy(markmap_html.get_markmap_dir() / "template.html", markmap_dir)
+        (markmap_dir / "vendor").mkdir()
+        for filename, _ in markmap_html.ASSETS:
+            (markmap_dir / "vendor" / filename).write_text("/* vendored */", encoding="utf-8")
+        with mock.patch.object(markmap_html, "get_markmap_dir", return_value=markmap_dir):
+            self.assertEqual(rebuild_markmaps(self.directory, workers=1).rebuilt, 6)
+        with open(os.path.join(self.directory, "导图0.html"), encoding="utf-8") as f:
+            self.assertIn("/* vendored */", f.read())
+
+    def test_failures_retried(self):
+        with mock.patch("utils.markmap_html.write_markmap_html", side_effect=OSError("磁盘已满")):
+            result = rebuild_markmaps(self.directory, workers=1)
+        self.assertEqual((result.rebuilt, result.failed), (0, 6))
+        self.assertEqual(rebuild_markmaps(self.directory, workers=1).rebuilt, 6)
+
+    def test_missing_directory(self):
+        with self.assertRaises(FileNotFoundError):
+            rebuild_markmaps(os.path.join(self.directory, "不存在"))
+
+
+if __name__ == "__main__":
+    unittest.main()
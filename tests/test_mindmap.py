@@ -0,0 +1,93 @@
+import asyncio
+import io
+import threading
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+from core.mindmap import MindMapPipeline
+from core.model import BaseModel
+from core.registry import ModelRegistry
+from core.stream import StreamAccumulator, StreamEvent
+
+
+class FakeSummaryModel(BaseModel):
+    """记录预热和整理请求的假整理模型"""
+
+    _model_key = "fake-mind"
+    _model_config = {"display_name": "整理模型"}
+    created = 0
+
+    def __init__(self):
+        super().__init__()
+        FakeSummaryModel.created += 1
+        self.warmed = threading.Event()
+        self.sinks = None
+
+    async def warm_up_async(self):
+        self.warmed.set()
+
+    async def _complete_async(self, content, sinks, metrics, **kwargs):
+        self.sinks = sinks
+        events = [StreamEvent(StreamEvent.CONTENT, "# 导图\n" + content.splitlines()[-1])]
+        for sink in sinks:
+            sink.open()
+            for event in events:
+                sink.feed(event)
+            sink.close()
+        return StreamAccumulator.from_events(events)
+
+
+class TestMindMapPipeline(unittest.TestCase):
+    """测试思维导图流水线"""
+
+    def setUp(self):
+        FakeSummaryModel.created = 0
+        for patcher in (mock.patch.dict(ModelRegistry._models, {"fake-mind": FakeSummaryModel}),
+                        mock.patch("core.cache.get_response_cache", return_value=None)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_summarize_quietly_and_reuse_instance(self):
+        pipeline = MindMapPipeline("fake-mind")
+        pipeline.start()
+        with redirect_stdout(io.StringIO()) as out:
+            self.assertEqual(pipeline.summarize("回答内容"), "# 导图\n回答内容")
+            self.assertEqual(pipeline.summarize("第二个回答"), "# 导图\n第二个回答")
+        # 整理结果不在终端重复输出，但仍使用流式请求
+        self.assertEqual(out.getvalue(), "")
+        self.assertTrue(pipeline._instance.warmed.wait(1))
+        self.assertEqual(len(pipeline._instance.sinks), 1)
+        self.assertEqual(FakeSummaryModel.created, 1)
+
+    def test_summarize_async_does_not_block_loop(self):
+        """异步整理在后台事件循环中进行，调用方的事件循环可以同时处理其他任务"""
+        pipeline = MindMapPipeline("fake-mind")
+
+        async def run():
+            ticks = []
+
+            async def ticker():
+                while True:
+                    ticks.append(1)
+                    await asyncio.sleep(0)
+
+            task = asyncio.ensure_future(ticker())
+            result = await pipeline.summarize_async("回答内容")
+            task.cancel()
+            return result, ticks
+
+        with redirect_stdout(io.StringIO()):
+            result, ticks = asyncio.run(run())
+        self.assertEqual(result, "# 导图\n回答内容")
+        self.assertTrue(ticks)
+
+    def test_failure_reported(self):
+        pipeline = MindMapPipeline("fake-mind")
+        with mock.patch.object(FakeSummaryModel, "_complete_async", side_effect=RuntimeError("不可用")):
+            with self.assertRaises(RuntimeError):
+                pipeline.summarize("回答内容")
+
+
+if __name__ == "__main__":
+    unittest.main()
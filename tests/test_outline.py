@@ -0,0 +1,53 @@
+import unittest
+
+from utils.outline import analyze_outline, extract_outline
+
+STRUCTURED = """# 主题
+
+开头的一句说明。
+
+## 第一部分
+- 要点一
+- 要点二
+  - 细节
+
+## 第二部分
+1. 步骤一
+2. 步骤二
+
+```python
+# 代码中的注释不是标题
+```
+"""
+
+PROSE = "这是一段连续的散文回答，没有任何标题或列表。" * 10 + "\n\n" + "第二段同样是散文。" * 10
+
+
+class TestOutline(unittest.TestCase):
+    """测试大纲分析"""
+
+    def test_structured_answer_extracted(self):
+        score = analyze_outline(STRUCTURED)
+        self.assertGreaterEqual(score.score, 0.6)
+        self.assertEqual(score.nodes, 8)
+        outline = extract_outline(STRUCTURED)
+        self.assertEqual(outline.splitlines()[:3], ["# 主题", "## 第一部分", "- 要点一"])
+        self.assertNotIn("代码中的注释", outline)
+        self.assertNotIn("开头的一句说明", outline)
+
+    def test_prose_needs_model(self):
+        self.assertEqual(analyze_outline(PROSE).score, 0.0)
+        self.assertIsNone(extract_outline(PROSE))
+
+    def test_long_sentence_list_penalised(self):
+        answer = "\n".join("- " + "这是一条很长的句子，包含了大量需要整理的细节内容，" * 6 for _ in range(5))
+        self.assertLess(analyze_outline(answer).score, analyze_outline("- 甲\n- 乙\n- 丙\n- 丁").score)
+        self.assertIsNone(extract_outline(answer))
+
+    def test_threshold(self):
+        self.assertIsNone(extract_outline(STRUCTURED, threshold=1.01))
+        self.assertIsNotNone(extract_outline(PROSE + "\n# 甲\n## 乙\n- 丙\n- 丁", threshold=0.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import io
+import json
+import unittest
+from unittest import mock
+
+from core.stream import StreamEvent
+from ui.output import PlainStreamSink, create_stream_sink, get_output_mode, set_output_mode
+
+
+def feed_all(sink, events):
+    sink.open()
+    for kind, text in events:
+        sink.feed(StreamEvent(kind, text))
+    sink.close()
+
+
+class TestPlainStreamSink(unittest.TestCase):
+    """测试纯文本/JSON Lines输出端"""
+
+    def setUp(self):
+        self.out = io.StringIO()
+        self.err = io.StringIO()
+
+    def test_text_split(self):
+        """结论写入标准输出，思考内容写入标准错误"""
+        sink = PlainStreamSink("text", out=self.out, err=self.err)
+        feed_all(sink, [(StreamEvent.REASONING, "先想"), (StreamEvent.CONTENT, "结论"),
+                        (StreamEvent.REASONING, "再想\n"), (StreamEvent.CONTENT, "继续")])
+        self.assertEqual(self.out.getvalue(), "结论继续\n")
+        self.assertEqual(self.err.getvalue(), "先想再想\n")
+
+    def test_trailing_newline(self):
+        """已经以换行结束的输出不重复换行，没有输出的流不写换行"""
+        sink = PlainStreamSink("text", out=self.out, err=self.err)
+        feed_all(sink, [(StreamEvent.CONTENT, "第一行\n"), (StreamEvent.CONTENT, "")])
+        self.assertEqual(self.out.getvalue(), "第一行\n")
+        self.assertEqual(self.err.getvalue(), "")
+
+        out = io.StringIO()
+        feed_all(PlainStreamSink("text", out=out, err=self.err), [])
+        self.assertEqual(out.getvalue(), "")
+
+    def test_jsonl(self):
+        """每个增量一行，最后一行为done，思考内容也写入标准输出"""
+        sink = PlainStreamSink("jsonl", out=self.out, err=self.err)
+        feed_all(sink, [(StreamEvent.REASONING, "想"), (StreamEvent.CONTENT, "答\n"), (StreamEvent.CONTENT, "")])
+        rows = [json.loads(line) for line in self.out.getvalue().splitlines()]
+        self.assertEqual(rows, [{"type": "reasoning", "text": "想"}, {"type": "content", "text": "答\n"},
+                                {"type": "done"}])
+        self.assertEqual(self.err.getvalue(), "")
+
+
+class TestCreateStreamSink(unittest.TestCase):
+    """测试按输出模式选择输出端"""
+
+    def tearDown(self):
+        set_output_mode(None)
+
+    def test_headless_modes(self):
+        for mode in ("text", "jsonl"):
+            set_output_mode(mode)
+            sink = create_stream_sink()
+            self.assertIsInstance(sink, PlainStreamSink)
+            self.assertEqual(sink.fmt, mode)
+
+    def test_auto_without_terminal(self):
+        """auto模式下标准输出不是终端时使用纯文本"""
+        set_output_mode("auto")
+        with mock.patch("sys.stdout", io.StringIO()):
+            self.assertEqual(get_output_mode(), "text")
+            self.assertIsInstance(create_stream_sink(), PlainStreamSink)
+
+    def test_rich(self):
+        set_output_mode("rich")
+        self.assertNotIsInstance(create_stream_sink(), PlainStreamSink)
+
+
+if __name__ == "__main__":
+    unittest.main()
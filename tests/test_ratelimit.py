@@ -0,0 +1,126 @@
+import asyncio
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from config import ADVANCED_SETTINGS
+from core import ratelimit, resilience
+from core.metrics import RequestMetrics
+from core.ratelimit import RateLimiter, TokenBucket, get_limiter
+from core.resilience import call_with_retries_async
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class RateLimitTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        for patcher in (mock.patch("core.ratelimit.time.monotonic", self.clock),
+                        mock.patch.dict(ADVANCED_SETTINGS, rate_limit_headroom=1.0, rate_limit_recovery=0.25),
+                        mock.patch.dict(resilience._breakers, clear=True),
+                        mock.patch("ui.console.Console.print")):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_bucket_queues_reservations(self):
+        bucket = TokenBucket(rate=2, capacity=2)
+        waits = [bucket.reserve(1, self.clock.now) for _ in range(4)]
+        # 前两个使用积累的额度，之后按每秒2个依次排队
+        self.assertEqual(waits, [0.0, 0.0, 0.5, 1.0])
+        self.clock.now += 1.0
+        self.assertEqual(bucket.reserve(1, self.clock.now), 0.5)
+
+    def test_rpm_and_tpm_limits(self):
+        limiter = RateLimiter("KEY", rpm=600, tpm=6000)  # 每秒10个请求、100个token
+        self.assertEqual(limiter.reserve(100), 0.0)
+        # 请求数还有额度，token不足时按token补充速率等待
+        self.assertAlmostEqual(limiter.reserve(50), 0.5)
+
+    def test_rate_limited_halves_and_recovers(self):
+        limiter = RateLimiter("KEY", rpm=120)
+        limiter.on_rate_limited()
+        self.assertEqual(limiter.factor, 0.5)
+        self.assertAlmostEqual(limiter._buckets["requests"].rate, 1.0)
+        limiter.on_success()
+        limiter.on_success()
+        self.assertEqual(limiter.factor, 1.0)
+        self.assertAlmostEqual(limiter._buckets["requests"].rate, 2.0)
+
+    def test_settle_charges_actual_output(self):
+        limiter = RateLimiter("KEY", tpm=60000)  # 每秒1000个token
+        limiter.expected_output = 100
+        ticket = limiter.ticket(50)
+        ticket.acquire()
+        self.assertAlmostEqual(limiter._buckets["tokens"].level, 850)
+        ticket.settle(400)
+        self.assertAlmostEqual(limiter._buckets["tokens"].level, 550)
+        self.assertAlmostEqual(limiter.expected_output, 160)
+
+    def test_retry_refunds_expected_output(self):
+        limiter = RateLimiter("KEY", tpm=60000)
+        limiter.expected_output = 100
+        ticket = limiter.ticket(50)
+        ticket.acquire()
+        # 重试只多扣输入token，上一次预约的输出额度退还
+        ticket.acquire()
+        self.assertAlmostEqual(limiter._buckets["tokens"].level, 800)
+        ticket.settle(100)
+        self.assertAlmostEqual(limiter._buckets["tokens"].level, 800)
+
+    def test_limiter_shared_per_key(self):
+        with mock.patch.dict(ratelimit.RATE_LIMITS, {"SHARED_KEY": {"rpm": 60}}), \
+                mock.patch.dict(ratelimit._limiters, clear=True):
+            self.assertIs(get_limiter("SHARED_KEY"), get_limiter("SHARED_KEY"))
+            self.assertIsNone(get_limiter("OTHER_KEY"))
+
+    def test_throttled_requests_wait_on_event_loop(self):
+        limiter = RateLimiter("KEY", rpm=60)  # 每秒1个请求
+        delays = []
+
+        async def fake_sleep(delay):
+            delays.append(delay)
+
+        async def call():
+            return "ok"
+
+        async def run():
+            metrics = [RequestMetrics("x") for _ in range(3)]
+            await asyncio.gather(*(call_with_retries_async(call, "https://a", m, ticket=limiter.ticket(0))
+                                   for m in metrics))
+            return [m.throttled for m in metrics]
+
+        with mock.patch("core.ratelimit.asyncio.sleep", fake_sleep):
+            throttled = asyncio.run(run())
+        self.assertEqual(delays, [1.0, 2.0])
+        self.assertEqual(throttled, [0.0, 1.0, 2.0])
+
+    def test_429_slows_limiter(self):
+        limiter = RateLimiter("KEY", rpm=600)
+        error = Exception("HTTP 429")
+        error.status_code = 429
+        error.response = SimpleNamespace(status_code=429, headers={})
+        calls = []
+
+        async def call():
+            calls.append(1)
+            if len(calls) == 1:
+                raise error
+            return "ok"
+
+        async def no_sleep(delay):
+            pass
+
+        with mock.patch("asyncio.sleep", no_sleep):
+            asyncio.run(call_with_retries_async(call, "https://a", ticket=limiter.ticket(0), retries=1))
+        # 429后减半，随后的成功请求恢复一步
+        self.assertEqual(limiter.factor, 0.75)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+from unittest import mock
+
+from core import cache as cache_module
+from core import repl as repl_module
+from core.model import BaseModel
+from core.registry import ModelRegistry
+
+
+class EchoModel(BaseModel):
+    _model_key = "echo"
+    _model_config = {"display_name": "回声"}
+
+    def _cache_key(self, content, **kwargs):
+        return None
+
+    def _request_implementation(self, content, **kwargs):
+        return f"回答:{content}"
+
+
+class OtherModel(EchoModel):
+    _model_key = "other"
+
+
+class BrokenModel(EchoModel):
+    _model_key = "broken"
+
+    def initialize(self):
+        raise ValueError("未设置 BROKEN_API_KEY")
+
+
+class TestRepl(unittest.TestCase):
+    """测试连续对话"""
+
+    def setUp(self):
+        patcher = mock.patch.object(cache_module, "get_response_cache", return_value=None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.model = EchoModel()
+        self.model.initialize()
+        self.repl = repl_module.Repl(self.model)
+        self.repl.console = mock.Mock()
+
+    def run_inputs(self, *inputs):
+        with mock.patch.object(repl_module, "get_input", side_effect=list(inputs) + [EOFError]):
+            self.repl.run()
+
+    def test_reuses_instance_and_history(self):
+        """多个问题共用同一个模型实例，历史逐轮累积"""
+        self.run_inputs("问题一", "", "问题二")
+        self.assertIs(self.repl.instance, self.model)
+        self.assertEqual([m["content"] for m in self.model.history],
+                         ["问题一", "回答:问题一", "问题二", "回答:问题二"])
+
+    def test_commands(self):
+        self.run_inputs("问题", "/mind", "/clear", "/exit", "不会执行")
+        self.assertTrue(self.repl.is_mind)
+        self.assertEqual(len(self.model.history), 0)
+
+    def test_switch_model_keeps_history(self):
+        """切换模型后新模型继续当前对话，切换回来复用原实例"""
+        models = {"echo": EchoModel, "other": OtherModel}
+        with mock.patch.dict(ModelRegistry._models, models):
+            self.run_inputs("问题", "/model other", "/model echo")
+            self.assertIs(self.repl.instance, self.model)
+            other = self.repl._instances["other"]
+        self.assertEqual(other.history, self.model.history)
+
+    def test_switch_model_failure(self):
+        """新模型初始化失败时显示错误，继续使用原模型和对话历史"""
+        models = {"echo": EchoModel, "broken": BrokenModel}
+        with mock.patch.dict(ModelRegistry._models, models):
+            self.run_inputs("问题一", "/model broken", "问题二")
+        self.assertIs(self.repl.instance, self.model)
+        self.assertNotIn("broken", self.repl._instances)
+        self.assertEqual([m["content"] for m in self.model.history],
+                         ["问题一", "回答:问题一", "问题二", "回答:问题二"])
+        printed = " ".join(str(call.args[0]) for call in self.repl.console.print.call_args_list)
+        self.assertIn("BROKEN_API_KEY", printed)
+
+
+if __name__ == "__main__":
+    unittest.main()
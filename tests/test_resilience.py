@@ -0,0 +1,155 @@
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from config import ADVANCED_SETTINGS
+from core import resilience
+from core.metrics import RequestMetrics
+from core.resilience import (CircuitBreaker, CircuitOpenError, GuardedAsyncStream, GuardedStream, StreamTimeoutError,
+                             call_with_retries, call_with_retries_async, retry_after)
+
+
+class StatusError(Exception):
+    """带HTTP状态码和响应头的错误（与SDK的 APIStatusError 结构相同）"""
+
+    def __init__(self, status, headers=None):
+        super().__init__(f"HTTP {status}")
+        self.status_code = status
+        self.response = SimpleNamespace(status_code=status, headers=headers or {})
+
+
+def chunk(text):
+    delta = SimpleNamespace(content=text, reasoning_content=None)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=None)], usage=None)
+
+
+class ResilienceTest(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(resilience._breakers, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("ui.console.Console.print")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retry_honours_retry_after(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            if len(calls) < 3:
+                raise StatusError(429, {"retry-after": "2"})
+            return "ok"
+
+        metrics = RequestMetrics("x")
+        with mock.patch("time.sleep") as sleep:
+            self.assertEqual(call_with_retries(fn, "https://a", metrics, retries=3), "ok")
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(metrics.retries, 2)
+        self.assertTrue(all(call.args[0] >= 2 for call in sleep.call_args_list))
+
+    def test_client_error_not_retried(self):
+        calls = []
+
+        def fn():
+            calls.append(1)
+            raise StatusError(401)
+
+        with mock.patch("time.sleep") as sleep, self.assertRaises(StatusError):
+            call_with_retries(fn, "https://a", retries=3)
+        self.assertEqual(len(calls), 1)
+        sleep.assert_not_called()
+        self.assertEqual(resilience.get_breaker("https://a").state, "closed")
+
+    def test_retry_after_http_date(self):
+        error = StatusError(503, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})
+        self.assertEqual(retry_after(error), 0.0)
+        self.assertEqual(retry_after(StatusError(503, {"retry-after-ms": "1500"})), 1.5)
+        self.assertIsNone(retry_after(StatusError(503)))
+
+    def test_breaker_opens_and_half_opens(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, "open")
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.opened_at = time.monotonic() - 11
+        self.assertEqual(breaker.state, "half_open")
+        breaker.before_call()
+        # 半开状态下只放行一个试探请求
+        with self.assertRaises(CircuitOpenError):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, "closed")
+
+    def test_open_breaker_fails_fast(self):
+        def fn():
+            raise ConnectionError("refused")
+
+        with mock.patch.dict(ADVANCED_SETTINGS, circuit_failure_threshold=2), mock.patch("time.sleep"):
+            with self.assertRaises(ConnectionError):
+                call_with_retries(fn, "https://b", retries=1)
+            with self.assertRaises(CircuitOpenError):
+                call_with_retries(fn, "https://b", retries=1)
+
+    def test_cancelled_trial_releases_breaker(self):
+        breaker = resilience.get_breaker("https://c")
+        breaker.failures = breaker.failure_threshold
+        breaker.opened_at = time.monotonic() - breaker.reset_timeout - 1
+
+        async def hang():
+            await asyncio.sleep(10)
+
+        async def run():
+            task = asyncio.ensure_future(call_with_retries_async(hang, "https://c", retries=0))
+            await asyncio.sleep(0)
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+
+        asyncio.run(run())
+        breaker.before_call()
+
+    def test_first_token_timeout(self):
+        class SlowStream:
+            def __init__(self):
+                self.closed = False
+
+            def __iter__(self):
+                while not self.closed:
+                    time.sleep(0.01)
+                raise ConnectionError("closed")
+                yield
+
+            def close(self):
+                self.closed = True
+
+        stream = SlowStream()
+        with self.assertRaises(StreamTimeoutError):
+            GuardedStream(stream, first_token_timeout=0.05)
+        self.assertTrue(stream.closed)
+
+    def test_async_idle_timeout(self):
+        class Stream:
+            async def __aiter__(self):
+                yield chunk("首字")
+                await asyncio.sleep(10)
+                yield chunk("不会到达")
+
+        async def run():
+            stream = await GuardedAsyncStream(Stream(), first_token_timeout=1, idle_timeout=0.05).open()
+            texts = []
+            with self.assertRaises(StreamTimeoutError):
+                async for item in stream:
+                    texts.append(item.choices[0].delta.content)
+            return texts
+
+        self.assertEqual(asyncio.run(run()), ["首字"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import os
+import sqlite3
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from core.history import Message
+from core.model import BaseModel
+from core import session as session_module
+from core.session import Session, SessionStore
+
+
+class FlakyConnection:
+    """第一次批量写入时失败的数据库连接"""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.failures = 0
+
+    def __enter__(self):
+        return self.conn.__enter__()
+
+    def __exit__(self, *exc_info):
+        return self.conn.__exit__(*exc_info)
+
+    def execute(self, *args):
+        return self.conn.execute(*args)
+
+    def executemany(self, *args):
+        if not self.failures:
+            self.failures += 1
+            raise sqlite3.OperationalError("database is locked")
+        return self.conn.executemany(*args)
+
+    def close(self):
+        self.conn.close()
+
+
+class TestSessionStore(unittest.TestCase):
+    """测试会话存储"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SessionStore(os.path.join(self.tmp.name, "sessions.sqlite3"), flush_interval=0.01)
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_load_tail(self):
+        """只读取最近的若干条消息，按时间顺序返回"""
+        for i in range(10):
+            self.store.append("s", Message("user", f"问{i}"))
+        self.store.append("other", Message("user", "其他会话"))
+        tail = self.store.load_tail("s", 3)
+        self.assertEqual([m.content for m in tail], ["问7", "问8", "问9"])
+        self.assertEqual(self.store.list_sessions(), {"other": 1, "s": 10})
+
+    def test_write_error_retried(self):
+        """写入失败时写入线程继续运行，这批消息在下次写入时重试"""
+        connect = session_module._connect
+        flaky = []
+        with mock.patch.object(session_module, "_connect",
+                               side_effect=lambda path: flaky.append(FlakyConnection(connect(path))) or flaky[-1]), \
+                mock.patch("ui.console.Console.print") as report:
+            self.store.append("s", Message("user", "问1"))
+            while not flaky or not flaky[0].failures:
+                time.sleep(0.01)
+            self.store.append("s", Message("user", "问2"))
+            self.assertEqual([m.content for m in self.store.load_tail("s", 10)], ["问1", "问2"])
+        self.assertIn("database is locked", report.call_args.args[0])
+
+    def test_clear_marker(self):
+        """清空之后恢复时不再读取之前的消息"""
+        session = Session("s", self.store)
+        session.append(Message("user", "旧问题"))
+        session.clear()
+        session.append(Message("user", "新问题"))
+        self.assertEqual([m.content for m in session.load(10)], ["新问题"])
+
+    def test_model_resume(self):
+        """模型关联会话后新的对话被保存，新实例可以恢复"""
+        model = BaseModel()
+        model.attach_session(Session("s", self.store))
+        model.add_turn("问题", "答案")
+
+        resumed = BaseModel()
+        self.assertEqual(resumed.attach_session(Session("s", self.store)), 2)
+        self.assertEqual([m["content"] for m in resumed.history], ["问题", "答案"])
+        self.assertEqual(resumed.history[0].tokens, model.history[0].tokens)
+
+
+if __name__ == "__main__":
+    unittest.main()
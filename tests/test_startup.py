@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import unittest
+
+# 项目根目录
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 导入 main 模块（含模型注册、参数解析和控制台）的耗时预算（毫秒）
+IMPORT_BUDGET_MS = 400
+
+# 模型初始化前不允许加载的提供方SDK
+SDK_MODULES = ("openai", "mistralai", "google.generativeai")
+
+
+def run_python(code: str, *options: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *options, "-c", code],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+
+
+class TestStartup(unittest.TestCase):
+    """测试启动开销"""
+
+    def test_no_sdk_imported_before_initialize(self):
+        """注册模型、列出模型时不导入任何提供方SDK"""
+        code = (
+            "import sys, main\n"
+            "from core.registry import ModelRegistry\n"
+            "assert ModelRegistry.list_models()\n"
+            f"print(','.join(m for m in {SDK_MODULES!r} if m in sys.modules))"
+        )
+        self.assertEqual(run_python(code).stdout.strip(), "")
+
+    def test_import_time_budget(self):
+        """导入 main 的累计耗时在预算之内"""
+        result = run_python("import main", "-X", "importtime")
+        cumulative = None
+        for line in result.stderr.splitlines():
+            fields = [field.strip() for field in line.split("|")]
+            if len(fields) == 3 and fields[2] == "main":
+                cumulative = int(fields[1])
+        self.assertIsNotNone(cumulative)
+        self.assertLess(cumulative / 1000, IMPORT_BUDGET_MS)
+
+
+if __name__ == "__main__":
+    unittest.main()
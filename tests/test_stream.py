@@ -0,0 +1,176 @@
+import asyncio
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+
+from core.metrics import RequestMetrics
+from core.stream import (AsyncStreamReader, StreamEvent, StreamPipeline, StreamSink, ThreadedStreamReader,
+                         mistral_events, openai_events)
+
+
+def openai_chunk(reasoning=None, content=None, finish_reason=None, usage=None):
+    delta = SimpleNamespace(reasoning_content=reasoning, content=content)
+    return SimpleNamespace(choices=[SimpleNamespace(delta=delta, finish_reason=finish_reason)], usage=usage)
+
+
+class RecordingSink(StreamSink):
+    """记录调用的输出端"""
+
+    def __init__(self):
+        self.calls = []
+
+    def open(self):
+        self.calls.append("open")
+
+    def feed(self, event):
+        self.calls.append(event.kind)
+
+    def flush(self):
+        self.calls.append("flush")
+
+    def close(self):
+        self.calls.append("close")
+
+
+class TestThreadedStreamReader(unittest.TestCase):
+    """测试后台线程流读取"""
+
+    def test_batches_coalesce_pending_items(self):
+        """一个帧间隔内到达的数据块合并为一批"""
+        def stream():
+            for i in range(50):
+                time.sleep(0.001)
+                yield i
+
+        with ThreadedStreamReader(stream()) as reader:
+            batches = list(reader.batches(0.05))
+
+        self.assertEqual([i for batch in batches for i in batch], list(range(50)))
+        self.assertLess(len(batches), 50)
+
+    def test_error_propagates_to_consumer(self):
+        """读取线程中的异常在消费端抛出"""
+        def stream():
+            yield 1
+            raise ConnectionError("断开")
+
+        with ThreadedStreamReader(stream()) as reader:
+            with self.assertRaises(ConnectionError):
+                for _ in reader.batches(0.01):
+                    pass
+
+    def test_close_stops_reading(self):
+        """关闭后不再读取底层流"""
+        release = threading.Event()
+        consumed = []
+
+        def stream():
+            for i in range(100):
+                release.wait()
+                consumed.append(i)
+                yield i
+
+        reader = ThreadedStreamReader(stream()).start()
+        reader.close()
+        release.set()
+        reader._thread.join(1)
+        self.assertLessEqual(len(consumed), 1)
+
+
+class TestAsyncStreamReader(unittest.TestCase):
+    """测试异步流读取"""
+
+    def test_batches_coalesce_pending_items(self):
+        """一个帧间隔内到达的数据块合并为一批"""
+        async def stream():
+            for i in range(50):
+                await asyncio.sleep(0.001)
+                yield i
+
+        async def collect():
+            async with AsyncStreamReader(stream()) as reader:
+                return [batch async for batch in reader.batches(0.05)]
+
+        batches = asyncio.run(collect())
+        self.assertEqual([i for batch in batches for i in batch], list(range(50)))
+        self.assertLess(len(batches), 50)
+
+    def test_error_propagates_to_consumer(self):
+        """读取任务中的异常在消费端抛出"""
+        async def stream():
+            yield 1
+            raise ConnectionError("断开")
+
+        async def consume():
+            async with AsyncStreamReader(stream()) as reader:
+                async for _ in reader.batches(0.01):
+                    pass
+
+        with self.assertRaises(ConnectionError):
+            asyncio.run(consume())
+
+
+
+class TestStreamPipeline(unittest.TestCase):
+    """测试统一流式事件管道"""
+
+    CHUNKS = [
+        openai_chunk(reasoning="想"),
+        openai_chunk(reasoning="一想"),
+        openai_chunk(content="答"),
+        openai_chunk(content="案", finish_reason="stop"),
+        SimpleNamespace(choices=[], usage={"total_tokens": 3}),
+    ]
+
+    def test_openai_adapter(self):
+        """OpenAI数据块转换为统一事件"""
+        kinds = [event.kind for chunk in self.CHUNKS for event in openai_events(chunk)]
+        self.assertEqual(kinds, ["reasoning", "reasoning", "content", "content", "finish", "usage"])
+
+    def test_mistral_adapter(self):
+        """Mistral事件的数据位于 data 属性中"""
+        events = mistral_events(SimpleNamespace(data=openai_chunk(content="hi")))
+        self.assertEqual([(e.kind, e.text) for e in events], [(StreamEvent.CONTENT, "hi")])
+
+    def test_run_accumulates_and_drives_sinks(self):
+        """同步管道累积内容并驱动输出端"""
+        sink = RecordingSink()
+        result = StreamPipeline(openai_events, [sink]).run(iter(self.CHUNKS))
+
+        self.assertEqual(result.reasoning, "想一想")
+        self.assertEqual(result.content, "答案")
+        self.assertEqual(result.finish_reason, "stop")
+        self.assertEqual(result.usage, {"total_tokens": 3})
+        self.assertEqual(sink.calls[0], "open")
+        self.assertEqual(sink.calls[-1], "close")
+        self.assertEqual([c for c in sink.calls if c not in ("open", "flush", "close")],
+                         ["reasoning", "reasoning", "content", "content", "finish", "usage"])
+
+    def test_run_async(self):
+        """异步管道与同步管道结果一致"""
+        async def stream():
+            for chunk in self.CHUNKS:
+                yield chunk
+
+        sink = RecordingSink()
+        result = asyncio.run(StreamPipeline(openai_events, [sink]).run_async(stream()))
+        self.assertEqual(result.content, "答案")
+        self.assertEqual(sink.calls[-1], "close")
+
+    def test_metrics(self):
+        """管道在读取端记录首字时间和数据块间隔，在输出端记录渲染耗时"""
+        metrics = RequestMetrics("x")
+        StreamPipeline(openai_events, metrics=metrics).run(iter(self.CHUNKS))
+        record = metrics.finish().to_dict()
+
+        self.assertEqual(record["chunks"], len(self.CHUNKS))
+        self.assertEqual(record["content_chars"], 2)
+        self.assertEqual(record["reasoning_chars"], 3)
+        self.assertLessEqual(record["ttft_reasoning"], record["ttft_content"])
+        self.assertEqual(len(metrics.gaps), len(self.CHUNKS) - 1)
+        self.assertGreaterEqual(record["frames"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -4,13 +4,15 @@
 from typing import Optional, Dict, Any, List, Union, Literal
 import shutil
 from rich.console import Console as RichConsole
-from rich.markdown import Markdown
 from rich.text import Text
-from rich.live import Live
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
 from rich.console import Group
 
+from config import UI_CONFIG
+from core.stream import StreamAdapter, StreamEvent, StreamPipeline, StreamSink, openai_events, text_events
+from ui.output import is_headless
+
+# Markdown、Live、Panel等渲染组件在使用时才导入，无头模式下不会加载
+
 
 # 类型定义
 PrintType = Literal["ok", "warn", "info", "error", "sigint", "exit", "changelog"]
@@ -32,15 +34,23 @@ class Console:
     def __init__(self):
         """初始化实例"""
         if not getattr(self, "_initialized", False):
-            self._console = RichConsole()
+            # 无头模式下状态信息输出到标准错误，标准输出只保留模型回答
+            self._console = RichConsole(stderr=is_headless())
             self._initialized = True
     
+    def use_stderr(self, stderr: bool = True) -> None:
+        """切换状态信息的输出目标"""
+        if self._console.stderr != stderr:
+            self._console = RichConsole(stderr=stderr)
+    
     def print(self, text: str, style: Optional[str] = None, end: str = "\n"):
         """打印文本"""
         self._console.print(text, style=style, end=end)
     
     def print_markdown(self, text: str, code_theme: str = "dracula"):
         """打印Markdown格式文本"""
+        from rich.markdown import Markdown
+        
         md = Markdown(text, code_theme=code_theme)
         self._console.print(md)
     
@@ -75,6 +85,8 @@ class Console:
     
     def create_progress(self, description: str = "处理中"):
         """创建进度条"""
+        from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeElapsedColumn
+        
         return Progress(
             SpinnerColumn(spinner_name="dots2", style="bold cyan"),
             TextColumn("[bold cyan]{task.description}"),
@@ -98,6 +110,8 @@ class Console:
             end: 结束字符
             header_color: 标题颜色
         """
+        from rich.markdown import Markdown
+        
         # 打印标题
         if header:
             header_text = Text(f"╰─❯ {header}:", style=f"{header_color} underline bold")
@@ -121,104 +135,75 @@ class Console:
         self.markdown_print(content, header="📒结论输出", header_color="yellow", end="\n")
         return content
     
+    def create_stream_sink(self) -> "LiveStreamSink":
+        """创建实时渲染思考/结论双面板的流式输出端"""
+        return LiveStreamSink(self._console)
+    
+    def create_fanout_display(self, regions: List["ModelRegion"]) -> "FanoutDisplay":
+        """创建多模型并发输出的显示区域"""
+        return FanoutDisplay(self._console, regions)
+    
+    def print_table(self, title: str, columns: List[str], rows: List[List[str]]) -> None:
+        """
+        打印表格
+        
+        Args:
+            title: 表格标题
+            columns: 列名（第一列左对齐，其余右对齐）
+            rows: 各行单元格文本
+        """
+        from rich.table import Table
+        
+        table = Table(title=title, title_style="bold cyan", header_style="bold")
+        for index, column in enumerate(columns):
+            table.add_column(column, justify="left" if index == 0 else "right")
+        for row in rows:
+            table.add_row(*row)
+        self._console.print(table)
+    
     def markdown_stream(self, chunks) -> str:
         """
         流式渲染Markdown内容
         
         Args:
-            chunks: Markdown内容块
+            chunks: Markdown内容块（带 text 属性）
             
         Returns:
             完整内容
         """
-        response = ""
-        
-        def render_content():
-            """渲染内容"""
-            md = Markdown("**╰─❯ 📒 结论输出:**\n\n" + response, code_theme="dracula")
-            panel = Panel(md, title="结论", border_style="blue")
-            return panel
-        
-        with Live(render_content(), refresh_per_second=4, auto_refresh=False, vertical_overflow="crop_above") as live:
-            for chunk in chunks:
-                if hasattr(chunk, 'text'):
-                    response += chunk.text
-                    live.update(render_content(), refresh=True)
-        
-        return response 
+        return self.print_stream(chunks, adapter=text_events)
     
-    def print_stream(self, stream) -> str:
+    def print_stream(self, stream, adapter: StreamAdapter = openai_events) -> str:
         """
         实时打印流式响应内容，将思考内容和结论输出分区显示
         
+        网络读取在后台线程中进行，每帧合并期间到达的全部增量后只渲染一次
+        
         Args:
             stream: 流式响应
+            adapter: 数据块适配器
             
         Returns:
             完整响应内容
         """
-        # 初始化内容
-        think_text = ""
-        conclusion_text = ""
+        pipeline = StreamPipeline(adapter, [self.create_stream_sink()], frame_interval=LiveStreamSink.frame_interval())
+        return pipeline.run(stream).content
+    
+    async def print_stream_async(self, stream, adapter: StreamAdapter = openai_events) -> str:
+        """
+        异步实时打印流式响应内容，显示效果与 print_stream 相同
         
-        # 跟踪状态
-        thinking_complete = False
-        has_conclusion = False
-        last_chunk_has_reasoning = False
+        读取在事件循环中进行，渲染放到线程中执行，不阻塞事件循环
         
-        def render_content():
-            """根据当前状态渲染内容"""
-            panels = []
-            
-            # 思考面板 - 只有在有思考内容时才显示
-            if think_text:
-                md_think = Markdown("**╰─❯ 🤔 思考内容输出:**\n\n" + think_text, code_theme="dracula")
-                panel_think = Panel(md_think, title="思考内容", border_style="blue")
-                panels.append(panel_think)
-            
-            # 结论面板（只在适当时显示）
-            if thinking_complete and has_conclusion:
-                md_conclusion = Markdown("**╰─❯ 📒 结论输出:**\n\n" + conclusion_text, code_theme="dracula")
-                panel_conclusion = Panel(md_conclusion, title="结论", border_style="green")
-                panels.append(panel_conclusion)
+        Args:
+            stream: 异步流式响应
+            adapter: 数据块适配器
             
-            return Group(*panels)
-        
-        # 使用Live组件实时更新
-        with Live(render_content(), refresh_per_second=4, auto_refresh=False, vertical_overflow="crop_above") as live:
-            for chunk in stream:
-                # 跳过无效chunk
-                if not hasattr(chunk, 'choices') or not chunk.choices or len(chunk.choices) == 0:
-                    continue
-                
-                delta = getattr(chunk.choices[0], 'delta', None)
-                if not delta:
-                    continue
-                
-                # 检查是否有思考内容
-                current_has_reasoning = hasattr(delta, 'reasoning_content') and getattr(delta, 'reasoning_content') is not None
-                
-                # 累加思考内容
-                if reason := getattr(delta, 'reasoning_content', None):
-                    think_text += reason
-                    last_chunk_has_reasoning = True
-                else:
-                    # 检测思考内容是否结束
-                    if last_chunk_has_reasoning and not current_has_reasoning:
-                        thinking_complete = True
-                    last_chunk_has_reasoning = False
-                
-                # 累加结论输出
-                if res := getattr(delta, 'content', None):
-                    conclusion_text += res
-                    has_conclusion = True
-                    thinking_complete = True
-                
-                # 更新显示
-                live.update(render_content(), refresh=True)
-        
-        # 返回结论
-        return conclusion_text
+        Returns:
+            完整响应内容
+        """
+        pipeline = StreamPipeline(adapter, [self.create_stream_sink()], frame_interval=LiveStreamSink.frame_interval())
+        return (await pipeline.run_async(stream)).content
     
     @property
     def width(self) -> int:
@@ -231,6 +216,178 @@ class Console:
         return self._console.height
 
 
+class ThinkingView:
+    """
+    思考/结论双面板视图
+
+    分别累积思考内容和结论输出的流式事件，作为Live的可渲染对象使用。
+    """
+    
+    def __init__(self, code_theme: str = "dracula"):
+        from ui.markdown_stream import IncrementalMarkdown
+        
+        # 增量渲染，已完成的Markdown块只解析一次
+        self.think_md = IncrementalMarkdown("**╰─❯ 🤔 思考内容输出:**\n\n", code_theme=code_theme)
+        self.conclusion_md = IncrementalMarkdown("**╰─❯ 📒 结论输出:**\n\n", code_theme=code_theme)
+        self.has_reasoning = False
+        self.has_conclusion = False
+    
+    @property
+    def max_lines(self) -> Optional[int]:
+        """每个面板最多渲染的行数"""
+        return self.think_md.max_lines
+    
+    @max_lines.setter
+    def max_lines(self, value: Optional[int]) -> None:
+        self.think_md.max_lines = self.conclusion_md.max_lines = value
+    
+    def feed(self, event: StreamEvent) -> None:
+        """
+        处理一个流式事件
+        
+        Args:
+            event: 流式事件
+        """
+        if event.kind == StreamEvent.REASONING:
+            self.think_md.append(event.text)
+            self.has_reasoning = True
+        elif event.kind == StreamEvent.CONTENT:
+            self.conclusion_md.append(event.text)
+            self.has_conclusion = True
+    
+    def __rich__(self) -> Group:
+        """根据当前状态渲染内容"""
+        from rich.panel import Panel
+        
+        panels = []
+        
+        # 思考面板 - 只有在有思考内容时才显示
+        if self.has_reasoning:
+            panels.append(Panel(self.think_md, title="思考内容", border_style="blue"))
+        
+        # 结论面板 - 结论开始输出后显示
+        if self.has_conclusion:
+            panels.append(Panel(self.conclusion_md, title="结论", border_style="green"))
+        
+        return Group(*panels)
+
+
+class LiveStreamSink(StreamSink):
+    """使用rich Live实时渲染思考/结论双面板的流式输出端"""
+    
+    def __init__(self, console: RichConsole):
+        self._console = console
+        self.view = ThinkingView(code_theme=UI_CONFIG.get("code_theme", "dracula"))
+        self._live = None
+    
+    @staticmethod
+    def frame_interval() -> float:
+        """按配置的渲染帧率计算帧间隔"""
+        return 1 / UI_CONFIG.get("refresh_rate", 4)
+    
+    def open(self) -> None:
+        from rich.live import Live
+        
+        # 刷新时只渲染可见的末尾部分
+        self.view.max_lines = self._console.height
+        self._live = Live(
+            self.view,
+            console=self._console,
+            refresh_per_second=UI_CONFIG.get("refresh_rate", 4),
+            auto_refresh=False,
+            vertical_overflow="crop_above"
+        )
+        self._live.start(refresh=True)
+    
+    def feed(self, event: StreamEvent) -> None:
+        self.view.feed(event)
+    
+    def flush(self) -> None:
+        self._live.refresh()
+    
+    def close(self) -> None:
+        # 退出时完整输出最后一帧
+        self.view.max_lines = None
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
+
+class ModelRegion(StreamSink):
+    """多模型并发时单个模型的输出区域，标题显示模型名称和状态"""
+    
+    def __init__(self, title: str):
+        self.title = title
+        self.view = ThinkingView(code_theme=UI_CONFIG.get("code_theme", "dracula"))
+        self.status = "等待响应"
+        self.border_style = "yellow"
+    
+    def open(self) -> None:
+        self.status = "输出中"
+        self.border_style = "cyan"
+    
+    def feed(self, event: StreamEvent) -> None:
+        self.view.feed(event)
+    
+    def finish(self, status: str, error: bool = False) -> None:
+        """
+        标记请求结束
+        
+        Args:
+            status: 状态文本（如耗时或错误信息）
+            error: 是否出错
+        """
+        self.status = status
+        self.border_style = "red" if error else "green"
+    
+    def __rich__(self):
+        from rich.panel import Panel
+        
+        body = self.view if self.view.has_reasoning or self.view.has_conclusion else Text("…", style="dim")
+        return Panel(body, title=f"{self.title} · {self.status}", title_align="left", border_style=self.border_style)
+
+
+class FanoutDisplay:
+    """
+    多模型并发输出
+
+    所有模型的区域在同一个Live中渲染；输出端只更新区域内容，
+    由调用方按帧间隔调用 refresh()，渲染和更新都在事件循环线程中进行。
+    """
+    
+    def __init__(self, console: RichConsole, regions: List[ModelRegion]):
+        self._console = console
+        self.regions = regions
+        self._live = None
+    
+    def start(self) -> None:
+        from rich.live import Live
+        
+        # 每个区域的思考和结论面板平分屏幕高度，刷新时只渲染可见的末尾部分
+        per_region = self._console.height // max(1, len(self.regions))
+        for region in self.regions:
+            region.view.max_lines = max(3, (per_region - 4) // 2)
+        self._live = Live(
+            Group(*self.regions),
+            console=self._console,
+            auto_refresh=False,
+            vertical_overflow="crop_above"
+        )
+        self._live.start(refresh=True)
+    
+    def refresh(self) -> None:
+        if self._live is not None:
+            self._live.refresh()
+    
+    def stop(self) -> None:
+        # 退出时完整输出各模型的最后一帧
+        for region in self.regions:
+            region.view.max_lines = None
+        if self._live is not None:
+            self._live.stop()
+            self._live = None
+
+
 # 为了向后兼容，提供全局函数版本
 def markdown_print(
     data: str, 
@@ -252,6 +409,11 @@ def markdown_stream(chunks) -> str:
     return Console().markdown_stream(chunks)
 
 
-def print_stream(stream) -> str:
+def print_stream(stream, adapter: StreamAdapter = openai_events) -> str:
     """向后兼容: 实时打印流式响应内容"""
-    return Console().print_stream(stream)
+    return Console().print_stream(stream, adapter)
+
+
+async def print_stream_async(stream, adapter: StreamAdapter = openai_events) -> str:
+    """异步实时打印流式响应内容"""
+    return await Console().print_stream_async(stream, adapter)
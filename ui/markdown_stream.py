@@ -0,0 +1,170 @@
+"""
+增量Markdown渲染模块 - 为流式输出提供按块缓存的Markdown渲染
+"""
+import re
+from itertools import chain
+from typing import List, Optional, Tuple
+
+from rich.console import Console as RichConsole, ConsoleOptions, RenderResult
+from rich.markdown import Markdown
+from rich.segment import Segment
+
+
+# 代码围栏（``` 或 ~~~，最多缩进3个空格）
+_FENCE_OPEN_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_FENCE_CLOSE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})\s*$")
+# ATX标题
+_HEADING_RE = re.compile(r"^#{1,6}(\s|$)")
+
+
+class IncrementalMarkdown:
+    """
+    增量Markdown渲染器
+
+    将流式追加的文本切分为已完成的块（段落、标题、闭合的代码围栏等）和
+    尚未结束的尾部块。已完成的块只解析、排版一次并缓存渲染结果，
+    每帧只重新解析尾部块，因此单帧渲染开销不随回答长度增长。
+    """
+
+    def __init__(self, text: str = "", code_theme: str = "dracula"):
+        self.code_theme = code_theme
+        # 只渲染最后若干行（Live刷新时使用），为None时完整渲染
+        self.max_lines: Optional[int] = None
+
+        self._chunks: List[str] = []  # 全部文本片段
+        self._blocks: List[str] = []  # 已完成的块
+        self._block_lines: List[str] = []  # 当前未完成块的完整行
+        self._partial = ""  # 当前未结束的行
+        self._fence: Optional[Tuple[str, int]] = None  # 当前打开的代码围栏
+        self._fence_top_level = False
+        self._after_blank = False
+
+        # 渲染缓存
+        self._lines: List[List[Segment]] = []
+        self._rendered = 0
+        self._width: Optional[int] = None
+
+        if text:
+            self.append(text)
+
+    @property
+    def text(self) -> str:
+        """获取完整文本"""
+        return "".join(self._chunks)
+
+    def __bool__(self) -> bool:
+        return bool(self._chunks)
+
+    def append(self, text: str) -> None:
+        """
+        追加文本
+
+        Args:
+            text: 新增文本片段
+        """
+        if not text:
+            return
+        self._chunks.append(text)
+
+        lines = (self._partial + text).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._feed_line(line)
+
+    def _feed_line(self, line: str) -> None:
+        """处理一个完整的行，必要时结束当前块"""
+        # 代码围栏内部：只检测围栏是否闭合
+        if self._fence:
+            self._block_lines.append(line)
+            match = _FENCE_CLOSE_RE.match(line)
+            if match:
+                marker = match.group(1)
+                if marker[0] == self._fence[0] and len(marker) >= self._fence[1]:
+                    self._fence = None
+                    if self._fence_top_level:
+                        self._finalize()
+            return
+
+        # 空行：暂不结束块，后续行缩进时仍属于同一块（如列表项的续行）
+        if not line.strip():
+            if self._block_lines:
+                self._after_blank = True
+                self._block_lines.append(line)
+            return
+
+        top_level = not line[0].isspace()
+        fence = _FENCE_OPEN_RE.match(line)
+        heading = top_level and _HEADING_RE.match(line)
+
+        # 空行后的顶格行、顶格代码围栏、标题都会开始一个新块
+        if top_level and (self._after_blank or fence or heading):
+            self._finalize()
+        self._after_blank = False
+        self._block_lines.append(line)
+
+        if fence:
+            marker = fence.group(1)
+            self._fence = (marker[0], len(marker))
+            self._fence_top_level = top_level
+        elif heading:
+            self._finalize()
+
+    def _finalize(self) -> None:
+        """结束当前块"""
+        lines = self._block_lines
+        while lines and not lines[-1].strip():
+            lines.pop()
+        if lines:
+            self._blocks.append("\n".join(lines))
+        self._block_lines = []
+        self._after_blank = False
+
+    def _tail(self) -> str:
+        """获取尚未完成的尾部块"""
+        if self._partial:
+            return "\n".join(chain(self._block_lines, (self._partial,)))
+        return "\n".join(self._block_lines)
+
+    def _render_block(self, console: RichConsole, options: ConsoleOptions, source: str) -> List[List[Segment]]:
+        """渲染单个块为行列表"""
+        markdown = Markdown(source, code_theme=self.code_theme)
+        lines = console.render_lines(markdown, options, pad=False)
+        # 块之间统一用一个空行分隔
+        while lines and not any(segment.text for segment in lines[0]):
+            lines.pop(0)
+        return lines
+
+    def __rich_console__(self, console: RichConsole, options: ConsoleOptions) -> RenderResult:
+        options = options.update(height=None)
+
+        # 宽度变化时已缓存的排版失效
+        if options.max_width != self._width:
+            self._width = options.max_width
+            self._lines = []
+            self._rendered = 0
+
+        # 只渲染新完成的块
+        while self._rendered < len(self._blocks):
+            block_lines = self._render_block(console, options, self._blocks[self._rendered])
+            if self._lines and block_lines:
+                self._lines.append([])
+            self._lines.extend(block_lines)
+            self._rendered += 1
+
+        tail_lines: List[List[Segment]] = []
+        tail = self._tail()
+        if tail.strip():
+            tail_lines = self._render_block(console, options, tail)
+            if self._lines and tail_lines:
+                tail_lines.insert(0, [])
+
+        lines = self._lines
+        if self.max_lines is not None and len(lines) + len(tail_lines) > self.max_lines:
+            keep = self.max_lines - len(tail_lines)
+            lines = lines[len(lines) - keep:] if keep > 0 else []
+            tail_lines = tail_lines[len(tail_lines) - self.max_lines:]
+
+        new_line = Segment.line()
+        for line in chain(lines, tail_lines):
+            yield from line
+            yield new_line
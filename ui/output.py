@@ -0,0 +1,166 @@
+"""
+输出模式模块 - 根据输出目标选择富文本渲染或纯文本/JSON Lines输出
+
+本模块不导入rich，无头模式（管道、定时任务）下不会加载任何渲染组件。
+"""
+import json
+import sys
+from typing import TYPE_CHECKING, Optional, Sequence, TextIO
+
+from config import UI_CONFIG
+from core.stream import (StreamAccumulator, StreamAdapter, StreamEvent, StreamPipeline, StreamSink, openai_events,
+                         text_events)
+
+if TYPE_CHECKING:
+    from core.metrics import RequestMetrics
+
+
+# 支持的输出模式
+OUTPUT_MODES = ("auto", "rich", "text", "jsonl")
+
+# 当前输出模式（None表示使用配置）
+_output_mode: Optional[str] = None
+
+
+def set_output_mode(mode: Optional[str]) -> str:
+    """
+    设置输出模式
+
+    Args:
+        mode: 输出模式，auto表示标准输出为终端时使用rich，否则使用纯文本
+
+    Returns:
+        实际生效的输出模式
+    """
+    global _output_mode
+    if mode is not None and mode not in OUTPUT_MODES:
+        raise ValueError(f"未知输出模式: {mode}")
+    _output_mode = mode
+    return get_output_mode()
+
+
+def get_output_mode() -> str:
+    """获取实际生效的输出模式（rich、text或jsonl）"""
+    mode = _output_mode or UI_CONFIG.get("output_mode", "auto")
+    if mode == "auto":
+        isatty = getattr(sys.stdout, "isatty", None)
+        return "rich" if isatty and isatty() else "text"
+    return mode
+
+
+def is_headless() -> bool:
+    """是否处于无头输出模式"""
+    return get_output_mode() != "rich"
+
+
+class PlainStreamSink(StreamSink):
+    """
+    纯文本/JSON Lines流式输出端
+
+    text模式下结论写入标准输出、思考内容写入标准错误；
+    jsonl模式下每个增量写为一行 {"type": "reasoning"|"content", "text": ...}。
+    """
+
+    def __init__(self, fmt: str = "text", out: Optional[TextIO] = None, err: Optional[TextIO] = None):
+        self.fmt = fmt
+        self.out = out or sys.stdout
+        self.err = err or sys.stderr
+        self._last_char = {}
+
+    def feed(self, event: StreamEvent) -> None:
+        if event.kind not in (StreamEvent.REASONING, StreamEvent.CONTENT) or not event.text:
+            return
+        if self.fmt == "jsonl":
+            self.out.write(json.dumps({"type": event.kind, "text": event.text}, ensure_ascii=False) + "\n")
+            return
+        target = self.err if event.kind == StreamEvent.REASONING else self.out
+        target.write(event.text)
+        self._last_char[event.kind] = event.text[-1]
+
+    def flush(self) -> None:
+        self.out.flush()
+        self.err.flush()
+
+    def close(self) -> None:
+        if self.fmt == "jsonl":
+            self.out.write(json.dumps({"type": "done"}) + "\n")
+        else:
+            # 保证输出以换行结束
+            for kind, target in ((StreamEvent.REASONING, self.err), (StreamEvent.CONTENT, self.out)):
+                if self._last_char.get(kind, "\n") != "\n":
+                    target.write("\n")
+        self.flush()
+
+
+def create_stream_sink() -> StreamSink:
+    """按输出模式创建流式渲染输出端"""
+    mode = get_output_mode()
+    if mode != "rich":
+        return PlainStreamSink(mode)
+    from ui.console import Console
+    return Console().create_stream_sink()
+
+
+def create_pipeline(adapter: StreamAdapter = openai_events,
+                    sinks: Sequence[StreamSink] = (),
+                    metrics: Optional["RequestMetrics"] = None) -> StreamPipeline:
+    """
+    按输出模式创建流式事件管道
+
+    Args:
+        adapter: 数据块适配器
+        sinks: 渲染之外的其他输出端
+        metrics: 请求耗时统计
+
+    Returns:
+        流式事件管道
+    """
+    if is_headless():
+        return StreamPipeline(adapter, [create_stream_sink(), *sinks], metrics=metrics)
+    from ui.console import LiveStreamSink
+    return StreamPipeline(adapter, [create_stream_sink(), *sinks],
+                          frame_interval=LiveStreamSink.frame_interval(), metrics=metrics)
+
+
+# 按输出模式分发的流式输出函数
+def render_stream(stream,
+                  adapter: StreamAdapter = openai_events,
+                  metrics: Optional["RequestMetrics"] = None) -> StreamAccumulator:
+    """实时输出流式响应，返回累积的思考和结论内容"""
+    return create_pipeline(adapter, metrics=metrics).run(stream)
+
+
+async def render_stream_async(stream,
+                              adapter: StreamAdapter = openai_events,
+                              metrics: Optional["RequestMetrics"] = None) -> StreamAccumulator:
+    """异步实时输出流式响应，返回累积的思考和结论内容"""
+    return await create_pipeline(adapter, metrics=metrics).run_async(stream)
+
+
+def print_stream(stream, adapter: StreamAdapter = openai_events, metrics: Optional["RequestMetrics"] = None) -> str:
+    """实时输出流式响应内容"""
+    return render_stream(stream, adapter, metrics).content
+
+
+async def print_stream_async(stream,
+                             adapter: StreamAdapter = openai_events,
+                             metrics: Optional["RequestMetrics"] = None) -> str:
+    """异步实时输出流式响应内容"""
+    return (await render_stream_async(stream, adapter, metrics)).content
+
+
+def markdown_stream(chunks) -> str:
+    """流式输出Markdown内容"""
+    return print_stream(chunks, adapter=text_events)
+
+
+def print_conclusion(content: str) -> str:
+    """输出完整结论"""
+    mode = get_output_mode()
+    if mode != "rich":
+        sink = PlainStreamSink(mode)
+        sink.feed(StreamEvent(StreamEvent.CONTENT, content))
+        sink.close()
+        return content
+    from ui.console import print_conclusion as rich_print_conclusion
+    return rich_print_conclusion(content)
@@ -2,7 +2,6 @@
 脑图生成工具模块 - 提供Markdown转思维导图功能
 """
 import os
-import time
 import subprocess
 import shutil
 from typing import Optional, Tuple, Union
@@ -34,7 +33,7 @@ def get_project_root() -> Path:
 
 def save_markdown_to_file(markdown_text: str, prefix: str = "模型总结") -> str:
     """
-    将markdown文本保存到指定路径的文件中
+    将markdown文本保存到 resource/md_cache 目录中（按内容寻址，超出容量或有效期的旧文件会被淘汰）
     
     Args:
         markdown_text: 要保存的markdown文本内容
@@ -45,26 +44,11 @@ def save_markdown_to_file(markdown_text: str, prefix: str = "模型总结") -> s
     """
     if not markdown_text or markdown_text.strip() == "":
         raise ValueError("Markdown文本内容不能为空")
-        
-    # 获取项目根目录
-    project_root = get_project_root()
-    
-    # 确保目标目录存在
-    target_dir = project_root / "resource" / "md_cache"
-    target_dir.mkdir(parents=True, exist_ok=True)
-    
-    # 生成毫秒级时间戳
-    timestamp = int(time.time() * 1000)
-    
-    # 构建文件名和完整路径
-    filename = f"{prefix}_{timestamp}.md"
-    file_path = target_dir / filename
     
-    # 写入文件
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(markdown_text)
+    from utils.md_cache import get_md_cache
     
-    return str(file_path)
+    # 文件名为 {前缀}_{内容哈希}.md，相同内容复用已保存的文件
+    return str(get_md_cache().put(markdown_text, prefix))
 
 
 def open_file(file_path: str) -> bool:
@@ -92,7 +76,11 @@ def open_file(file_path: str) -> bool:
 
 def generate_markmap(file_path: str) -> Tuple[Optional[str], int, str]:
     """
-    使用markmap-cli将Markdown文件转换为思维导图
+    将Markdown文件转换为思维导图
+    
+    同名的 .html 已经存在且不早于Markdown文件时直接复用；
+    否则默认使用内置生成器在进程内生成（毫秒级，不需要Node.js），
+    失败或配置 markmap_renderer 为 "npx" 时使用markmap-cli。
     
     Args:
         file_path: Markdown文件的路径
@@ -106,6 +94,55 @@ def generate_markmap(file_path: str) -> Tuple[Optional[str], int, str]:
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Markdown文件不存在: {file_path}")
     
+    # 相同内容的思维导图已经生成过
+    output_file = os.path.splitext(file_path)[0] + ".html"
+    if os.path.exists(output_file) and os.path.getmtime(output_file) >= os.path.getmtime(file_path):
+        console.print(f"思维导图已生成: {output_file}", style="bold green")
+        return output_file, 0, ""
+    
+    result = _render_markmap(file_path)
+    if result[0]:
+        from utils.md_cache import get_md_cache
+        
+        # 生成的网页计入缓存容量
+        get_md_cache().record_html(Path(file_path))
+    return result
+
+
+def _render_markmap(file_path: str) -> Tuple[Optional[str], int, str]:
+    """按 markmap_renderer 配置生成思维导图，内置生成器失败时改用markmap-cli"""
+    from config import ADVANCED_SETTINGS
+    
+    console = get_console()
+    
+    if ADVANCED_SETTINGS.get("markmap_renderer", "builtin") != "npx":
+        try:
+            from utils.markmap_html import missing_assets, write_markmap_html
+            
+            output_file = write_markmap_html(file_path)
+            console.print(f"思维导图已生成: {output_file}", style="bold green")
+            if missing := missing_assets():
+                console.print(f"未找到本地前端资源（{', '.join(missing)}），思维导图将从CDN加载，离线时无法显示；"
+                              f"运行 python -m utils.markmap_html 下载", style="dim yellow")
+            return output_file, 0, ""
+        except Exception as e:
+            console.print(f"内置思维导图生成失败（{e}），改用markmap-cli", style="dim yellow")
+    
+    return generate_markmap_npx(file_path)
+
+
+def generate_markmap_npx(file_path: str) -> Tuple[Optional[str], int, str]:
+    """
+    使用markmap-cli将Markdown文件转换为思维导图
+    
+    Args:
+        file_path: Markdown文件的路径
+    
+    Returns:
+        (生成的思维导图HTML文件路径, 命令执行状态码, 命令输出信息)
+    """
+    console = get_console()
+    
     # 检查npx是否可用
     if not shutil.which("npx"):
         raise EnvironmentError("未找到npx命令，请确保已安装Node.js和npm")
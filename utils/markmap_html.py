@@ -0,0 +1,240 @@
+"""
+内置思维导图生成器 - 不启动 Node.js，在进程内把Markdown转换为markmap网页
+
+把Markdown的标题和列表层级解析为markmap的节点树，注入带版本号的HTML模板。
+resource/markmap/vendor 中有本地的JS文件时内联到网页中（完全离线），否则引用固定版本的CDN地址。
+"""
+import html
+import json
+import re
+import urllib.request
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+# 模板版本（修改模板或节点格式时递增）
+TEMPLATE_VERSION = 1
+
+# 依赖的前端库版本
+D3_VERSION = "7.9.0"
+MARKMAP_VIEW_VERSION = "0.17.2"
+
+# 前端资源：(本地文件名, CDN地址)，按加载顺序排列
+ASSETS = (
+    ("d3.min.js", f"https://cdn.jsdelivr.net/npm/d3@{D3_VERSION}/dist/d3.min.js"),
+    ("markmap-view.js", f"https://cdn.jsdelivr.net/npm/markmap-view@{MARKMAP_VIEW_VERSION}/dist/browser/index.js"),
+)
+
+# markmap 显示选项（为空时使用 markmap 的默认值）
+DEFAULT_OPTIONS: Dict[str, Any] = {}
+
+# Markdown的标题、列表项和代码块边界（大纲分析 utils.outline 共用）
+HEADING_PATTERN = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+LIST_ITEM_PATTERN = re.compile(r"^(\s*)(?:[-*+]|\d+[.)])\s+(.*)$")
+FENCE_PATTERN = re.compile(r"^\s*(`{3,}|~{3,})")
+_CODE_SPAN = re.compile(r"`([^`]+)`")
+_INLINE = [
+    (re.compile(r"\*\*(.+?)\*\*|__(.+?)__"), lambda m: f"<strong>{m.group(1) or m.group(2)}</strong>"),
+    (re.compile(r"(?<![*\w])\*(?!\s)(.+?)(?<!\s)\*(?!\*)|(?<!\w)_(?!\s)(.+?)(?<!\s)_(?!\w)"),
+     lambda m: f"<em>{m.group(1) or m.group(2)}</em>"),
+    (re.compile(r"~~(.+?)~~"), r"<del>\1</del>"),
+    (re.compile(r"\[([^\]]+)\]\(([^)\s]+)\)"), r'<a href="\2">\1</a>'),
+]
+
+
+def get_markmap_dir() -> Path:
+    """模板和本地前端资源所在的目录"""
+    return Path(__file__).resolve().parent.parent / "resource" / "markmap"
+
+
+def render_inline(text: str) -> str:
+    """
+    把一行Markdown的行内格式转换为HTML（先转义，代码、粗体、斜体、删除线和链接）
+
+    Args:
+        text: Markdown文本
+
+    Returns:
+        HTML片段
+    """
+    # 行内代码原样保留，只处理代码之外的部分
+    parts = _CODE_SPAN.split(text.strip())
+    for index, part in enumerate(parts):
+        part = html.escape(part)
+        if index % 2:
+            parts[index] = f"<code>{part}</code>"
+            continue
+        for pattern, replacement in _INLINE:
+            part = pattern.sub(replacement, part)
+        parts[index] = part
+    return "".join(parts)
+
+
+def _node(content: str) -> Dict[str, Any]:
+    return {"content": content, "children": []}
+
+
+def parse_markdown(markdown_text: str) -> Dict[str, Any]:
+    """
+    把Markdown的标题和列表层级解析为markmap节点树
+
+    标题按级别嵌套，列表项挂在最近的标题下并按缩进嵌套；标题下的段落和代码块作为叶子节点，
+    列表项后缩进的续行并入该列表项。只有一个顶层节点时它就是根节点。
+
+    Args:
+        markdown_text: Markdown文本
+
+    Returns:
+        根节点 {"content": HTML, "children": [...]}
+    """
+    root = _node("")
+    # 栈中每项为 (层级, 节点)：标题层级为1~6，列表项为 7 + 缩进列数
+    stack: List[tuple] = [(0, root)]
+    fence: Optional[str] = None
+    code: List[str] = []
+    lines = markdown_text.splitlines()
+
+    # 跳过开头的YAML元数据
+    if lines and lines[0].strip() == "---":
+        for index, line in enumerate(lines[1:], 1):
+            if line.strip() == "---":
+                lines = lines[index + 1:]
+                break
+
+    def attach(level: float, content: str) -> Dict[str, Any]:
+        while stack[-1][0] >= level:
+            stack.pop()
+        node = _node(content)
+        stack[-1][1]["children"].append(node)
+        stack.append((level, node))
+        return node
+
+    for line in lines:
+        expanded = line.expandtabs(4)
+        if fence is not None:
+            if expanded.strip().startswith(fence):
+                leaf = _node(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>")
+                stack[-1][1]["children"].append(leaf)
+                fence, code = None, []
+            else:
+                code.append(line)
+            continue
+        if match := FENCE_PATTERN.match(expanded):
+            fence = match.group(1)
+            continue
+        if not expanded.strip():
+            continue
+        if match := HEADING_PATTERN.match(expanded):
+            attach(len(match.group(1)), render_inline(match.group(2)))
+        elif match := LIST_ITEM_PATTERN.match(expanded):
+            attach(7 + len(match.group(1)), render_inline(match.group(2)))
+        elif stack[-1][0] >= 7 and expanded.startswith(" "):
+            # 列表项的续行
+            stack[-1][1]["content"] += "<br>" + render_inline(expanded)
+        else:
+            # 段落：挂在最近的标题下
+            while stack[-1][0] >= 7:
+                stack.pop()
+            stack[-1][1]["children"].append(_node(render_inline(expanded)))
+
+    if fence is not None and code:
+        stack[-1][1]["children"].append(_node(f"<pre><code>{html.escape(chr(10).join(code))}</code></pre>"))
+
+    if len(root["children"]) == 1:
+        return root["children"][0]
+    return root
+
+
+def missing_assets() -> List[str]:
+    """
+    resource/markmap/vendor 中缺少的前端资源
+
+    Returns:
+        缺少的文件名（生成的网页从CDN加载这些资源，离线时无法显示）
+    """
+    vendor_dir = get_markmap_dir() / "vendor"
+    return [filename for filename, _ in ASSETS if not (vendor_dir / filename).is_file()]
+
+
+def _scripts() -> str:
+    """前端脚本：有本地文件时内联，否则引用CDN"""
+    vendor_dir = get_markmap_dir() / "vendor"
+    tags = []
+    for filename, url in ASSETS:
+        local = vendor_dir / filename
+        if local.is_file():
+            source = local.read_text(encoding="utf-8").replace("</script", "<\\/script")
+            tags.append(f"<script>{source}</script>")
+        else:
+            tags.append(f'<script src="{url}"></script>')
+    return "\n".join(tags)
+
+
+def _json_for_script(value: Any) -> str:
+    """序列化为可以安全嵌入 <script> 的JSON"""
+    return json.dumps(value, ensure_ascii=False).replace("</", "<\\/")
+
+
+def render_markmap_html(markdown_text: str, title: str = "Markmap") -> str:
+    """
+    生成思维导图网页
+
+    Args:
+        markdown_text: Markdown文本
+        title: 网页标题
+
+    Returns:
+        HTML文本
+    """
+    template = (get_markmap_dir() / "template.html").read_text(encoding="utf-8")
+    values = {
+        "template_version": str(TEMPLATE_VERSION),
+        "d3_version": D3_VERSION,
+        "view_version": MARKMAP_VIEW_VERSION,
+        "title": html.escape(title),
+        "scripts": _scripts(),
+        "data": _json_for_script(parse_markdown(markdown_text)),
+        "options": _json_for_script(DEFAULT_OPTIONS),
+    }
+    return re.sub(r"\{\{(\w+)\}\}", lambda m: values[m.group(1)], template)
+
+
+def write_markmap_html(file_path: str) -> str:
+    """
+    把Markdown文件转换为同名的 .html 思维导图文件（与 markmap-cli 的输出位置相同）
+
+    Args:
+        file_path: Markdown文件路径
+
+    Returns:
+        生成的HTML文件路径
+    """
+    from utils.md_cache import atomic_write
+
+    source = Path(file_path)
+    output = source.with_suffix(".html")
+    atomic_write(output, render_markmap_html(source.read_text(encoding="utf-8"), source.stem).encode("utf-8"))
+    return str(output)
+
+
+def vendor_assets() -> List[Path]:
+    """
+    下载固定版本的前端资源到 resource/markmap/vendor，之后生成的思维导图完全离线可用
+
+    Returns:
+        下载的文件路径
+    """
+    vendor_dir = get_markmap_dir() / "vendor"
+    vendor_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for filename, url in ASSETS:
+        with urllib.request.urlopen(url, timeout=30) as response:
+            data = response.read()
+        path = vendor_dir / filename
+        path.write_bytes(data)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    for downloaded in vendor_assets():
+        print(f"已下载: {downloaded}")
@@ -0,0 +1,171 @@
+"""
+思维导图批量重建模块 - 升级模板后重新生成目录中的思维导图
+
+清单文件记录每个Markdown文件上次生成时的内容哈希和模板指纹，只重建内容或模板变化过、
+或网页缺失的文件；文件大小和修改时间未变时不读取内容，无需重建时几乎立即完成。
+需要重建的文件分配到进程池中并行生成，进程数默认等于CPU核数。
+"""
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# 清单文件名（保存在被扫描的目录中）
+MANIFEST_FILE = "markmap_manifest.json"
+
+
+class RebuildResult(NamedTuple):
+    """批量重建结果"""
+    rebuilt: int  # 重新生成的文件数
+    failed: int  # 生成失败的文件数（下次运行时重试）
+    skipped: int  # 无需重建的文件数
+
+
+def template_fingerprint() -> str:
+    """
+    当前模板的指纹：模板版本、前端库版本、模板文件和本地前端资源的内容
+
+    本地前端资源下载或更新后指纹改变，之前引用CDN生成的网页会重建为内联资源的版本。
+    """
+    from utils.markmap_html import ASSETS, D3_VERSION, MARKMAP_VIEW_VERSION, TEMPLATE_VERSION, get_markmap_dir
+
+    digest = hashlib.sha256((get_markmap_dir() / "template.html").read_bytes())
+    vendor_dir = get_markmap_dir() / "vendor"
+    for filename, _ in ASSETS:
+        local = vendor_dir / filename
+        digest.update(filename.encode("utf-8"))
+        digest.update(local.read_bytes() if local.is_file() else b"cdn")
+    return f"{TEMPLATE_VERSION}-{D3_VERSION}-{MARKMAP_VIEW_VERSION}-{digest.hexdigest()[:12]}"
+
+
+def _file_hash(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def load_manifest(directory: Path) -> Dict[str, Dict[str, Any]]:
+    """读取清单，不存在或损坏时为空"""
+    try:
+        data = json.loads((directory / MANIFEST_FILE).read_text(encoding="utf-8"))
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def plan_rebuild(directory: Path,
+                 manifest: Dict[str, Dict[str, Any]],
+                 fingerprint: str,
+                 force: bool = False) -> Tuple[List[Tuple[Path, Dict[str, Any]]], Dict[str, Dict[str, Any]]]:
+    """
+    找出需要重建的Markdown文件
+
+    Args:
+        directory: 扫描的目录
+        manifest: 上次的清单
+        fingerprint: 当前模板指纹
+        force: 是否全部重建
+
+    Returns:
+        (需要重建的 (文件, 清单记录) 列表, 无需重建的文件的新清单)
+    """
+    stale = []
+    current = {}
+    for path in sorted(directory.glob("*.md")):
+        stat = path.stat()
+        record = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "template": fingerprint}
+        previous = manifest.get(path.name) or {}
+        up_to_date = not force and previous.get("template") == fingerprint and path.with_suffix(".html").exists()
+        if up_to_date and (previous.get("size"), previous.get("mtime")) == (stat.st_size, stat.st_mtime_ns):
+            current[path.name] = previous
+            continue
+        # 大小或修改时间变化时再比较内容哈希
+        record["hash"] = _file_hash(path)
+        if up_to_date and previous.get("hash") == record["hash"]:
+            current[path.name] = record
+        else:
+            stale.append((path, record))
+    return stale, current
+
+
+def _rebuild_one(file_path: str) -> Optional[str]:
+    """
+    在工作进程中生成一个思维导图
+
+    Args:
+        file_path: Markdown文件路径
+
+    Returns:
+        失败时的错误信息，成功时为None
+    """
+    from utils.markmap_html import write_markmap_html
+
+    try:
+        write_markmap_html(file_path)
+        return None
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+
+def rebuild_markmaps(directory: Optional[str] = None,
+                     workers: Optional[int] = None,
+                     force: bool = False) -> RebuildResult:
+    """
+    重建目录中内容或模板变化过的思维导图
+
+    Args:
+        directory: Markdown文件所在目录，为None时使用 resource/md_cache
+        workers: 工作进程数，为None时使用CPU核数
+        force: 是否忽略清单全部重建
+
+    Returns:
+        重建结果
+    """
+    from ui.console import Console
+    from utils.markmap_html import missing_assets
+    from utils.md_cache import atomic_write
+
+    if directory is None:
+        from utils.markmap import get_project_root
+
+        directory = get_project_root() / "resource" / "md_cache"
+    directory = Path(directory)
+    if not directory.is_dir():
+        raise FileNotFoundError(f"目录不存在: {directory}")
+
+    console = Console()
+    manifest = load_manifest(directory)
+    stale, current = plan_rebuild(directory, manifest, template_fingerprint(), force)
+    failed = 0
+    if stale:
+        workers = max(1, min(workers or os.cpu_count() or 1, len(stale)))
+        paths = [str(path) for path, _ in stale]
+        if missing := missing_assets():
+            console.print(f"未找到本地前端资源（{', '.join(missing)}），思维导图将从CDN加载；"
+                          f"运行 python -m utils.markmap_html 下载后再次重建即可内联", style="dim yellow")
+        with console.create_progress() as progress:
+            task = progress.add_task(f"重建思维导图（{workers} 个进程）", total=len(stale))
+            if workers == 1:
+                errors = (_rebuild_one(path) for path in paths)
+                results = zip(stale, errors)
+                executor = None
+            else:
+                executor = ProcessPoolExecutor(max_workers=workers)
+                chunksize = max(1, len(paths) // (workers * 4))
+                results = zip(stale, executor.map(_rebuild_one, paths, chunksize=chunksize))
+            try:
+                for (path, record), error in results:
+                    if error is None:
+                        current[path.name] = record
+                    else:
+                        failed += 1
+                        console.print(f"生成失败 {path.name}: {error}", style="bold red")
+                    progress.advance(task)
+            finally:
+                if executor is not None:
+                    executor.shutdown(cancel_futures=True)
+
+    if current != manifest:
+        atomic_write(directory / MANIFEST_FILE,
+                     json.dumps(current, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+    return RebuildResult(len(stale) - failed, failed, len(current) - (len(stale) - failed))
@@ -0,0 +1,185 @@
+"""
+Markdown缓存模块 - 按内容寻址保存思维导图的Markdown和生成的网页
+
+文件名为 {前缀}_{内容哈希}.md，相同内容只保存一次，已生成的同名 .html 直接复用；
+index.json 记录每个条目的大小和访问时间，文件和索引都先写临时文件再原子替换，
+超过有效期或总容量时淘汰最久未使用的条目。
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import ADVANCED_SETTINGS
+
+# 索引文件名和格式版本
+INDEX_FILE = "index.json"
+INDEX_VERSION = 1
+
+# 文件名中内容哈希的长度（十六进制字符数）
+HASH_LENGTH = 16
+
+
+def content_hash(text: str) -> str:
+    """计算内容哈希"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()[:HASH_LENGTH]
+
+
+def atomic_write(path: Path, data: bytes) -> None:
+    """
+    原子写入文件：先写同目录下的临时文件，再替换目标文件
+
+    Args:
+        path: 目标文件
+        data: 文件内容
+    """
+    fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+class MarkdownCache:
+    """按内容寻址、有容量和有效期限制的Markdown缓存目录"""
+
+    def __init__(self, directory: Path, max_bytes: Optional[int] = None, max_age: Optional[float] = None):
+        """
+        Args:
+            directory: 缓存目录
+            max_bytes: 最大总容量（字节，包括生成的网页），为None时使用 md_cache_max_bytes 配置
+            max_age: 条目有效期（秒，按最近访问时间计算），为None时使用 md_cache_max_age 配置
+        """
+        self.directory = Path(directory)
+        self.max_bytes = ADVANCED_SETTINGS.get("md_cache_max_bytes") if max_bytes is None else max_bytes
+        self.max_age = ADVANCED_SETTINGS.get("md_cache_max_age") if max_age is None else max_age
+        self._lock = threading.Lock()
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._index_mtime: Optional[int] = None
+
+    @property
+    def index_path(self) -> Path:
+        return self.directory / INDEX_FILE
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        """读取索引（其他进程更新过时重新读取），索引不存在或损坏时按目录中的文件重建"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        try:
+            mtime = self.index_path.stat().st_mtime_ns
+        except OSError:
+            mtime = None
+        if self._entries is not None and mtime is not None and mtime == self._index_mtime:
+            return self._entries
+        try:
+            data = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if data.get("version") != INDEX_VERSION:
+                raise ValueError("索引版本不匹配")
+            self._entries = data["entries"]
+        except (OSError, ValueError, KeyError, TypeError, AttributeError):
+            self._entries = {}
+            for path in self.directory.glob("*.md"):
+                stat = path.stat()
+                self._entries[path.stem] = {"size": stat.st_size + self._html_size(path),
+                                            "accessed": stat.st_mtime}
+        return self._entries
+
+    def _save(self) -> None:
+        data = {"version": INDEX_VERSION, "entries": self._entries}
+        atomic_write(self.index_path, json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        self._index_mtime = self.index_path.stat().st_mtime_ns
+
+    @staticmethod
+    def _html_size(md_path: Path) -> int:
+        try:
+            return md_path.with_suffix(".html").stat().st_size
+        except OSError:
+            return 0
+
+    def _remove(self, stem: str) -> None:
+        self._entries.pop(stem, None)
+        for suffix in (".md", ".html"):
+            try:
+                (self.directory / f"{stem}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self, keep: str) -> None:
+        """淘汰过期条目，再按最近访问时间淘汰到容量以内（不淘汰 keep）"""
+        now = time.time()
+        if self.max_age:
+            for stem, entry in list(self._entries.items()):
+                if stem != keep and now - entry.get("accessed", 0) > self.max_age:
+                    self._remove(stem)
+        if self.max_bytes:
+            total = sum(entry.get("size", 0) for entry in self._entries.values())
+            for stem, entry in sorted(self._entries.items(), key=lambda item: item[1].get("accessed", 0)):
+                if total <= self.max_bytes:
+                    break
+                if stem != keep:
+                    total -= entry.get("size", 0)
+                    self._remove(stem)
+
+    def put(self, markdown_text: str, prefix: str) -> Path:
+        """
+        保存Markdown（相同前缀和内容时复用已保存的文件）
+
+        Args:
+            markdown_text: Markdown文本
+            prefix: 文件名前缀
+
+        Returns:
+            Markdown文件路径
+        """
+        stem = f"{prefix}_{content_hash(markdown_text)}"
+        path = self.directory / f"{stem}.md"
+        with self._lock:
+            entries = self._load()
+            if not path.exists():
+                atomic_write(path, markdown_text.encode("utf-8"))
+            entries[stem] = {"size": path.stat().st_size + self._html_size(path), "accessed": time.time()}
+            self._evict(keep=stem)
+            self._save()
+        return path
+
+    def record_html(self, md_path: Path) -> None:
+        """
+        记录为某个Markdown文件生成了网页（计入容量）
+
+        Args:
+            md_path: Markdown文件路径
+        """
+        md_path = Path(md_path)
+        if md_path.parent.resolve() != self.directory.resolve():
+            return
+        with self._lock:
+            entries = self._load()
+            try:
+                size = md_path.stat().st_size + self._html_size(md_path)
+            except OSError:
+                return
+            entries[md_path.stem] = {"size": size, "accessed": time.time()}
+            self._evict(keep=md_path.stem)
+            self._save()
+
+
+_cache: Optional[MarkdownCache] = None
+
+
+def get_md_cache() -> MarkdownCache:
+    """获取 resource/md_cache 的缓存单例"""
+    global _cache
+    if _cache is None:
+        from utils.markmap import get_project_root
+
+        _cache = MarkdownCache(get_project_root() / "resource" / "md_cache")
+    return _cache
@@ -0,0 +1,105 @@
+"""
+大纲分析模块 - 判断回答是否已经是结构清晰的大纲
+
+回答本身已经由标题和列表组成层级时，直接提取大纲生成思维导图，不再请求模型整理；
+只有大段散文才需要模型整理。
+"""
+import re
+from typing import List, NamedTuple, Optional
+
+from config import ADVANCED_SETTINGS
+from utils.markmap_html import FENCE_PATTERN, HEADING_PATTERN, LIST_ITEM_PATTERN
+
+# 至少包含的节点数（标题和列表项）
+MIN_NODES = 4
+
+# 节点文本的平均长度超过此值时按比例降低得分（长句列表更像散文）
+MAX_NODE_CHARS = 80
+
+_RULE = re.compile(r"^\s*([-*_])(\s*\1){2,}\s*$")
+
+
+class OutlineScore(NamedTuple):
+    """大纲结构分析结果"""
+    score: float  # 结构得分（0~1）
+    nodes: int  # 标题和列表项数量
+    depth: int  # 层级深度（标题级别数加列表嵌套层数）
+    structured_ratio: float  # 标题和列表项占正文行的比例
+
+
+def _outline_lines(markdown_text: str) -> List[str]:
+    """提取标题和列表项行（跳过代码块），段落行以空字符串占位"""
+    lines = []
+    fence: Optional[str] = None
+    for line in markdown_text.splitlines():
+        expanded = line.expandtabs(4).rstrip()
+        if fence is not None:
+            if expanded.strip().startswith(fence):
+                fence = None
+            continue
+        if match := FENCE_PATTERN.match(expanded):
+            fence = match.group(1)
+            continue
+        if not expanded.strip() or _RULE.match(expanded):
+            continue
+        if HEADING_PATTERN.match(expanded) or LIST_ITEM_PATTERN.match(expanded):
+            lines.append(expanded)
+        elif not expanded.lstrip().startswith("|"):
+            # 段落、引用等正文（表格不计入）
+            lines.append("")
+    return lines
+
+
+def analyze_outline(markdown_text: str) -> OutlineScore:
+    """
+    分析Markdown的大纲结构
+
+    得分 = 标题和列表项占正文行的比例 × 层级系数（层级越深越接近1）× 长度系数（节点文本越长越低），
+    节点少于 MIN_NODES 时为0。
+
+    Args:
+        markdown_text: Markdown文本
+
+    Returns:
+        分析结果
+    """
+    lines = _outline_lines(markdown_text)
+    heading_levels = set()
+    list_indents = set()
+    chars = 0
+    nodes = 0
+    for line in lines:
+        if not line:
+            continue
+        nodes += 1
+        if match := HEADING_PATTERN.match(line):
+            heading_levels.add(len(match.group(1)))
+            chars += len(match.group(2))
+        elif match := LIST_ITEM_PATTERN.match(line):
+            list_indents.add(len(match.group(1)))
+            chars += len(match.group(2))
+
+    depth = len(heading_levels) + len(list_indents)
+    if nodes < MIN_NODES:
+        return OutlineScore(0.0, nodes, depth, nodes / len(lines) if lines else 0.0)
+    ratio = nodes / len(lines)
+    depth_factor = 0.5 + 0.5 * min(1.0, depth / 3)
+    length_factor = min(1.0, MAX_NODE_CHARS / (chars / nodes)) if chars else 1.0
+    return OutlineScore(ratio * depth_factor * length_factor, nodes, depth, ratio)
+
+
+def extract_outline(markdown_text: str, threshold: Optional[float] = None) -> Optional[str]:
+    """
+    回答已经是结构清晰的大纲时提取其标题和列表层级
+
+    Args:
+        markdown_text: Markdown文本
+        threshold: 最低得分，为None时使用 outline_threshold 配置
+
+    Returns:
+        只包含标题和列表项的Markdown，得分低于阈值时为None（需要模型整理）
+    """
+    threshold = ADVANCED_SETTINGS.get("outline_threshold", 0.6) if threshold is None else threshold
+    if analyze_outline(markdown_text).score < threshold:
+        return None
+    return "\n".join(line for line in _outline_lines(markdown_text) if line) + "\n"